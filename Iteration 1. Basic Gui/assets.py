@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import hashlib
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QImage, QPainter, QPixmap, QPixmapCache, QIcon
+
+# Source images live in img_ogs; the build packs them, resized, into one atlas image plus a manifest
+# recording each sprite's rectangle and the hash of the source it came from.
+# Run `python assets.py` to build by hand; the GUI also rebuilds on startup if any source has changed.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "img_ogs")
+BUILD_DIR = os.path.join(BASE_DIR, "img_build")
+ATLAS_FILE = os.path.join(BUILD_DIR, "atlas.png")
+MANIFEST_FILE = os.path.join(BUILD_DIR, "atlas.json")
+ATLAS_WIDTH = 512; PADDING = 1  # Padding stops smooth scaling bleeding neighbouring sprites into each other
+
+# Asset name -> (source file in img_ogs, size in the atlas)
+ASSETS = {
+    "mouse": ("mouse_icon.png", (80, 100)), "line": ("line_icon.png", (80, 100)), "notes": ("notes_icon.png", (80, 100)),
+    "candlestick": ("candlestick_icon.png", (100, 80)), "line_graph": ("line_graph_icon.png", (100, 80)),
+    "add_stock": ("add_stock_icon.png", (80, 80)), "remove_stock": ("remove_stock_icon.png", (80, 80)),
+    "clear_graph": ("clear_graph_icon.png", (80, 80)), "save_graph": ("save_graph_icon.png", (80, 80)),
+    "reroll": ("reroll.png", (50, 50)), "confirm": ("confirm.png", (50, 50)),
+    "person": ("person_icon.jpg", (120, 120)),
+}
+
+_manifest = None  # Loaded once per process by sprite_rects()
+
+
+def source_hash(path) -> str:
+    with open(path, "rb") as f: return hashlib.sha1(f.read()).hexdigest()
+
+
+def load_manifest() -> dict:
+    if not os.path.exists(MANIFEST_FILE): return {}
+    with open(MANIFEST_FILE, "r") as f: return json.load(f)
+
+
+def stale_assets(manifest=None) -> list:
+    # Names of assets whose source or target size differs from what was last built (all of them if there is no atlas yet)
+    manifest = load_manifest() if manifest is None else manifest
+    if not os.path.exists(ATLAS_FILE): return list(ASSETS)
+    stale = []
+    for name, (source, size) in ASSETS.items():
+        entry = manifest.get(name)
+        if entry is None or entry["size"] != list(size) or entry["source_hash"] != source_hash(os.path.join(SOURCE_DIR, source)): stale.append(name)
+    return stale
+
+
+def pack(sizes, width=ATLAS_WIDTH, padding=PADDING) -> tuple:
+    # Shelf packing, tallest first: returns ({name: (x, y, w, h)}, atlas height)
+    rects = {}; x = y = shelf_height = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width: x = 0; y += shelf_height + padding; shelf_height = 0
+        rects[name] = (x, y, w, h); x += w + padding; shelf_height = max(shelf_height, h)
+    return rects, y + shelf_height
+
+
+def build_atlas(force=False) -> list:
+    # Rebuild the atlas, decoding and resizing only the sources that changed. Returns the names that were rebuilt
+    manifest = load_manifest()
+    stale = list(ASSETS) if force else stale_assets(manifest)
+    if not stale: return []
+
+    # Unchanged sprites are copied out of the previous atlas rather than decoded from their sources again
+    old_atlas = QImage(ATLAS_FILE) if os.path.exists(ATLAS_FILE) else QImage()
+    sprites = {}
+    for name, (source, size) in ASSETS.items():
+        if name not in stale and not old_atlas.isNull():
+            sprites[name] = old_atlas.copy(QRect(*manifest[name]["rect"]))
+            continue
+        image = QImage(os.path.join(SOURCE_DIR, source))
+        if image.isNull(): raise ValueError(f"Could not read image {source}")
+        sprites[name] = image.scaled(size[0], size[1], Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        if name not in stale: stale.append(name)
+
+    rects, height = pack({name: tuple(ASSETS[name][1]) for name in ASSETS})
+    atlas = QImage(ATLAS_WIDTH, height, QImage.Format_ARGB32_Premultiplied); atlas.fill(Qt.transparent)
+    painter = QPainter(atlas)
+    for name, (x, y, w, h) in rects.items(): painter.drawImage(x, y, sprites[name])
+    painter.end()
+
+    # Write both files to temporary names first so a failed build never leaves a half-written atlas
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    if not atlas.save(ATLAS_FILE + ".tmp", "PNG"): raise OSError(f"Could not write {ATLAS_FILE}")
+    manifest = {name: {"source": ASSETS[name][0], "source_hash": source_hash(os.path.join(SOURCE_DIR, ASSETS[name][0])),
+                       "size": list(ASSETS[name][1]), "rect": list(rect)} for name, rect in rects.items()}
+    with open(MANIFEST_FILE + ".tmp", "w") as f: json.dump(manifest, f, indent=1)
+    os.replace(ATLAS_FILE + ".tmp", ATLAS_FILE); os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+    return stale
+
+
+def sprite_rects() -> dict:
+    # Sprite rectangles from the manifest, building the atlas first if it is missing or out of date
+    global _manifest
+    if _manifest is None:
+        build_atlas(); _manifest = load_manifest()
+    return _manifest
+
+
+def pixmap(name) -> QPixmap:
+    # One sprite as a QPixmap. The atlas is decoded once and each sprite cut from it once; both live in QPixmapCache,
+    # so every button showing the same icon shares one pixmap. Needs a QApplication
+    key = f"asset:{name}"; cached = QPixmapCache.find(key)
+    if cached is not None and not cached.isNull(): return cached
+    rect = QRect(*sprite_rects()[name]["rect"])  # Builds the atlas first if needed
+    atlas = QPixmapCache.find("asset:atlas")
+    if atlas is None or atlas.isNull(): atlas = QPixmap(ATLAS_FILE); QPixmapCache.insert("asset:atlas", atlas)
+    sprite = atlas.copy(rect)
+    QPixmapCache.insert(key, sprite); return sprite
+
+
+def icon(name, checked_name=None) -> QIcon:
+    # QIcon for an asset, optionally showing a second asset while the button is checked
+    result = QIcon(pixmap(name))
+    if checked_name: result.addPixmap(pixmap(checked_name), QIcon.Normal, QIcon.On)
+    return result
+
+
+if __name__ == "__main__":
+    rebuilt = build_atlas(force="--force" in sys.argv)
+    print(f"Rebuilt {', '.join(rebuilt)}." if rebuilt else "Atlas is up to date.")
@@ -1,10 +1,110 @@
-
-
+from startup import startup_timer, REPORT_ENABLED  # First, so the startup clock covers every other import
+import os
 import sys
+import threading
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QColor, QPalette, QPainter, QPixmap, QPainterPath
+from PyQt5.QtGui import QColor, QPalette, QPainter, QPixmap, QPainterPath, QStandardItem, QStandardItemModel
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QHBoxLayout, QVBoxLayout, QSizePolicy,
-                             QWidget, QLabel, QFrame, QPushButton, QDialog, QLineEdit, QSlider, QMessageBox)
+                             QWidget, QLabel, QFrame, QPushButton, QDialog, QLineEdit, QSlider, QMessageBox, QComboBox, QButtonGroup,
+                             QInputDialog, QCompleter)
+import assets
+import theme
+from jobs import JobScheduler
+
+# The data layer lives alongside the standalone graph scripts. It pulls in numpy, pandas and pyqtgraph,
+# so it is only imported once the window is on screen (or inside the background jobs that need it)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Iteration 2. Independent Graph"))
+startup_timer.mark("import", "Qt and app modules")
+
+HISTORY_YEARS = 5  # How much history is loaded for charts and predictions
+SEARCH_DEBOUNCE_MS = 120  # Ticker suggestions are refreshed once typing pauses for this long
+SYMBOL_INDEX_JOB = "Symbols|Index"  # Key of the job loading the symbol index - not one the reroll button cancels
+
+
+def history_range():
+    # The last HISTORY_YEARS up to and including today, as a half-open (start, end) tick store range
+    import pandas as pd
+    end = pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    return end - pd.DateOffset(years=HISTORY_YEARS), end
+
+
+def load_history(ticker):
+    # Load the last HISTORY_YEARS of a ticker from the tick store, downloading only what it is missing.
+    # Runs on job threads next to other jobs, so it downloads with the thread-safe downloader, never yf.download
+    from fetch_pipeline import threadsafe_yfinance_downloader
+    from tick_store import TickStore
+    data = TickStore(ticker).get(*history_range(), downloader=threadsafe_yfinance_downloader)
+    if data is None or data.empty: raise ValueError(f"No data found for {ticker}")
+    return data
+
+
+def load_series_job(token, progress, ticker) -> dict:
+    # Runs on a worker thread: loads a ticker to add to the chart
+    progress(10, "Loading data...")
+    data = load_history(ticker)
+    return {"kind": "series", "ticker": ticker, "close": data["Close"], "colour": None, "matches": True}
+
+
+def load_many_series_job(token, progress, tickers) -> dict:
+    # Runs on a worker thread: loads several tickers for the chart at once, downloading the missing ones concurrently
+    from fetch_pipeline import fetch_many
+    start, end = history_range(); series = []; failed = []
+    progress(5, "Loading data...")
+    for done, result in enumerate(fetch_many([(ticker, start, end) for ticker in tickers]), 1):
+        if result.error is not None or result.data is None or result.data.empty: failed.append(f"{result.ticker}: {result.error or 'no data found'}")
+        else: series.append({"ticker": result.ticker, "close": result.data["Close"], "colour": None, "matches": True})
+        progress(100 * done // len(tickers), f"Loaded {result.ticker}")
+    return {"kind": "series_many", "series": series, "failed": failed}
+
+
+def load_saved_graph_job(token, progress, refs) -> dict:
+    # Runs on a worker thread: loads every series of a saved graph, downloading any missing ranges concurrently
+    import workspace
+    series = []; failed = []
+    progress(5, "Loading data...")
+    for done, (ref, close, matches, error) in enumerate(workspace.resolve_many(refs), 1):
+        if error is not None: failed.append(str(error))
+        else: series.append({"ticker": ref.ticker, "close": close, "colour": ref.colour, "matches": matches})
+        progress(100 * done // len(refs), f"Loaded {ref.ticker}")
+    order = [ref.ticker for ref in refs]; series.sort(key=lambda item: order.index(item["ticker"]))  # Keep the saved legend order
+    return {"kind": "series_many", "series": series, "failed": failed}
+
+
+def load_symbol_index_job(token, progress) -> dict:
+    # Runs on a worker thread: indexes the local symbol listing for ticker suggestions and validation
+    from symbols import SymbolIndex
+    return {"kind": "symbols", "index": SymbolIndex.load()}
+
+
+prediction_engine = None  # Created on first use; memoises features and predictions across jobs
+prediction_engine_lock = threading.Lock()  # Prediction jobs run concurrently, so only the first one creates the engine
+
+
+def run_prediction_job(token, progress, ticker, prediction_type, risk_level, time_period, scheduler=None) -> dict:
+    # Runs on a worker thread: loads the ticker's history and runs the selected model on it.
+    # Slow model fits (e.g. Random Forest) are handed to the scheduler's process pool, off the GUI process
+    global prediction_engine
+    import numpy as np
+    import risk
+    from prediction import HORIZONS, PredictionEngine
+    with prediction_engine_lock:
+        if prediction_engine is None: prediction_engine = PredictionEngine()
+
+    progress(10, "Loading data...")
+    data = load_history(ticker)
+
+    progress(50, f"Running {prediction_type}...")
+    run = (lambda fn, *args: scheduler.run_in_process(token, fn, *args)) if scheduler is not None else None
+    prediction = prediction_engine.predict(ticker, data, prediction_type, time_period, risk_level, run=run)
+
+    # Simulate a position sized by the risk tolerance, drifting towards the model's expected return
+    progress(75, "Simulating risk...")
+    horizon = HORIZONS[time_period]
+    report = risk.simulate(data["Close"].to_numpy(dtype=float), horizon, risk_level,
+                           drift=float(np.log1p(prediction.expected_return)) / horizon, check=token.check)
+    progress(100, "Done")
+    return {"kind": "prediction", "ticker": ticker, "prediction_type": prediction_type, "risk_level": risk_level, "time_period": time_period,
+            "rows": len(data), "prediction": prediction, "risk": report}
 
 
 class MainWindow(QMainWindow):
@@ -14,13 +114,39 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Stock Prediction App")
         self.setGeometry(100, 100, 1500, 900)
         self.btns = {"left_btns": [], "top_btns": [], "prediction_type_btns": [], "time_period_btns": [], "confirmation_btns": []}
-        self.colours = {"Default": "#e3e3e3", "Hover": "#adadad", "Clicked": "#858585"}
+        self.btn_groups = {}  # Exclusive QButtonGroup for each group of selectable buttons, created with its first button
+        theme.apply(); self.colours = theme.COLOURS  # Button colours live in the application stylesheet
+
+        # Background jobs (data loading, predictions) and the status line shown for each one
+        self.scheduler = JobScheduler(parent=self); self.job_status = {}
+        self.scheduler.signals.progress.connect(self.on_job_progress); self.scheduler.signals.finished.connect(self.on_job_finished)
+        self.scheduler.signals.failed.connect(self.on_job_failed); self.scheduler.signals.cancelled.connect(self.on_job_cancelled)
 
         # Set up the main layout with left, center, and right frames
         central = QWidget(); self.setCentralWidget(central)
         main_layout = QHBoxLayout(); central.setLayout(main_layout)
         left_frame = self.build_left_frame(); center_frame = self.build_center_frame(); right_frame = self.build_right_frame()
         main_layout.addWidget(left_frame, 1); main_layout.addWidget(center_frame, 15); main_layout.addWidget(right_frame, 3)
+        self.deferred_built = False  # The chart, profile and prediction panels are built after the first paint
+        # The tool and graph edit buttons act on the chart, so they stay disabled until build_deferred_panels has made it
+        for btn in self.btns["left_btns"] + self.btns["top_btns"]: btn.setEnabled(False)
+        startup_timer.mark("widgets", "main window")
+
+    def paintEvent(self, event) -> None:
+        # Once the window has been painted once, build the rest of it on the next pass of the event loop
+        super().paintEvent(event)
+        if not self.deferred_built:
+            self.deferred_built = True; startup_timer.mark("paint", "first paint")
+            QTimer.singleShot(0, self.build_deferred_panels)
+
+    def build_deferred_panels(self) -> None:
+        # Build the panels that are slow to import or construct, then print the startup report if asked for
+        self.build_graph_panel(); startup_timer.mark("widgets", "graph panel")
+        self.right_layout.addWidget(self.build_profile_frame(), 1); startup_timer.mark("widgets", "profile")
+        self.right_layout.addWidget(self.build_prediction_settings_frame(), 10)
+        self.right_layout.addWidget(self.build_prediction_result_frame(), 10); startup_timer.mark("widgets", "prediction panels")
+        for btn in self.btns["left_btns"] + self.btns["top_btns"]: btn.setEnabled(True)
+        if REPORT_ENABLED: print(startup_timer.report())
 
     def build_left_frame(self) -> QFrame:
         # Initialize the left sidebar with tool buttons
@@ -28,9 +154,9 @@ class MainWindow(QMainWindow):
         left_layout = QVBoxLayout(left_frame); left_layout.setContentsMargins(0,0,0,0); left_layout.setSpacing(0)
 
         # Define tool buttons
-        mouse_btn = self.make_img_grp_btn("mouse_tool", "left_btns", "img_src/mouse_icon_scaled.png", height=100)
-        line_tool_btn = self.make_img_grp_btn("line_tool", "left_btns", "img_src/line_icon_scaled.png", height=100)
-        notes_tool_btn = self.make_img_grp_btn("notes_tool", "left_btns", "img_src/notes_icon_scaled.png", height=100)
+        mouse_btn = self.make_img_grp_btn("mouse_tool", "left_btns", "mouse", height=100)
+        line_tool_btn = self.make_img_grp_btn("line_tool", "left_btns", "line", height=100)
+        notes_tool_btn = self.make_img_grp_btn("notes_tool", "left_btns", "notes", height=100)
 
         left_layout.addWidget(mouse_btn); left_layout.addWidget(line_tool_btn); left_layout.addWidget(notes_tool_btn); left_layout.addStretch()
         return left_frame
@@ -41,53 +167,71 @@ class MainWindow(QMainWindow):
 
         # Defiine top frame
         top_frame = QFrame(); top_frame.setStyleSheet("border: 1px solid black")
-        top_layout = QHBoxLayout(top_frame); top_layout.setAlignment(Qt.AlignHCenter); top_layout.setContentsMargins(0,0,0,0); top_layout.setSpacing(0)
+        top_layout = QHBoxLayout(top_frame); self.top_layout = top_layout; top_layout.setAlignment(Qt.AlignHCenter); top_layout.setContentsMargins(0,0,0,0); top_layout.setSpacing(0)
 
         # Define graph type toggle button
         graph_type_btn = QPushButton(); graph_type_btn.setCheckable(True); graph_type_btn.setFixedWidth(100)
         graph_type_btn.name = "graph_type_btn"; graph_type_btn.group = "top_btns"
-        graph_type_btn.setStyleSheet(f"""
-        QPushButton {{background-image: url('img_src/candlestick_icon_scaled.png'); background-repeat: no-repeat; background-position: center; background-color: {self.colours['Default']}}}
-        QPushButton:hover {{background-color: {self.colours['Hover']}}}
-        QPushButton:checked {{background-image: url('img_src/line_graph_icon_scaled.png'); background-repeat: no-repeat; background-position: center; background-color: {self.colours['Default']}}}
-        QPushButton:checked:hover {{background-color: {self.colours['Hover']}}}        """)
+        graph_type_btn.setIcon(assets.icon("candlestick", checked_name="line_graph")); graph_type_btn.setIconSize(assets.pixmap("candlestick").size())
+        theme.set_kind(graph_type_btn, "toggle")
         graph_type_btn.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
-        graph_type_btn.clicked.connect(lambda checked: self.testfunc(graph_type_btn))
+        graph_type_btn.clicked.connect(lambda checked: self.testfunc(graph_type_btn)); self.btns["top_btns"].append(graph_type_btn)
 
         # Define graph stock edit buttons
-        add_stock_btn = self.make_indv_btn("add_stock_btn", "top_btns", 'img_src/add_stock_icon_scaled.png', width=100)
-        remove_stock_btn = self.make_indv_btn("remove_stock_btn", "top_btns", 'img_src/remove_stock_icon_scaled.png', width=100)
-        clear_graph_btn = self.make_indv_btn("clear_graph_btn", "top_btns", 'img_src/clear_graph_icon_scaled.png', width=100)
-        save_graph_btn = self.make_indv_btn("save_graph_btn", "top_btns", "img_src/save_graph_icon.png", width=100)
+        add_stock_btn = self.make_indv_btn("add_stock_btn", "top_btns", "add_stock", width=100)
+        remove_stock_btn = self.make_indv_btn("remove_stock_btn", "top_btns", "remove_stock", width=100)
+        clear_graph_btn = self.make_indv_btn("clear_graph_btn", "top_btns", "clear_graph", width=100)
+        save_graph_btn = self.make_indv_btn("save_graph_btn", "top_btns", "save_graph", width=100)
 
         top_layout.addWidget(graph_type_btn); top_layout.addWidget(add_stock_btn); top_layout.addWidget(remove_stock_btn); top_layout.addWidget(clear_graph_btn)
         top_layout.addStretch(); top_layout.addWidget(save_graph_btn)
 
-        # Define graph frame (TBD: to be developed further)
-        graph_frame = self.coloured_frame("transparent")
-        graph_label = QLabel("Graph Area")
-        graph_label.setAlignment(Qt.AlignCenter)
-        graph_frame.layout().addWidget(graph_label)
+        # Define graph frame; the chart inside it is added by build_graph_panel after the first paint
+        self.graph_frame = self.coloured_frame("transparent")
 
         # Add top frame and graph frame to center layout
-        center_layout.addWidget(top_frame, 1); center_layout.addWidget(graph_frame, 10)
+        center_layout.addWidget(top_frame, 1); center_layout.addWidget(self.graph_frame, 10)
         return center_frame
 
+    def build_graph_panel(self) -> None:
+        # Multi-series chart (all series share the date axis). Importing pyqtgraph and pandas is most of the cost
+        import pyqtgraph as pg
+        from annotations import AnnotationTool
+        from multi_series import MultiSeriesChart
+        startup_timer.mark("import", "pyqtgraph, numpy and pandas")
+        self.plot_widget = pg.PlotWidget(axisItems={"bottom": pg.DateAxisItem(orientation="bottom")}); self.plot_widget.showGrid(x=True, y=True)
+        self.chart = MultiSeriesChart(self.plot_widget)
+        # The left tool buttons switch what clicks on the chart draw (see testfunc)
+        self.annotation_tool = AnnotationTool(self.chart.annotation_layer, ask_text=self.ask_note_text)
+        self.graph_frame.layout().addWidget(self.plot_widget)
+
+        # Bar size the chart is drawn at, beside the graph edit buttons. Separate from the prediction time period;
+        # switching redraws from the data already loaded - nothing is downloaded
+        from resample import GRANULARITIES
+        self.granularity_box = QComboBox(); self.granularity_box.addItems(["As loaded"] + list(GRANULARITIES)); self.granularity_box.setFixedWidth(100)
+        self.granularity_box.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Expanding); self.granularity_box.setToolTip("Chart bar size")
+        self.granularity_box.currentTextChanged.connect(lambda label: self.chart.set_granularity(GRANULARITIES.get(label)))
+        self.top_layout.insertWidget(self.top_layout.count() - 2, self.granularity_box)  # Before the stretch and save button
+
     def build_right_frame(self) -> QFrame:
-        # Initialize the right sidebar with profile, prediction settings, and results
-        right_frame = QFrame(); right_layout = QVBoxLayout(right_frame)
+        # Initialize the right sidebar; its profile, prediction settings, and result panels are added after the first paint
+        right_frame = QFrame(); self.right_layout = QVBoxLayout(right_frame)
+        return right_frame
 
+    def build_profile_frame(self) -> QWidget:
         # Define profile frame
         profile_frame = QWidget(); profile_frame.setStyleSheet("background-color: None;")
         profile_frame_layout = QVBoxLayout(profile_frame); profile_frame_layout.setAlignment(Qt.AlignCenter)
 
         # Create profile widget with circular pixmap
         circle_label = QLabel()
-        circle_label.setPixmap(self.circle_bitmap(QPixmap("img_src/person_icon.jpg"), 120))
+        circle_label.setPixmap(self.circle_bitmap(assets.pixmap("person"), 120))
         circle_label.setAlignment(Qt.AlignCenter)
 
         profile_frame_layout.addWidget(circle_label, alignment=Qt.AlignCenter)
+        return profile_frame
 
+    def build_prediction_settings_frame(self) -> QFrame:
         ## Define prediction settings frame (pd_set = prediction_settings) and widgets within
         self.pd_set_frame = QFrame(); self.pd_set_frame.setStyleSheet("border: 1px solid black")
         pd_set_layout = QVBoxLayout(self.pd_set_frame); pd_set_layout.setContentsMargins(3,3,3,3); pd_set_layout.setSpacing(20)
@@ -96,6 +240,17 @@ class MainWindow(QMainWindow):
         self.ticker_symbol_inbox = QLineEdit(); self.ticker_symbol_inbox.setPlaceholderText("Ticker symbol...")
         self.ticker_symbol_inbox.setStyleSheet("font-size: 16px; font-family: Aller Display"); self.ticker_symbol_inbox.setFixedHeight(30)
 
+        # Ticker suggestions from the local symbol index, searched once typing pauses - nothing is downloaded while typing.
+        # The completer is driven by hand (not setCompleter) so it only updates when the debounce timer fires
+        self.symbol_index = None; self.ticker_model = QStandardItemModel(self)
+        self.ticker_completer = QCompleter(self.ticker_model, self); self.ticker_completer.setWidget(self.ticker_symbol_inbox)
+        self.ticker_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion); self.ticker_completer.setCompletionRole(Qt.UserRole)
+        self.ticker_completer.activated[str].connect(self.ticker_symbol_inbox.setText)
+        self.ticker_search_timer = QTimer(self); self.ticker_search_timer.setSingleShot(True); self.ticker_search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.ticker_search_timer.timeout.connect(self.update_ticker_suggestions)
+        self.ticker_symbol_inbox.textEdited.connect(lambda _: self.ticker_search_timer.start())
+        self.scheduler.submit(SYMBOL_INDEX_JOB, load_symbol_index_job)
+
         # Type of prediction selection widgets
         prediction_type_layout = QHBoxLayout(); prediction_type_layout.setSpacing(10)
 
@@ -105,6 +260,12 @@ class MainWindow(QMainWindow):
 
         prediction_type_layout.addWidget(lin_reg_btn); prediction_type_layout.addWidget(random_forrest_btn); prediction_type_layout.addWidget(ri_btn)
 
+        # Models whose optional packages aren't installed can't be picked (Random Forest needs scikit-learn)
+        from prediction import MODELS
+        for btn in (lin_reg_btn, random_forrest_btn, ri_btn):
+            missing = MODELS[btn.text].missing()
+            if missing: btn.setEnabled(False); btn.setToolTip(f"Needs {', '.join(missing)} (pip install {' '.join(missing)})")
+
         # Risk slider widget
         risk_layout = QVBoxLayout(); risk_layout.setContentsMargins(0,0,0,0); risk_layout.setSpacing(0)
 
@@ -130,25 +291,24 @@ class MainWindow(QMainWindow):
 
         # Confirmation and redo widgets
         confirmations_layout = QHBoxLayout(); confirmations_layout.setSpacing(50); confirmations_layout.setContentsMargins(20,20,20,20)
-        reroll_btn = self.make_indv_btn("reroll_btn", "confirmation_btns", "img_src/reroll_icon_scaled.png", width=70, height=70)
-        confirm_pd_btn = self.make_indv_btn("confirm_pd_btn", "confirmation_btns", "img_src/confirm_icon_scaled.png", width=70, height=70)
+        reroll_btn = self.make_indv_btn("reroll_btn", "confirmation_btns", "reroll", width=70, height=70)
+        confirm_pd_btn = self.make_indv_btn("confirm_pd_btn", "confirmation_btns", "confirm", width=70, height=70)
 
         confirmations_layout.addWidget(reroll_btn); confirmations_layout.addWidget(confirm_pd_btn)
 
         # Add all prediction setting widgets to prediction settings layout
         pd_set_layout.addWidget(self.ticker_symbol_inbox); pd_set_layout.addLayout(prediction_type_layout); pd_set_layout.addLayout(risk_layout)
         pd_set_layout.addLayout(time_period_layout); pd_set_layout.addLayout(confirmations_layout); pd_set_layout.addStretch()
+        return self.pd_set_frame
 
+    def build_prediction_result_frame(self) -> QFrame:
         # Define prediction result widget (TBD: to be developed further)
         prediction_result_frame = QFrame(); prediction_result_frame.setStyleSheet("border: 1px solid black")
         prediction_result_layout = QVBoxLayout(prediction_result_frame)
         self.prediction_result_label = QLabel("Prediction result"); self.prediction_result_label.setAlignment(Qt.AlignCenter); self.prediction_result_label.setWordWrap(True) 
         self.prediction_result_label.setStyleSheet("border: none")
         prediction_result_layout.addWidget(self.prediction_result_label)
-
-        # Add profile, prediction settings, and result frames to right frame
-        right_layout.addWidget(profile_frame, 1); right_layout.addWidget(self.pd_set_frame, 10); right_layout.addWidget(prediction_result_frame, 10)
-        return right_frame
+        return prediction_result_frame
 
     def testfunc(self, btn: QPushButton) -> None:
         # Temporary function to test button click activation
@@ -157,6 +317,66 @@ class MainWindow(QMainWindow):
             self.show_graph_save_popup(btn)
         elif btn.name == "confirm_pd_btn":
             self.start_prediction_simulation()
+        elif btn.name == "reroll_btn":
+            # Stop the chart loads and predictions in flight; the symbol index keeps loading
+            for key in self.scheduler.running():
+                if key != SYMBOL_INDEX_JOB: self.scheduler.cancel(key)
+        elif btn.name == "add_stock_btn":
+            self.add_stock()
+        elif btn.name == "remove_stock_btn":
+            self.remove_stock()
+        elif btn.name == "clear_graph_btn":
+            self.chart.clear()
+        elif btn.group == "left_btns":
+            # Clicks on the chart draw trendlines (two clicks) or notes; right click deletes the one under the mouse
+            self.annotation_tool.set_mode({"line_tool": "line", "notes_tool": "note"}.get(btn.name, "mouse"))
+
+    def ask_note_text(self) -> str:
+        # Text for a note placed with the notes tool; empty if the dialog was cancelled
+        text, ok = QInputDialog.getText(self, "Add Note", "Note:")
+        return text.strip() if ok else ""
+
+    def update_ticker_suggestions(self) -> None:
+        # Refill the completer with the best matches for what has been typed (binary searches and dict lookups, well under 1 ms)
+        text = self.ticker_symbol_inbox.text(); self.ticker_model.clear()
+        if self.symbol_index is not None and text.strip():
+            for symbol, name in self.symbol_index.search(text):
+                item = QStandardItem(f"{symbol}  {name}"); item.setData(symbol, Qt.UserRole); self.ticker_model.appendRow(item)
+        if self.ticker_model.rowCount(): self.ticker_completer.complete()
+        else: self.ticker_completer.popup().hide()
+
+    def check_ticker(self, text) -> str:
+        # Validate a ticker against the local symbol index before anything is fetched. Returns the ticker, or "" to stop
+        if self.symbol_index is None: return text.strip().upper()  # Still loading - let the download decide
+        from symbols import normalize
+        ticker = normalize(text)
+        if self.symbol_index.is_valid(ticker): return ticker
+        # The bundled listing is a starter set, so an unknown ticker can still be fetched if it is really meant
+        suggestions = self.symbol_index.suggest(ticker); hint = f" Did you mean {', '.join(suggestions)}?" if suggestions else ""
+        answer = QMessageBox.question(self, "Unknown Ticker", f"{ticker} is not in the symbol list.{hint}\n\nFetch it anyway?",
+                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        return ticker if answer == QMessageBox.Yes else ""
+
+    def add_stock(self) -> None:
+        # Load the ticker(s) in the input box in the background and add them to the chart when they arrive.
+        # Several comma separated tickers (a watchlist) are fetched together, concurrently
+        texts = [text for text in self.ticker_symbol_inbox.text().split(",") if text.strip()]
+        if not texts:
+            QMessageBox.warning(self, "Input Error", "Enter a ticker symbol to add to the graph."); return
+        tickers = []
+        for text in texts:
+            ticker = self.check_ticker(text)
+            if ticker and ticker not in self.chart.tickers() and ticker not in tickers: tickers.append(ticker)
+        if not tickers: return
+        if len(tickers) == 1: key = f"{tickers[0]}|Chart"; submitted = self.scheduler.submit(key, load_series_job, tickers[0])
+        else: key = f"{', '.join(tickers)}|Chart"; submitted = self.scheduler.submit(key, load_many_series_job, tickers)
+        if submitted: self.job_status[key] = "Queued..."; self.show_job_status()
+
+    def remove_stock(self) -> None:
+        # Remove the ticker in the input box, or the most recently added one if it isn't on the chart
+        ticker = self.ticker_symbol_inbox.text().strip().upper(); tickers = self.chart.tickers()
+        if ticker not in tickers: ticker = tickers[-1] if tickers else None
+        if ticker: self.chart.remove_series(ticker)
 
     def start_prediction_simulation(self) -> None:
         print("Prediction starting...") # DEBUG
@@ -171,34 +391,105 @@ class MainWindow(QMainWindow):
         if not all([ticker, selected_prediction_type, selected_time_period]):
             QMessageBox.warning(self, "Input Error", "Please fill in all prediction settings before confirming.")
             return
+        ticker = self.check_ticker(ticker)
+        if not ticker: return
 
-        self.pd_set_frame.setEnabled(False)
-        self.prediction_result_label.setText("Processing... (10s)")
+        # Run in the background so the window stays responsive; identical requests already running are not repeated
+        key = f"{ticker.upper()}|{selected_prediction_type}|{risk_level}|{selected_time_period}"
+        if not self.scheduler.submit(key, run_prediction_job, ticker.upper(), selected_prediction_type, risk_level, selected_time_period, scheduler=self.scheduler):
+            return
+        self.job_status[key] = "Queued..."; self.show_job_status()
 
-        def finish_prediction_simulation():
-            print("Prediction finished.")  # DEBUG
-            # Re-enable prediction settings and show results (TBD: to be developed further)
-            self.pd_set_frame.setEnabled(True)
-            self.prediction_result_label.setText(f"""
+    def show_job_status(self) -> None:
+        # Show one status line per running job in the prediction result area
+        self.prediction_result_label.setText("\n".join(f"{key.split('|')[0]} ({key.split('|')[1]}): {status}" for key, status in self.job_status.items()))
+
+    def on_job_progress(self, key, percent, message) -> None:
+        self.job_status[key] = f"{message} {percent}%"; self.show_job_status()
+
+    def on_job_finished(self, key, result) -> None:
+        self.job_status.pop(key, None)
+        if result["kind"] == "symbols": self.symbol_index = result["index"]; return
+        if result["kind"] == "series":
+            self.show_job_status(); self.add_chart_series(result)
+            return
+        if result["kind"] == "series_many":
+            self.show_job_status()
+            for series in result["series"]: self.add_chart_series(series)
+            if result["failed"]: QMessageBox.warning(self, "Graph Status", "Could not load:\n" + "\n".join(result["failed"]))
+            return
+        print("Prediction finished.")  # DEBUG
+        # Show results
+        self.prediction_result_label.setText(f"""
 Completed Prediction. . .                       
 --- INPUTS RECEIVED ---
-Ticker: {ticker}
-Prediction Type: {selected_prediction_type}
-Risk Level: {risk_level}
-Time Period: {selected_time_period}
------------------------""")  # Temp text to show completion
-            # Popup message box to show success
-            QMessageBox.information(self, "Prediction Status", "Successful")
-
-        QTimer.singleShot(10000, finish_prediction_simulation)
+Ticker: {result['ticker']}
+Prediction Type: {result['prediction_type']}
+Risk Level: {result['risk_level']}
+Time Period: {result['time_period']}
+Rows Loaded: {result['rows']}
+--- PREDICTION ---
+Last Close: {result['prediction'].last_close:.2f}
+Expected Return: {result['prediction'].expected_return:+.2%}
+Predicted Price: {result['prediction'].predicted_price:.2f}
+Signal: {result['prediction'].signal}
+--- RISK ({result['risk'].paths:,} paths) ---
+Position: {result['risk'].profile.position:.0%} of capital
+Stop Loss / Take Profit: -{result['risk'].profile.stop_loss:.0%} / +{result['risk'].profile.take_profit:.0%}
+Return 5% / 50% / 95%: {result['risk'].return_p5:+.2%} / {result['risk'].return_p50:+.2%} / {result['risk'].return_p95:+.2%}
+Chance of Loss: {result['risk'].prob_loss:.0%}
+VaR / CVaR (95%): {result['risk'].var:.2%} / {result['risk'].cvar:.2%}
+Max Drawdown (median / 95%): {result['risk'].drawdown_p50:.2%} / {result['risk'].drawdown_p95:.2%}
+Stopped Out / Took Profit: {result['risk'].stopped_out:.0%} / {result['risk'].took_profit:.0%}
+-----------------------""")
+        # Popup message box to show success
+        QMessageBox.information(self, "Prediction Status", "Successful")
+
+    def add_chart_series(self, series) -> None:
+        self.chart.add_series(series["ticker"], series["close"], series["colour"])
+        if not series["matches"]: print(f"{series['ticker']} data has changed since the graph was saved.")
+
+    def on_job_failed(self, key, error) -> None:
+        self.job_status.pop(key, None); self.show_job_status()
+        if key == SYMBOL_INDEX_JOB: print(f"Ticker suggestions unavailable: {error}"); return
+        if key.endswith("|Chart"): QMessageBox.warning(self, "Graph Status", f"Could not load {key.split('|')[0]}: {error}"); return
+        QMessageBox.warning(self, "Prediction Status", f"Prediction failed: {error}")
+
+    def on_job_cancelled(self, key) -> None:
+        # Named after the kind of job stopped, like on_job_failed; the status lines of jobs still running take precedence
+        self.job_status.pop(key, None); self.show_job_status()
+        if key == SYMBOL_INDEX_JOB or self.job_status: return
+        self.prediction_result_label.setText("Chart load cancelled." if key.endswith("|Chart") else "Prediction cancelled.")
 
     def save_graph(self, input_box) -> None:
-        # Function to save the state of the graph when button pressed (TBD: to be developed further)
-        print(f"Saved. {input_box.text()}")
+        # Save the chart as a workspace snapshot (series reference the tick store by hash; no data is copied)
+        import workspace
+        try: path = workspace.save_snapshot(workspace.capture(self.chart, input_box.text().strip()))
+        except (ValueError, OSError) as e: QMessageBox.warning(self, "Save Error", str(e)); return
+        print(f"Saved. {path}")
+        self.show_toast("Saved.")
+
+    def open_graph(self, name) -> None:
+        # Restore a saved graph: the view and annotations appear immediately, the series load together in a background job
+        import workspace
+        try: snapshot = workspace.load_snapshot(name)
+        except (ValueError, OSError, KeyError) as e: QMessageBox.warning(self, "Open Error", str(e)); return
+        for key in self.scheduler.running():
+            if key.endswith("|Chart"): self.scheduler.cancel(key)
+        self.chart.clear()
+        self.chart.normalize = snapshot.normalize; self.chart.annotations = list(snapshot.annotations)
+        self.chart.indicators = [workspace.build_indicator(spec) for spec in snapshot.indicators]
+        self.chart.set_view_range(snapshot.view_range)
+        if not snapshot.series: return
+        key = f"{snapshot.name}|Chart"
+        if self.scheduler.submit(key, load_saved_graph_job, snapshot.series): self.job_status[key] = "Queued..."; self.show_job_status()
+
+    def show_toast(self, text) -> None:
+        # Show a short message over the window that closes itself
         msg = QWidget(self); msg.setWindowFlags(Qt.FramelessWindowHint | Qt.BypassWindowManagerHint); msg.setAttribute(Qt.WA_DeleteOnClose)
 
         layout = QVBoxLayout(msg)
-        label = QLabel("Saved."); label.setStyleSheet("background-color: black; color: white; padding: 5px; border-radius: 5px;"); layout.addWidget(label)
+        label = QLabel(text); label.setStyleSheet("background-color: black; color: white; padding: 5px; border-radius: 5px;"); layout.addWidget(label)
 
         msg.adjustSize(); pos = self.rect().center() - msg.rect().center(); msg.move(pos); msg.show()
         QTimer.singleShot(2000, msg.close)
@@ -206,7 +497,7 @@ Time Period: {selected_time_period}
     def show_graph_save_popup(self, btn) -> None:
         # Function to show popup for saving graph (TBD: to be developed further)
         # Creates popup dialog and positions it below the button
-        popup = QDialog(self); popup.setWindowTitle(btn.name); popup.setModal(True); popup.setFixedSize(200, 100)
+        popup = QDialog(self); popup.setWindowTitle(btn.name); popup.setModal(True); popup.setFixedSize(200, 150)
         btn_pos = btn.mapToGlobal(btn.rect().bottomLeft())
         popup.move(btn_pos.x()-50, btn_pos.y())
 
@@ -219,7 +510,14 @@ Time Period: {selected_time_period}
         def save_and_close(): self.save_graph(input_box); popup.accept()
         input_box.returnPressed.connect(save_and_close)
 
-        layout.addWidget(label); layout.addWidget(input_box); layout.addStretch()
+        # Or pick a saved graph to open it
+        import workspace
+        saved_box = QComboBox(); saved_box.addItem("Open saved graph..."); saved_box.addItems(workspace.list_snapshots())
+        def open_and_close(index):
+            if index > 0: popup.accept(); self.open_graph(saved_box.itemText(index))
+        saved_box.activated.connect(open_and_close)
+
+        layout.addWidget(label); layout.addWidget(input_box); layout.addWidget(saved_box); layout.addStretch()
         popup.setLayout(layout); popup.exec_()
 
     def make_indv_btn(self, name, group, img, width = None, height = None) -> QPushButton:
@@ -232,10 +530,7 @@ Time Period: {selected_time_period}
         elif height and not width: btn.setFixedHeight(height)
         elif width and not height: btn.setFixedWidth(width)
             
-        btn.setStyleSheet(f"""
-        QPushButton {{background-image: url('{btn.img}'); background-repeat: no-repeat; background-position: center; background-color: #e3e3e3}}
-        QPushButton:hover {{background-color: #adadad}}
-        QPushButton:pressed {{background-color: #858585}}        """)
+        btn.setIcon(assets.icon(img)); btn.setIconSize(assets.pixmap(img).size()); theme.set_kind(btn, "action")
         btn.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
 
         # Call testfunc on click
@@ -252,26 +547,11 @@ Time Period: {selected_time_period}
         elif height and not width: btn.setFixedHeight(height)
         elif width and not height: btn.setFixedWidth(width)
         
-        btn.setStyleSheet("""
-        QPushButton {background-color: #e3e3e3; font-size: 13px; font-family: Aller display}
-        QPushButton:hover {background-color: #adadad}""")
-        btn.setText(btn.text)
-
-        # Define how other buttons in group respond when one is clicked
-        def handle_text_grp_btn_click(clicked_btn):
-            for grp_btn in self.btns[clicked_btn.group]:
-                if grp_btn == clicked_btn:
-                    # Set state to clicked style
-                    grp_btn.setStyleSheet("QPushButton {background-color: #8a8a8a; font-size: 13px; font-family: Aller display}")
-                    self.testfunc(grp_btn)
-                else:
-                    # Set state to unclicked style
-                    grp_btn.setChecked(False)
-                    grp_btn.setStyleSheet("""QPushButton {background-color: #e3e3e3; font-size: 13px; font-family: Aller display}
-                                          QPushButton:hover {background-color: #adadad} """)
-
-        # Call click handler on click
-        btn.clicked.connect(lambda checked: handle_text_grp_btn_click(btn))
+        theme.set_kind(btn, "option"); btn.setText(btn.text)
+
+        # The group unchecks the previously selected button; the :checked style follows without touching any stylesheet
+        self.btn_group(group).addButton(btn)
+        btn.clicked.connect(lambda checked: self.testfunc(btn))
         self.btns[group].append(btn); return btn
 
     def make_img_grp_btn(self, name, group, img, width = None, height = None) -> QPushButton:
@@ -284,27 +564,18 @@ Time Period: {selected_time_period}
         elif height and not width: btn.setFixedHeight(height)
         elif width and not height: btn.setFixedWidth(width)
 
-        btn.setStyleSheet(f"""
-        QPushButton {{background-image: url('{btn.img}'); background-repeat: no-repeat; background-position: center; background-color: #e3e3e3}}
-        QPushButton:hover {{background-color: #adadad}}""")
-
-        # Define how other buttons in group respond when one is clicked
-        def handle_img_grp_btn_click(clicked_btn):
-            for grp_btn in self.btns[clicked_btn.group]:
-                if grp_btn == clicked_btn:
-                    # Set state to clicked style
-                    grp_btn.setStyleSheet(f"""QPushButton {{background-image: url('{grp_btn.img}'); background-repeat: no-repeat; background-position: center; background-color: #8a8a8a}}""")
-                    self.testfunc(grp_btn)
-                else:
-                    # Set state to unclicked style
-                    grp_btn.setChecked(False)
-                    grp_btn.setStyleSheet(f"""QPushButton {{background-image: url('{grp_btn.img}'); background-repeat: no-repeat; background-position: center; background-color: #e3e3e3}}
-                                          QPushButton:hover {{background-color: #adadad}} """)
-
-        # Call click handler on click
-        btn.clicked.connect(lambda checked: handle_img_grp_btn_click(btn))
+        btn.setIcon(assets.icon(img)); btn.setIconSize(assets.pixmap(img).size()); theme.set_kind(btn, "tool")
+
+        # The group unchecks the previously selected button; the :checked style follows without touching any stylesheet
+        self.btn_group(group).addButton(btn)
+        btn.clicked.connect(lambda checked: self.testfunc(btn))
         self.btns[group].append(btn); return btn
 
+    def btn_group(self, group) -> QButtonGroup:
+        # Exclusive group for one set of selectable buttons: checking one unchecks the other, so only those two repaint
+        if group not in self.btn_groups: self.btn_groups[group] = QButtonGroup(self); self.btn_groups[group].setExclusive(True)
+        return self.btn_groups[group]
+
     def coloured_frame(self, colour, min_height=None) -> QFrame:    # TEMP FUNCTION
         # Create a frame with a coloured border
         frame = QFrame(); frame.setFrameShape(QFrame.StyledPanel); frame.setAutoFillBackground(True)
@@ -326,11 +597,11 @@ Time Period: {selected_time_period}
         painter.drawPixmap(0, 0, pixmap); painter.end()
         return mask
 
-    def closeEvent(self, event) -> None: event.accept()
+    def closeEvent(self, event) -> None: self.scheduler.shutdown(); event.accept()
 
 if __name__ == "__main__":
     # Start the application
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv); startup_timer.mark("widgets", "QApplication")
     window = MainWindow()
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,104 @@
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    # Shared between the GUI thread (which sets it) and the job (which checks it between steps)
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None: self._event.set()
+
+    def is_cancelled(self) -> bool: return self._event.is_set()
+
+    def check(self) -> None:
+        # Call between steps of a job to stop as soon as it is cancelled
+        if self._event.is_set(): raise JobCancelled()
+
+
+class JobSignals(QObject):
+    # Emitted from worker threads; Qt queues them so the connected slots run on the GUI thread
+    progress = pyqtSignal(str, int, str)  # key, percent, message
+    finished = pyqtSignal(str, object)  # key, result
+    failed = pyqtSignal(str, str)  # key, error message
+    cancelled = pyqtSignal(str)  # key
+
+
+class Job(QRunnable):
+    def __init__(self, key, fn, args, kwargs, signals):
+        # fn is called as fn(token, progress, *args, **kwargs) on a pool thread
+        super().__init__()
+        self.key = key; self.fn = fn; self.args = args; self.kwargs = kwargs
+        self.signals = signals; self.token = CancelToken()
+
+    def progress(self, percent, message="") -> None:
+        self.token.check()
+        self.signals.progress.emit(self.key, int(percent), message)
+
+    def run(self) -> None:
+        try:
+            result = self.fn(self.token, self.progress, *self.args, **self.kwargs)
+            self.token.check()
+            self.signals.finished.emit(self.key, result)
+        except JobCancelled:
+            self.signals.cancelled.emit(self.key)
+        except Exception as e:
+            self.signals.failed.emit(self.key, str(e))
+
+
+class JobScheduler(QObject):
+    # Runs jobs on a QThreadPool so the event loop never blocks, and hands CPU-bound work to a process pool
+    def __init__(self, max_threads=None, process_workers=None, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads: self.pool.setMaxThreadCount(max_threads)
+        self.process_workers = process_workers; self._process_pool = None; self._process_pool_lock = threading.Lock()
+        self.signals = JobSignals(self)
+        self._jobs = {}
+
+        # Forget jobs once they are done, whatever the outcome
+        self.signals.finished.connect(lambda key, result: self._jobs.pop(key, None))
+        self.signals.failed.connect(lambda key, error: self._jobs.pop(key, None))
+        self.signals.cancelled.connect(lambda key: self._jobs.pop(key, None))
+
+    def submit(self, key, fn, *args, **kwargs) -> bool:
+        # Start a job unless an identical one (same key) is already in flight. Returns True if it was started
+        if key in self._jobs: return False
+        job = Job(key, fn, args, kwargs, self.signals); job.setAutoDelete(False)  # self._jobs keeps it alive
+        self._jobs[key] = job; self.pool.start(job)
+        return True
+
+    def running(self) -> list: return list(self._jobs)
+
+    def cancel(self, key=None) -> None:
+        # Cancel one job, or every job if no key is given. Queued jobs are dropped, running ones stop at their next check
+        keys = [key] if key is not None else list(self._jobs)
+        for k in keys:
+            job = self._jobs.get(k)
+            if job is None: continue
+            job.token.cancel()
+            if self.pool.tryTake(job): self._jobs.pop(k, None); self.signals.cancelled.emit(k)
+
+    def run_in_process(self, token, fn, *args, poll_interval=0.1):
+        # Called from inside a job: runs fn(*args) in a worker process, waiting without blocking cancellation.
+        # Cancelling only stops waiting: a call still queued is dropped, but one a worker has started (e.g. a model fit)
+        # runs to the end and its result is thrown away. Workers are spawned, never forked from this multi-threaded process
+        with self._process_pool_lock:  # Several job threads may need the pool at once; only one creates it
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn"))
+        future = self._process_pool.submit(fn, *args)
+        while not future.done():
+            if token.is_cancelled(): future.cancel(); raise JobCancelled()
+            time.sleep(poll_interval)
+        return future.result()
+
+    def shutdown(self) -> None:
+        self.cancel(); self.pool.waitForDone(2000)
+        if self._process_pool is not None: self._process_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,37 @@
+import os
+import sys
+import time
+
+# Set STARTUP_REPORT=1 (or pass --startup-report) to print the report once the window is fully built
+REPORT_ENABLED = os.environ.get("STARTUP_REPORT", "") not in ("", "0") or "--startup-report" in sys.argv
+
+
+class StartupTimer:
+    # Splits app start into timed phases, each tagged with a category ("import", "widgets", "paint")
+    def __init__(self):
+        self.start = self.last = time.perf_counter(); self.phases = []; self.first_paint = None
+
+    def mark(self, category, name) -> float:
+        # Record the time since the previous mark as one phase
+        now = time.perf_counter(); elapsed = now - self.last; self.last = now
+        self.phases.append((category, name, elapsed))
+        if category == "paint" and self.first_paint is None: self.first_paint = now - self.start
+        return elapsed
+
+    def totals(self) -> dict:
+        totals = {}
+        for category, name, elapsed in self.phases: totals[category] = totals.get(category, 0.0) + elapsed
+        return totals
+
+    def report(self) -> str:
+        lines = ["--- STARTUP TIMES ---"]
+        lines += [f"{category:>8} | {name:<32} {elapsed * 1000:8.1f} ms" for category, name, elapsed in self.phases]
+        lines.append("---------------------")
+        lines += [f"{category:>8} | {'total':<32} {elapsed * 1000:8.1f} ms" for category, elapsed in self.totals().items()]
+        if self.first_paint is not None: lines.append(f"First window paint after {self.first_paint * 1000:.1f} ms")
+        lines.append(f"Fully built after {(self.last - self.start) * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+# Created on import, so importing this module first starts the clock before anything heavy is loaded
+startup_timer = StartupTimer()
@@ -0,0 +1,30 @@
+from PyQt5.QtWidgets import QApplication
+
+# Button colours for each state. The whole stylesheet is formatted from these once, at import, and set on the
+# application; buttons only carry a "kind" property, and selection is their checked state, so no click ever re-parses CSS
+COLOURS = {"Default": "#e3e3e3", "Hover": "#adadad", "Clicked": "#858585", "Selected": "#8a8a8a"}
+BUTTON_FONT = "font-size: 13px; font-family: Aller display"
+
+# kind="action": one-off buttons (toolbar, confirm/reroll). kind="tool"/"option": image/text buttons of which one per
+# group is selected. kind="toggle": a checkable button whose icon shows its state, so checking it keeps the default colour
+STYLESHEET = f"""
+QPushButton[kind="action"], QPushButton[kind="tool"], QPushButton[kind="option"], QPushButton[kind="toggle"] {{background-color: {COLOURS['Default']}}}
+QPushButton[kind="action"]:hover, QPushButton[kind="tool"]:hover, QPushButton[kind="option"]:hover, QPushButton[kind="toggle"]:hover {{background-color: {COLOURS['Hover']}}}
+QPushButton[kind="action"]:pressed {{background-color: {COLOURS['Clicked']}}}
+QPushButton[kind="tool"]:checked, QPushButton[kind="option"]:checked {{background-color: {COLOURS['Selected']}}}
+QPushButton[kind="toggle"]:checked {{background-color: {COLOURS['Default']}}}
+QPushButton[kind="toggle"]:checked:hover {{background-color: {COLOURS['Hover']}}}
+QPushButton[kind="option"] {{{BUTTON_FONT}}}
+"""
+
+
+def apply(app=None) -> None:
+    # Set the stylesheet on the application - the one full style pass, done before any window is built
+    app = app or QApplication.instance()
+    if app.styleSheet() != STYLESHEET: app.setStyleSheet(STYLESHEET)
+
+
+def set_kind(btn, kind) -> None:
+    # Pick the rules a button is styled by. Set before it is first shown, so it is polished once with them
+    btn.setProperty("kind", kind)
+
@@ -0,0 +1,339 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import Qt
+from hover import throttled_mouse_moved
+from instrumentation import instrument
+
+# --- 1. Annotation Configuration ---
+BUCKET_SECONDS = 30 * 86400  # Width of a spatial index cell on the date axis
+INITIAL_CAPACITY = 64  # Rows allocated up front; the arrays double when full
+HIT_PIXELS = 8  # How close (in pixels) the mouse must be to a line or note to hit it
+NOTE_WIDTH_PIXELS = 200  # Notes are drawn to the right of their point, so culling looks this far left of the view
+PREFETCH_MARGIN = 0.5  # View widths kept drawn past each edge, so small pans reuse the items already made
+LINE_COLOUR = "#f1c40f"
+NOTE_COLOUR = (240, 240, 240)
+NOTE_FILL = (0, 0, 0, 160)
+HIGHLIGHT_COLOUR = "#e74c3c"
+
+LINE, NOTE = 0, 1
+
+
+class AnnotationStore:
+    """
+    Trendlines and notes in data coordinates (epoch seconds, price), one row each in preallocated
+    numpy arrays: kind, (x0, y0, x1, y1) and an alive flag (a note's end point is its start point).
+    A grid over the date axis maps each cell to the rows whose x extent touches it, so visibility and
+    hit-test queries only look at rows near the query instead of every annotation ever drawn.
+    Removed rows are only marked dead, so row ids stay stable for the graphics that reference them.
+    """
+
+    def __init__(self, bucket_width=BUCKET_SECONDS):
+        self.bucket_width = float(bucket_width)
+        self.clear()
+
+    def clear(self):
+        self.kind = np.zeros(INITIAL_CAPACITY, dtype=np.int8)
+        self.coords = np.zeros((INITIAL_CAPACITY, 4))
+        self.alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self.text = []
+        self.rows = 0
+        self.grid = {}  # cell -> set of row ids
+
+    def __len__(self):
+        return int(self.alive[:self.rows].sum())
+
+    def _cells(self, x0, x1):
+        return range(int(np.floor(x0 / self.bucket_width)), int(np.floor(x1 / self.bucket_width)) + 1)
+
+    def _extent(self, i):
+        x0, _, x1, _ = self.coords[i]
+        return min(x0, x1), max(x0, x1)
+
+    def _append(self, kind, coords, text):
+        if self.rows == len(self.kind):
+            grow = len(self.kind)
+            self.kind = np.concatenate((self.kind, np.zeros(grow, dtype=np.int8)))
+            self.coords = np.concatenate((self.coords, np.zeros((grow, 4))))
+            self.alive = np.concatenate((self.alive, np.zeros(grow, dtype=bool)))
+        i = self.rows
+        self.kind[i], self.coords[i], self.alive[i] = kind, coords, True
+        self.text.append(text)
+        self.rows += 1
+        for cell in self._cells(*self._extent(i)):
+            self.grid.setdefault(cell, set()).add(i)
+        return i
+
+    def add_line(self, x0, y0, x1, y1):
+        """Add a trendline between two points. Returns its row id."""
+        return self._append(LINE, (x0, y0, x1, y1), None)
+
+    def add_note(self, x, y, text):
+        """Add a text note anchored at a point. Returns its row id."""
+        return self._append(NOTE, (x, y, x, y), text)
+
+    def remove(self, i):
+        if not self.alive[i]:
+            return
+        self.alive[i] = False
+        for cell in self._cells(*self._extent(i)):
+            self.grid[cell].discard(i)
+
+    def query(self, x0, x1):
+        """Sorted ids of live rows whose x extent overlaps [x0, x1]."""
+        if not self.rows:
+            return np.zeros(0, dtype=np.int64)
+        cells = self._cells(x0, x1)
+        if len(cells) > len(self.grid):
+            # Zoomed out past more cells than are occupied: a scan of the arrays is cheaper than walking the grid
+            candidates = np.arange(self.rows)
+        else:
+            ids = set()
+            for cell in cells:
+                ids.update(self.grid.get(cell, ()))
+            candidates = np.fromiter(ids, dtype=np.int64, count=len(ids))
+        coords = self.coords[candidates]
+        low = np.minimum(coords[:, 0], coords[:, 2])
+        high = np.maximum(coords[:, 0], coords[:, 2])
+        return np.sort(candidates[self.alive[candidates] & (low <= x1) & (high >= x0)])
+
+    def nearest(self, x, y, pixel_x, pixel_y, threshold_pixels=HIT_PIXELS):
+        """
+        Id of the annotation closest to (x, y) within threshold_pixels, or None. Distances are measured
+        in screen pixels (pixel_x / pixel_y are data units per pixel), point-to-segment for lines.
+        """
+        ids = self.query(x - threshold_pixels * pixel_x, x + threshold_pixels * pixel_x)
+        if not len(ids):
+            return None
+        # Everything in pixels relative to the mouse, so dates and prices are on the same scale
+        x0, y0, x1, y1 = ((self.coords[ids, c] - origin) / scale
+                          for c, origin, scale in ((0, x, pixel_x), (1, y, pixel_y), (2, x, pixel_x), (3, y, pixel_y)))
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(length2 > 0, np.clip(-(x0 * dx + y0 * dy) / length2, 0, 1), 0.0)
+        distance = np.hypot(x0 + t * dx, y0 + t * dy)
+        best = int(np.argmin(distance))
+        return int(ids[best]) if distance[best] <= threshold_pixels else None
+
+    def to_dicts(self):
+        """Live annotations as JSON-friendly dicts, in the order they were drawn (the workspace format)."""
+        out = []
+        for i in np.flatnonzero(self.alive[:self.rows]):
+            x0, y0, x1, y1 = (float(v) for v in self.coords[i])
+            if self.kind[i] == LINE:
+                out.append({"kind": "line", "x0": x0, "y0": y0, "x1": x1, "y1": y1})
+            else:
+                out.append({"kind": "note", "x": x0, "y": y0, "text": self.text[i]})
+        return out
+
+    def load(self, dicts):
+        """Replace everything with annotations from to_dicts()."""
+        self.clear()
+        for item in dicts:
+            if item["kind"] == "line":
+                self.add_line(item["x0"], item["y0"], item["x1"], item["y1"])
+            elif item["kind"] == "note":
+                self.add_note(item["x"], item["y"], item["text"])
+
+
+# --- 2. Graphics ---
+class AnnotationLayer:
+    """
+    Draws an AnnotationStore on a PlotWidget. Only annotations in the visible range (plus a prefetch
+    margin) become graphics: all visible trendlines share one curve item drawn as point pairs, and
+    visible notes take TextItems from a pool, so panning across years of annotations never creates
+    or destroys more than the few items entering or leaving the view.
+    """
+
+    def __init__(self, plot_widget, prefetch=PREFETCH_MARGIN):
+        self.plot_widget = plot_widget
+        self.view_box = plot_widget.getPlotItem().vb
+        self.store = AnnotationStore()
+        self.prefetch = prefetch
+        self.lines = pg.PlotCurveItem(connect="pairs", pen=pg.mkPen(LINE_COLOUR, width=2))
+        self.highlight = pg.PlotCurveItem(connect="pairs", pen=pg.mkPen(HIGHLIGHT_COLOUR, width=3))
+        self.preview = pg.PlotCurveItem(pen=pg.mkPen(LINE_COLOUR, width=1, style=Qt.DashLine))
+        for item in (self.lines, self.highlight, self.preview):
+            plot_widget.addItem(item, ignoreBounds=True)  # Annotations never change the auto range
+        self.notes = {}  # row id -> TextItem currently shown
+        self._pool = []  # Hidden TextItems ready for reuse
+        self._drawn = None  # (x0, x1) the drawn items cover
+        self.hovered = None
+        self.view_box.sigXRangeChanged.connect(self.update)
+        self.view_box.sigResized.connect(self.update)
+
+    def pixel_scale(self):
+        px, py = self.view_box.viewPixelSize()
+        return abs(px), abs(py)
+
+    @instrument("AnnotationLayer.update")
+    def update(self, *args, force=False):
+        """Redraw for the current view - nothing is touched while the view stays inside the drawn range."""
+        x0, x1 = self.view_box.viewRange()[0]
+        width = x1 - x0
+        # Reuse the drawn items while the view stays inside them, unless a zoom in has left far more drawn than needed
+        if (not force and self._drawn is not None and self._drawn[0] <= x0 and x1 <= self._drawn[1]
+                and self._drawn[1] - self._drawn[0] <= 2 * (1 + 2 * self.prefetch) * width):
+            return
+        d0, d1 = x0 - self.prefetch * width, x1 + self.prefetch * width
+        self._drawn = (d0, d1)
+        ids = self.store.query(d0 - NOTE_WIDTH_PIXELS * self.pixel_scale()[0], d1)
+        kinds = self.store.kind[ids]
+
+        lines = ids[kinds == LINE]
+        coords = self.store.coords[lines]
+        self.lines.setData(coords[:, [0, 2]].ravel(), coords[:, [1, 3]].ravel())
+
+        notes = set(ids[kinds == NOTE].tolist())
+        self._release_notes([i for i in self.notes if i not in notes])
+        for i in notes - set(self.notes):
+            item = self._pool.pop() if self._pool else self._new_note_item()
+            x, y = self.store.coords[i, :2]
+            item.setText(self.store.text[i])
+            item.setPos(x, y)
+            item.show()
+            self.notes[i] = item
+        self._set_hovered(self.hovered if self.hovered is not None and self.store.alive[self.hovered] else None, force=True)
+
+    def _release_notes(self, ids):
+        for i in ids:
+            item = self.notes.pop(i)
+            item.hide()
+            item.fill = pg.mkBrush(NOTE_FILL)
+            self._pool.append(item)
+
+    def _new_note_item(self):
+        item = pg.TextItem(color=NOTE_COLOUR, anchor=(0, 1), fill=pg.mkBrush(NOTE_FILL))
+        self.plot_widget.addItem(item, ignoreBounds=True)
+        return item
+
+    def redraw(self):
+        self.update(force=True)
+
+    def add_line(self, x0, y0, x1, y1):
+        i = self.store.add_line(x0, y0, x1, y1)
+        self.redraw()
+        return i
+
+    def add_note(self, x, y, text):
+        i = self.store.add_note(x, y, text)
+        self.redraw()
+        return i
+
+    def remove(self, i):
+        self.store.remove(i)
+        if self.hovered == i:
+            self.hovered = None
+        self.redraw()
+
+    def load(self, dicts):
+        """Replace every annotation (e.g. from a saved workspace)."""
+        self._release_notes(list(self.notes))  # Row ids are reused by the new annotations
+        self.store.load(dicts)
+        self.hovered = None
+        self.redraw()
+
+    def to_dicts(self):
+        return self.store.to_dicts()
+
+    @instrument("AnnotationLayer.hit")
+    def hit(self, x, y, threshold_pixels=HIT_PIXELS):
+        """Id of the annotation under the view point (x, y), or None."""
+        return self.store.nearest(x, y, *self.pixel_scale(), threshold_pixels)
+
+    def _set_hovered(self, i, force=False):
+        # Only the previously and newly hovered annotations are repainted
+        previous, self.hovered = self.hovered, i
+        if previous != i or force:
+            for j, fill in ((previous, NOTE_FILL), (i, HIGHLIGHT_COLOUR)):
+                if j in self.notes:
+                    self.notes[j].fill = pg.mkBrush(fill)
+                    self.notes[j].update()
+        if i is not None and self.store.kind[i] == LINE:
+            x0, y0, x1, y1 = self.store.coords[i]
+            self.highlight.setData([x0, x1], [y0, y1])
+        else:
+            self.highlight.setData([], [])
+
+    def hover(self, x, y):
+        """Highlight whatever is under the view point (x, y). Returns its id or None."""
+        i = self.hit(x, y)
+        if i != self.hovered:
+            self._set_hovered(i)
+        return i
+
+    def set_preview(self, start=None, end=None):
+        """Dashed line from start to end while a trendline is being drawn; no arguments clears it."""
+        if start is None or end is None:
+            self.preview.setData([], [])
+        else:
+            self.preview.setData([start[0], end[0]], [start[1], end[1]])
+
+
+# --- 3. Drawing tools ---
+class AnnotationTool:
+    """
+    Mouse handling for the drawing tools. In "line" mode two clicks draw a trendline (with a dashed preview
+    following the mouse after the first), in "note" mode a click asks for text with `ask_text()` and places
+    a note, and in "mouse" mode nothing is drawn. In every mode the annotation under the mouse is
+    highlighted, and a right click in "line" or "note" mode deletes it.
+    """
+    MODES = ("mouse", "line", "note")
+
+    def __init__(self, layer, ask_text=None):
+        self.layer = layer
+        self.ask_text = ask_text
+        self.mode = "mouse"
+        self.anchor = None  # First point of a trendline being drawn
+        scene = layer.plot_widget.scene()
+        scene.sigMouseClicked.connect(self.on_click)
+        self.mouse_proxy = throttled_mouse_moved(scene, self.on_move)
+
+    def set_mode(self, mode):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown drawing mode {mode}. Choose from {self.MODES}")
+        self.mode = mode
+        self.layer.view_box.setMenuEnabled(mode == "mouse")  # Right clicks delete while drawing, instead of opening the menu
+        self.anchor = None
+        self.layer.set_preview()
+
+    def _view_point(self, scene_pos):
+        if not self.layer.view_box.sceneBoundingRect().contains(scene_pos):
+            return None
+        point = self.layer.view_box.mapSceneToView(scene_pos)
+        return point.x(), point.y()
+
+    def on_move(self, scene_pos):
+        point = self._view_point(scene_pos)
+        if point is None:
+            return
+        self.layer.hover(*point)
+        if self.anchor is not None:
+            self.layer.set_preview(self.anchor, point)
+
+    def on_click(self, ev):
+        point = self._view_point(ev.scenePos())
+        if point is None or self.mode == "mouse":
+            return
+        if ev.button() == Qt.RightButton:
+            hit = self.layer.hit(*point)
+            if hit is not None:
+                self.layer.remove(hit)
+            self.anchor = None
+            self.layer.set_preview()
+            ev.accept()
+            return
+        if ev.button() != Qt.LeftButton:
+            return
+        if self.mode == "line":
+            if self.anchor is None:
+                self.anchor = point
+            else:
+                self.layer.add_line(*self.anchor, *point)
+                self.anchor = None
+                self.layer.set_preview()
+        elif self.mode == "note" and self.ask_text is not None:
+            text = self.ask_text()
+            if text:
+                self.layer.add_note(*point, text)
+        ev.accept()
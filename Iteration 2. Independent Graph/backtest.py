@@ -0,0 +1,327 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from cache_manager import CacheManager
+from prediction import HORIZONS, MIN_TRAINING_ROWS, MODELS, RETURN_LAGS, LinearRegModel, build_features, data_version
+from shared_data import SharedFrameSpec, attach, plane
+from stock_cache import index_to_epoch_ns
+from tick_store import CACHE_DIR
+
+# --- 1. Backtest Configuration ---
+TRAIN_BARS = 504  # Rows each model is fitted on (two years of daily bars)
+TEST_BARS = 21  # Rows predicted with one fit before the window moves forward (one month of daily bars)
+COST_BPS = 5.0  # Charged on every unit of position change, in basis points
+BARS_PER_YEAR = 252
+WINDOWS_PER_TASK = 16  # Windows refitted per process pool task, for models without a rolling fit
+BACKTEST_VERSION = 1  # Bump when features, signals or P&L change, so results cached on disk are recomputed
+BACKTEST_EXT = ".backtest.npz"
+
+# dates are the tested bars as int64 epoch nanoseconds; predictions, positions, returns and equity are one value per tested bar
+BacktestResult = namedtuple("BacktestResult", ["ticker", "model", "period", "risk_level", "dates", "predictions",
+                                               "positions", "returns", "equity", "metrics"])
+
+
+def walk_forward_windows(rows, horizon, train_bars=TRAIN_BARS, test_bars=TEST_BARS):
+    """
+    (W, 4) array of [train_start, train_end, test_start, test_end) row ranges. The target of row i is the
+    return to row i + horizon, so training stops `horizon` rows before the test window - nothing is fitted
+    on a return that was not yet known when the window's predictions were made.
+    """
+    first = train_bars + horizon
+    if rows <= first:
+        return np.zeros((0, 4), dtype=np.int64)
+    test_start = np.arange(first, rows, test_bars)
+    test_end = np.minimum(test_start + test_bars, rows)
+    train_end = test_start - horizon
+    return np.column_stack((train_end - train_bars, train_end, test_start, test_end)).astype(np.int64)
+
+
+def forward_returns(features, horizon):
+    y = np.full(len(features.close), np.nan)
+    y[:-horizon] = features.log_close[horizon:] - features.log_close[:-horizon]
+    return y
+
+
+# --- 2. Walk-forward predictions ---
+def rolling_linear_predictions(features, y, windows):
+    """
+    Least squares on [1, X] for every window at once. Prefix sums of each row's X'X and X'y (with unusable
+    rows zeroed) give any window's normal equations as one subtraction, so the whole walk costs one pass
+    over the rows plus a batched solve of (features + 1)-square systems - no window is refitted from scratch.
+    """
+    design = np.column_stack((np.ones(len(y)), features.X))
+    valid = np.isfinite(design).all(axis=1) & np.isfinite(y)
+    design = np.where(valid[:, None], design, 0.0)
+    target = np.where(valid, y, 0.0)
+
+    k = design.shape[1]
+    xtx = np.zeros((len(y) + 1, k, k))
+    np.cumsum(design[:, :, None] * design[:, None, :], axis=0, out=xtx[1:])
+    xty = np.zeros((len(y) + 1, k))
+    np.cumsum(design * target[:, None], axis=0, out=xty[1:])
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    a, b = windows[:, 0], windows[:, 1]
+    coef = (np.linalg.pinv(xtx[b] - xtx[a]) @ (xty[b] - xty[a])[:, :, None])[:, :, 0]
+    enough = counts[b] - counts[a] >= MIN_TRAINING_ROWS
+
+    predictions = np.full(len(y), np.nan)
+    for (_, _, t0, t1), c, ok in zip(windows, coef, enough):
+        if ok:
+            predictions[t0:t1] = c[0] + features.X[t0:t1] @ c[1:]
+    return predictions
+
+
+def refit_predictions(features, y, model_name, windows):
+    """Fit a fresh model on each window's training rows and predict its test rows."""
+    predictions = np.full(len(y), np.nan)
+    usable = np.isfinite(features.X).all(axis=1)
+    for train_start, train_end, t0, t1 in windows:
+        rows = np.arange(train_start, train_end)
+        rows = rows[usable[rows] & np.isfinite(y[rows])]
+        test = np.arange(t0, t1)
+        test = test[usable[test]]
+        if len(rows) < MIN_TRAINING_ROWS or not len(test):
+            continue
+        predictions[test] = MODELS[model_name]().fit(features.X[rows], y[rows]).predict(features.X[test])
+    return predictions
+
+
+def predict_windows(source, model_name, horizon, windows):
+    """
+    Walk-forward predictions for some windows. `source` is the close array, or a SharedFrameSpec when run
+    in a worker process. Returns (first test row, predictions up to the last test row). Safe to run in a worker process.
+    """
+    if isinstance(source, SharedFrameSpec):
+        with attach(source) as shared:
+            return predict_windows(shared.column("Close"), model_name, horizon, windows)
+    features = build_features(source)
+    y = forward_returns(features, horizon)
+    if model_name == LinearRegModel.name:
+        predictions = rolling_linear_predictions(features, y, windows)
+    else:
+        predictions = refit_predictions(features, y, model_name, windows)
+    return int(windows[0, 2]), predictions[windows[0, 2]:windows[-1, 3]].copy()
+
+
+# --- 3. Strategy P&L ---
+def positions_from_predictions(predictions, features, horizon, risk_level):
+    """
+    Long, short or flat (1, -1, 0) on every row, with the same rule as prediction.signal_from_return:
+    the expected move must beat a risk-scaled fraction of the volatility expected over the horizon.
+    """
+    expected = np.expm1(predictions)
+    threshold = features.X[:, len(RETURN_LAGS)] * np.sqrt(horizon) * (11 - risk_level) / 10
+    with np.errstate(invalid="ignore"):
+        positions = np.where(expected > threshold, 1.0, np.where(expected < -threshold, -1.0, 0.0))
+    return np.where(np.isfinite(expected) & np.isfinite(threshold), positions, 0.0)
+
+
+def strategy_returns(close, positions, cost_bps=COST_BPS):
+    """
+    Per-bar strategy returns: the position taken at each close earns the next bar's return, minus costs on
+    every change of position. Positions are decided at the close, so there is no lookahead.
+    """
+    close = np.asarray(close, dtype=float)
+    bar_returns = np.zeros(len(close))
+    bar_returns[:-1] = close[1:] / close[:-1] - 1
+    turnover = np.abs(np.diff(positions, prepend=0.0))
+    return positions * bar_returns - turnover * cost_bps / 1e4
+
+
+def performance(returns, positions, close):
+    """Headline numbers for a run of per-bar strategy returns, next to buying and holding over the same bars."""
+    equity = np.cumprod(1 + returns)
+    if not len(returns):
+        return equity, {}
+    years = len(returns) / BARS_PER_YEAR
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0))
+    std = returns.std()
+    active = positions != 0
+    return equity, {
+        "bars": int(len(returns)),
+        "total_return": float(equity[-1] - 1),
+        "annual_return": float(equity[-1] ** (1 / years) - 1) if equity[-1] > 0 else -1.0,
+        "sharpe": float(returns.mean() / std * np.sqrt(BARS_PER_YEAR)) if std > 0 else 0.0,
+        "max_drawdown": float((1 - equity / peak).max()),
+        "hit_rate": float((returns[active] > 0).mean()) if active.any() else 0.0,
+        "exposure": float(active.mean()),
+        "trades": int(np.count_nonzero(np.diff(positions, prepend=0.0))),
+        "buy_and_hold": float(close[-1] / close[0] - 1),
+    }
+
+
+def evaluate(ticker, data, model_name, period, risk_level, first_row, predictions, cost_bps=COST_BPS):
+    """Turn a ticker's walk-forward predictions (from first_row on) into positions, P&L and metrics."""
+    close = data["Close"].to_numpy(dtype=float)
+    features = build_features(close)
+    horizon = HORIZONS[period]
+    rows = slice(first_row, first_row + len(predictions))
+    positions = positions_from_predictions(_pad(predictions, first_row, len(close)), features, horizon, risk_level)[rows]
+    returns = strategy_returns(close[rows], positions, cost_bps)
+    equity, metrics = performance(returns, positions, close[rows])
+    return BacktestResult(ticker, model_name, period, risk_level, index_to_epoch_ns(data.index)[rows], predictions,
+                          positions, returns, equity, metrics)
+
+
+def _pad(values, start, rows):
+    padded = np.full(rows, np.nan)
+    padded[start:start + len(values)] = values
+    return padded
+
+
+# --- 4. Disk cache ---
+def cache_path(cache_dir, ticker, model_name, period, risk_level):
+    """One file per ticker and setting; it is overwritten when the data or model version changes."""
+    return os.path.join(cache_dir, f"{ticker}.{model_name.replace(' ', '-')}-{period}-{risk_level}{BACKTEST_EXT}")
+
+
+def cache_key(data, model_name, period, risk_level, train_bars, test_bars, cost_bps):
+    """Digest of everything a result depends on: the data, the model's version and the backtest settings."""
+    parts = [data_version(data), model_name, MODELS[model_name].version, HORIZONS[period], risk_level,
+             train_bars, test_bars, cost_bps, BACKTEST_VERSION]
+    return hashlib.blake2b(json.dumps(parts).encode(), digest_size=12).hexdigest()
+
+
+def load_result(path, key):
+    """The cached result at `path` if it was computed for `key`, else None."""
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz["meta"]))
+            if meta["key"] != key:
+                return None
+            return BacktestResult(meta["ticker"], meta["model"], meta["period"], meta["risk_level"],
+                                  npz["dates"], npz["predictions"], npz["positions"], npz["returns"], npz["equity"],
+                                  meta["metrics"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_result(cache, path, key, result):
+    meta = {"key": key, "ticker": result.ticker, "model": result.model, "period": result.period,
+            "risk_level": result.risk_level, "metrics": result.metrics}
+
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=json.dumps(meta), dates=result.dates, predictions=result.predictions,
+                     positions=result.positions, returns=result.returns, equity=result.equity)
+    cache.write(path, write, group=result.ticker, sync=False)
+
+
+# --- 5. Running ---
+def backtest_many(datasets, model_name, period, risk_level, train_bars=TRAIN_BARS, test_bars=TEST_BARS,
+                  cost_bps=COST_BPS, max_workers=None, cache_dir=CACHE_DIR):
+    """
+    Walk-forward backtests for many tickers ({ticker: OHLCV frame}). Results cached on disk for the same
+    data, model version and settings are loaded; the rest are published to shared memory and fanned out
+    over a process pool - one task per ticker for the rolling linear fit, one per WINDOWS_PER_TASK windows
+    for models refitted on every window. max_workers=1 runs everything in this process.
+    Returns {ticker: BacktestResult or Exception}.
+    """
+    if model_name not in MODELS:
+        raise ValueError(f"Unknown model {model_name}. Choose from {list(MODELS)}")
+    horizon = HORIZONS[period]
+    cache = CacheManager.for_dir(cache_dir) if cache_dir else None
+    results, pending = {}, {}
+    for ticker, data in datasets.items():
+        key = cache_key(data, model_name, period, risk_level, train_bars, test_bars, cost_bps)
+        path = cache_path(cache_dir, ticker, model_name, period, risk_level) if cache else None
+        cached = load_result(path, key) if cache and os.path.exists(path) else None
+        if cached is not None:
+            results[ticker] = cached
+            continue
+        windows = walk_forward_windows(len(data), horizon, train_bars, test_bars)
+        if not len(windows):
+            results[ticker] = ValueError(f"Not enough history for {ticker} to backtest {train_bars} bars of training")
+            continue
+        pending[ticker] = (key, path, windows)
+
+    tasks = []
+    for ticker, (_, _, windows) in pending.items():
+        step = len(windows) if model_name == LinearRegModel.name else WINDOWS_PER_TASK
+        tasks += [(ticker, windows[i:i + step]) for i in range(0, len(windows), step)]
+
+    parts = {ticker: [] for ticker in pending}
+    if max_workers == 1 or len(tasks) <= 1:
+        for ticker, windows in tasks:
+            try:
+                parts[ticker].append(predict_windows(datasets[ticker]["Close"].to_numpy(dtype=float), model_name, horizon, windows))
+            except Exception as e:
+                results[ticker] = e
+    else:
+        published = {}
+        try:
+            for ticker in pending:
+                published[ticker] = plane.publish(ticker, datasets[ticker])
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [(ticker, pool.submit(predict_windows, published[ticker].spec, model_name, horizon, windows))
+                           for ticker, windows in tasks]
+                for ticker, future in futures:
+                    try:
+                        parts[ticker].append(future.result())
+                    except Exception as e:
+                        results[ticker] = e
+        finally:
+            for shared in published.values():
+                plane.release(shared)
+
+    for ticker, (key, path, windows) in pending.items():
+        if ticker in results:
+            continue
+        first_row = parts[ticker][0][0]
+        predictions = np.concatenate([values for _, values in parts[ticker]])
+        result = evaluate(ticker, datasets[ticker], model_name, period, risk_level, first_row, predictions, cost_bps)
+        if cache:
+            save_result(cache, path, key, result)
+        results[ticker] = result
+    return results
+
+
+def backtest(ticker, data, model_name, period, risk_level, **kwargs):
+    """Walk-forward backtest of one ticker - see backtest_many. Raises if it cannot be run."""
+    result = backtest_many({ticker: data}, model_name, period, risk_level, **kwargs)[ticker]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def main(argv=None):
+    from tick_store import TickStore
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of a prediction model over cached tickers.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--model", default=LinearRegModel.name, choices=list(MODELS))
+    parser.add_argument("--period", default="Day", choices=list(HORIZONS))
+    parser.add_argument("--risk", type=int, default=4)
+    parser.add_argument("--train", type=int, default=TRAIN_BARS)
+    parser.add_argument("--test", type=int, default=TEST_BARS)
+    parser.add_argument("--cost-bps", type=float, default=COST_BPS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    datasets = {}
+    for ticker in args.tickers:
+        data = TickStore(ticker, args.cache_dir).read()
+        if data is None or data.empty:
+            print(f"{ticker}: nothing cached")
+            continue
+        datasets[ticker] = data
+    results = backtest_many(datasets, args.model, args.period, args.risk, args.train, args.test, args.cost_bps,
+                            args.workers, args.cache_dir)
+    for ticker, result in results.items():
+        if isinstance(result, Exception):
+            print(f"{ticker}: {result}")
+            continue
+        m = result.metrics
+        print(f"{ticker}: {m['bars']} bars  return {m['total_return']:+.1%} (buy and hold {m['buy_and_hold']:+.1%})  "
+              f"sharpe {m['sharpe']:.2f}  max drawdown {m['max_drawdown']:.1%}  hit rate {m['hit_rate']:.0%}  trades {m['trades']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
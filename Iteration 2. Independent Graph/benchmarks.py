@@ -0,0 +1,284 @@
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Headless - must be set before Qt is imported
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from PyQt5.QtCore import QPointF, QT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+import plot_candlestick
+import plot_line_graph
+from fetch_pipeline import StubDownloader, synthetic_ohlcv
+from tick_store import TickStore
+
+# --- 1. Benchmark Configuration ---
+SIZES = {"1k": 1_000, "100k": 100_000, "10M": 10_000_000}
+TICKER = "BENCH"
+FREQ = "min"  # Minute bars, so 10M rows still fit in pandas' timestamp range
+REPEATS = 5
+HOVER_EVENTS = 2_000
+DRAG_EVENTS = 50
+WINDOW_SIZE = (1200, 600)
+TOLERANCE = 0.25  # A benchmark regresses if its median is this much slower than the baseline
+OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results.json")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+class FakeDragEvent:
+    """Stands in for pyqtgraph's MouseDragEvent so custom_mouseDragEvent can be driven directly."""
+
+    def __init__(self, pos, start=False, finish=False):
+        self._pos, self._start, self._finish = pos, start, finish
+
+    def button(self):
+        return 1
+
+    def pos(self):
+        return self._pos
+
+    def isStart(self):
+        return self._start
+
+    def isFinish(self):
+        return self._finish
+
+    def accept(self):
+        pass
+
+
+def summarize(samples, per_event=None):
+    """Median/min/mean of a list of timings in seconds, plus per-event percentiles if given."""
+    samples = np.asarray(samples)
+    result = {"median_s": float(np.median(samples)), "min_s": float(samples.min()),
+              "mean_s": float(samples.mean()), "repeats": len(samples)}
+    if per_event is not None:
+        per_event = np.asarray(per_event)
+        result.update({"events": len(per_event), "event_p50_us": float(np.percentile(per_event, 50) * 1e6),
+                       "event_p99_us": float(np.percentile(per_event, 99) * 1e6)})
+    return result
+
+
+def timed(fn, repeats=REPEATS, setup=None):
+    """Run fn() `repeats` times (after setup(), untimed, if given) and return the timings."""
+    timings = []
+    for _ in range(repeats):
+        args = setup() if setup is not None else ()
+        t0 = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def close_plot(plot):
+    plot.window.close()
+    plot.window.deleteLater()
+    QApplication.processEvents()
+
+
+# --- 2. Benchmarks ---
+# Each takes the synthetic frame and a scratch directory and returns {benchmark name: summary}
+
+
+def bench_data(frame, scratch, repeats):
+    """load_cached_data from a warm cache, and get_stock_data into an empty cache through a stub downloader."""
+    start, end = frame.index[0], frame.index[-1] + pd.Timedelta(days=1)
+    stub = StubDownloader(frames={TICKER: frame})
+    results = {}
+
+    warm_dir = os.path.join(scratch, "warm")
+    TickStore(TICKER, warm_dir).merge(frame, start, end)
+    plot_line_graph.CACHE_DIR = warm_dir
+    results["load_cached_data"] = summarize(timed(lambda: plot_line_graph.load_cached_data(TICKER, start, end), repeats))
+
+    def fresh_cache():
+        cold_dir = os.path.join(scratch, "cold")
+        shutil.rmtree(cold_dir, ignore_errors=True)
+        plot_line_graph.CACHE_DIR = cold_dir
+        return ()
+
+    original_download = plot_line_graph.download_data
+    plot_line_graph.download_data = stub
+    try:
+        results["get_stock_data"] = summarize(timed(lambda: plot_line_graph.get_stock_data(TICKER, start, end),
+                                                    repeats, setup=fresh_cache))
+    finally:
+        plot_line_graph.download_data = original_download
+    return results
+
+
+def bench_line_plot(frame, scratch, repeats):
+    """Curve setup, first paint, per-event hover hit tests and drag-to-stretch on the line chart."""
+    close = frame["Close"]
+    results = {}
+    setup_times, paint_times = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        plot = plot_line_graph.build_stock_plot(close, ohlcv=None, indicators=[])
+        setup_times.append(time.perf_counter() - t0)
+        plot.window.resize(*WINDOW_SIZE)
+        plot.window.show()
+        QApplication.processEvents()
+        t0 = time.perf_counter()
+        plot.window.grab()
+        paint_times.append(time.perf_counter() - t0)
+        close_plot(plot)
+    results["plot_stock_data.setup"] = summarize(setup_times)
+    results["plot_stock_data.first_paint"] = summarize(paint_times)
+
+    plot = plot_line_graph.build_stock_plot(close, ohlcv=None, indicators=[])
+    plot.window.resize(*WINDOW_SIZE)
+    plot.window.show()
+    QApplication.processEvents()
+
+    # Hover: random points over the visible range, half of them on the curve
+    rng = np.random.default_rng(0)
+    (x0, x1), (y0, y1) = plot.view_box.viewRange()
+    xs = rng.uniform(x0, x1, HOVER_EVENTS)
+    ys = rng.uniform(y0, y1, HOVER_EVENTS)
+    x_data = close.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+    on_curve = np.interp(xs, x_data, close.to_numpy(dtype=float))
+    ys[::2] = on_curve[::2]
+    points = [QPointF(x, y) for x, y in zip(xs, ys)]
+    run_times, per_event = [], []
+    for _ in range(repeats):
+        t_run = time.perf_counter()
+        for point in points:
+            t0 = time.perf_counter()
+            plot.is_near_curve(point)
+            per_event.append(time.perf_counter() - t0)
+        run_times.append(time.perf_counter() - t_run)
+    results["is_near_curve"] = summarize(run_times, per_event)
+
+    # Drag along the bottom edge of the plot: each step rescales the x range and redraws the decimated curve
+    rect = plot.view_box.sceneBoundingRect()
+    y = rect.bottom() - 5
+    xs = np.linspace(rect.center().x(), rect.center().x() + rect.width() / 3, DRAG_EVENTS)
+    run_times, per_event = [], []
+    for _ in range(repeats):
+        plot.view_box.autoRange()
+        t_run = time.perf_counter()
+        for i, x in enumerate(xs):
+            event = FakeDragEvent(QPointF(x, y), start=i == 0, finish=i == len(xs) - 1)
+            t0 = time.perf_counter()
+            plot.mouse_drag_event(event)
+            per_event.append(time.perf_counter() - t0)
+        run_times.append(time.perf_counter() - t_run)
+    results["custom_mouseDragEvent"] = summarize(run_times, per_event)
+    close_plot(plot)
+    return results
+
+
+def bench_candlestick(frame, scratch, repeats):
+    """Candlestick chart construction and first paint."""
+    setup_times, paint_times = [], []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        plot = plot_candlestick.build_candlestick_plot(frame)
+        setup_times.append(time.perf_counter() - t0)
+        plot.window.show()
+        QApplication.processEvents()
+        t0 = time.perf_counter()
+        plot.window.grab()
+        paint_times.append(time.perf_counter() - t0)
+        close_plot(plot)
+    return {"plot_candlestick.setup": summarize(setup_times), "plot_candlestick.first_paint": summarize(paint_times)}
+
+
+BENCHMARKS = {"data": bench_data, "line": bench_line_plot, "candlestick": bench_candlestick}
+
+
+# --- 3. Running and comparing ---
+def run(sizes, groups, repeats=REPEATS):
+    """Run the chosen benchmark groups at each size. Returns the JSON-ready results document."""
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = {}
+    for label in sizes:
+        rows = SIZES[label]
+        frame = synthetic_ohlcv(rows, freq=FREQ)
+        scratch = tempfile.mkdtemp(prefix="bench_")
+        try:
+            for group in groups:
+                print(f"{group} [{label}]...", flush=True)
+                for name, summary in BENCHMARKS[group](frame, scratch, repeats).items():
+                    results[f"{name}[{label}]"] = summary
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        del frame
+    return {"meta": {"timestamp": pd.Timestamp.now().isoformat(timespec="seconds"), "platform": platform.platform(),
+                     "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                     "pyqtgraph": pg.__version__, "qt": QT_VERSION_STR, "qpa": app.platformName(),
+                     "repeats": repeats},
+            "results": results}
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """
+    Compare medians against a baseline. Returns (lines, regressions): one report line per benchmark
+    and the names of those slower than the baseline by more than `tolerance`.
+    """
+    lines, regressions = [], []
+    for name, summary in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            lines.append(f"{name:<45} {summary['median_s'] * 1000:10.3f} ms   (new)")
+            continue
+        ratio = summary["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = "  faster"
+        lines.append(f"{name:<45} {summary['median_s'] * 1000:10.3f} ms   {ratio:6.2f}x baseline{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the data, render and interaction paths.")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"comma separated, from {', '.join(SIZES)}")
+    parser.add_argument("--groups", default=",".join(BENCHMARKS), help=f"comma separated, from {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="save these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    groups = [g.strip() for g in args.groups.split(",") if g.strip()]
+    unknown = [s for s in sizes if s not in SIZES] + [g for g in groups if g not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown sizes or groups: {unknown}")
+
+    current = run(sizes, groups, args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=1)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} - run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    lines, regressions = compare(current, baseline, args.tolerance)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
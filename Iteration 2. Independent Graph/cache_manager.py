@@ -0,0 +1,386 @@
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# --- 1. Cache Manager Configuration ---
+# Every file in a cache directory is listed in a small JSON index with its size, modification time,
+# CRC32, when it was written and when it was last read. Files belong to a group (the ticker) and are
+# evicted together, least recently used first, whenever the directory grows past its byte budget.
+# All writes go to a temporary file that is renamed into place, and every change to the directory is
+# made under a lock file, so several app processes can share one cache.
+INDEX_FILE = "_cache_index.json"
+LOCK_FILE = "_cache.lock"
+INDEX_VERSION = 1
+BUDGET_BYTES = int(os.environ.get("STOCK_CACHE_BUDGET", 2 * 1024 ** 3))  # 2 GiB unless set
+ACCESS_RESOLUTION = 60.0  # Seconds - last-access times are only rewritten when older than this
+CRC_CHUNK = 1 << 20
+# Only files the app writes are indexed, evicted or discarded: tick store data, intervals and pyramids, and
+# cached backtests. Anything else in the directory (e.g. legacy `{ticker}_{start}_{end}.csv` range files,
+# which stay as replay sources after they are migrated) is never touched.
+MANAGED_EXTENSIONS = (".ohlcv", ".json", ".lod", ".npz")
+# Dot-separated parts after the ticker in each kind of file name: AAPL.ohlcv, AAPL.json, AAPL.Close.lod, AAPL.{setting}.backtest.npz
+NAME_SUFFIX_PARTS = {".ohlcv": 1, ".json": 1, ".lod": 2, ".npz": 3}
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_fd(fd):
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)  # Gives up after ~10 s, so keep trying
+                return
+            except OSError:
+                continue
+
+    def _unlock_fd(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_fd(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def file_crc32(path):
+    """CRC32 of a file, read a chunk at a time."""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CRC_CHUNK), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def atomic_replace(path, write, sync=True):
+    """
+    Run write(tmp_path) on a temporary file beside `path`, flush it to disk if `sync`, then rename it over
+    `path`. os.replace is atomic, so readers - and a crash or a full disk - see the old file or the new one,
+    never a half-written one. Temporary files are named `.tmp_*` so directory listings can skip them.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp_path)
+        if sync:
+            fd = os.open(tmp_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        os.chmod(tmp_path, 0o644)  # mkstemp files are private; caches and saved graphs are shared
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def group_of(file_name):
+    """
+    Group (ticker) a cache file belongs to: AAPL.ohlcv, AAPL.json and AAPL.Close.lod -> AAPL. Only the known
+    suffix is stripped, so tickers with dots in them (BRK.B.ohlcv -> BRK.B) stay whole. Used for files the
+    index has no entry for yet; writers pass their group explicitly.
+    """
+    return file_name.rsplit(".", NAME_SUFFIX_PARTS.get(os.path.splitext(file_name)[1], 1))[0]
+
+
+class FileLock:
+    """
+    Exclusive lock shared by every process (an OS lock on a lock file) and thread (an RLock) using it.
+    Re-entrant within a thread, so locked methods can call each other.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._owner = None  # Ident of the thread holding the lock
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+                try:
+                    _lock_fd(fd)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+            self._owner = threading.get_ident()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+        return False
+
+    def held(self):
+        """True in the thread holding the lock - other threads may be waiting while it is held."""
+        return self._owner == threading.get_ident()
+
+
+class CacheManager:
+    """
+    Index, integrity checks, atomic writes and size-bounded LRU eviction for one cache directory.
+    Use CacheManager.for_dir so every store in a process shares one manager (and one lock) per directory.
+    """
+
+    _managers = {}
+    _managers_lock = threading.Lock()
+
+    @classmethod
+    def for_dir(cls, cache_dir):
+        key = os.path.abspath(cache_dir)
+        with cls._managers_lock:
+            if key not in cls._managers:
+                cls._managers[key] = cls(key)
+            return cls._managers[key]
+
+    def __init__(self, cache_dir, budget=BUDGET_BYTES):
+        self.cache_dir = cache_dir
+        self.budget = budget
+        self.index_file = os.path.join(cache_dir, INDEX_FILE)
+        self._lock = FileLock(os.path.join(cache_dir, LOCK_FILE))
+        self._entries = {}
+        self._index_stamp = None
+        self._edits = None  # Index changes made under the lock, written once when it is released
+
+    # --- 2. Index ---
+    @contextmanager
+    def lock(self):
+        """
+        Hold while changing anything in the directory: `with manager.lock(): ...`. Nested uses are free,
+        and index changes made anywhere inside are saved once, when the outermost one exits.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock:
+            outermost = self._lock._depth == 1
+            try:
+                yield self
+            finally:
+                if outermost and self._edits is not None:
+                    entries, self._edits = self._edits, None
+                    self._save_index(entries)
+
+    def _edit(self):
+        """The index, for changing in place. Only call with lock() held."""
+        if self._edits is None:
+            self._edits = dict(self.entries(fresh=True))
+        return self._edits
+
+    @staticmethod
+    def _stamp(stat):
+        # Every save renames a new file into place, so the inode changes even if the mtime does not
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def entries(self, fresh=False):
+        """
+        {file name: entry} - re-read only when the index file has been replaced since it was last read.
+        Changes go through _edit(), which reads it fresh under lock(), so no update from another process is lost.
+        """
+        if self._edits is not None and self._lock.held():
+            return self._edits  # Only the thread making the edits sees them before they are saved
+        try:
+            stamp = self._stamp(os.stat(self.index_file))
+        except FileNotFoundError:
+            self._entries, self._index_stamp = {}, None
+            return self._entries
+        if fresh or stamp != self._index_stamp:
+            try:
+                with open(self.index_file, "r") as f:
+                    payload = json.load(f)
+                self._entries = payload["entries"] if payload.get("version") == INDEX_VERSION else {}
+            except (OSError, ValueError, KeyError):
+                self._entries = {}  # A damaged index is rebuilt by scan(); the files are still checked against their layouts
+            self._index_stamp = stamp
+        return self._entries
+
+    def _save_index(self, entries):
+        # Not fsynced: an index lost in a crash is rebuilt by scan(), and files it no longer vouches for are re-checksummed
+        atomic_replace(self.index_file, lambda tmp: self._dump(tmp, {"version": INDEX_VERSION, "entries": entries}), sync=False)
+        self._entries, self._index_stamp = entries, self._stamp(os.stat(self.index_file))
+
+    @staticmethod
+    def _dump(path, payload):
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=1)
+
+    @staticmethod
+    def _entry_for(path, group, crc=True):
+        stat = os.stat(path)
+        return {"group": group, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "crc32": file_crc32(path) if crc else None, "written_at": stat.st_mtime, "last_access": time.time()}
+
+    # --- 3. Writing ---
+    def write(self, path, write, group=None, sync=True):
+        """
+        Write a cache file atomically with write(tmp_path) and record it in the index. Pass sync=False
+        for small files whose loss in a crash is detected on read anyway (skips the fsync).
+        Callers that read-modify-write should hold lock() around the whole sequence.
+        """
+        with self.lock():
+            atomic_replace(path, write, sync)
+            self.record(path, group)
+
+    def record(self, path, group=None):
+        """Add or refresh the index entry of a file already in place (e.g. one renamed into the directory by its builder)."""
+        name = os.path.basename(path)
+        with self.lock():
+            entries = self._edit()
+            entries[name] = self._entry_for(path, group or group_of(name))
+
+    def written_at(self, path):
+        """When the file was last written (epoch seconds), or None if it is not in the index."""
+        entry = self.entries().get(os.path.basename(path))
+        return entry["written_at"] if entry else None
+
+    # --- 4. Reading ---
+    def verify(self, path, full=False, group=None):
+        """
+        True if `path` is intact. Size and modification time are compared with the index; the CRC is only
+        recomputed if they changed (or `full` is set), so the check is free on a normal open.
+        Files the index does not know yet are adopted as they are, into `group` (by default, group_of its name).
+        """
+        name = os.path.basename(path)
+        entry = self.entries().get(name)
+        if not os.path.exists(path):
+            return False
+        if entry is None:
+            self.record(path, group)
+            return True
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if entry["crc32"] is not None and stat.st_mtime_ns == entry["mtime_ns"] and not full:
+            return True
+        crc = file_crc32(path)
+        if entry["crc32"] is not None and crc != entry["crc32"]:
+            return False
+        with self.lock():
+            entries = self._edit()
+            if name in entries:
+                entries[name] = dict(entries[name], crc32=crc, mtime_ns=stat.st_mtime_ns)
+        return True
+
+    def touch(self, path):
+        """Mark a file as just used, for LRU eviction. Only written out once per ACCESS_RESOLUTION seconds."""
+        name = os.path.basename(path)
+        entry = self.entries().get(name)
+        now = time.time()
+        if entry is None or now - entry["last_access"] < ACCESS_RESOLUTION:
+            return
+        with self.lock():
+            entries = self._edit()
+            if name in entries:
+                entries[name] = dict(entries[name], last_access=now)
+
+    # --- 5. Eviction ---
+    def discard(self, group):
+        """Delete every file in a group (e.g. after a corrupt file is found) and drop it from the index."""
+        with self.lock():
+            entries = self._edit()
+            names = {name for name, entry in entries.items() if entry["group"] == group and self._is_cache_file(name)}
+            names |= {name for name in os.listdir(self.cache_dir) if self._is_cache_file(name) and group_of(name) == group}
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                entries.pop(name, None)
+
+    @staticmethod
+    def _is_cache_file(name):
+        return name not in (INDEX_FILE, LOCK_FILE) and not name.startswith(".tmp_") and name.endswith(MANAGED_EXTENSIONS)
+
+    def scan(self):
+        """Index managed files written by older versions or other tools, and drop entries whose files are gone (or aren't managed)."""
+        with self.lock():
+            names = {name for name in os.listdir(self.cache_dir) if self._is_cache_file(name)}
+            known = set(self.entries())
+            if names != known:
+                entries = self._edit()
+                for name in known - names:
+                    entries.pop(name, None)
+                for name in names - known:
+                    # The CRC is computed on first verify rather than here, so a scan stays cheap
+                    entries[name] = self._entry_for(os.path.join(self.cache_dir, name), group_of(name), crc=False)
+            return self.entries()
+
+    def total_size(self):
+        return sum(entry["size"] for entry in self.entries().values())
+
+    def evict(self, keep=()):
+        """
+        Delete whole groups, least recently used first, until the directory fits the byte budget.
+        Groups in `keep` (e.g. the ticker just written) are never evicted. Returns the evicted groups.
+        A process still reading an evicted file keeps its memory map; the space is freed when it closes.
+        """
+        with self.lock():
+            entries = self.scan()
+            total = sum(entry["size"] for entry in entries.values())
+            if total <= self.budget:
+                return []
+            groups = {}
+            for entry in entries.values():
+                size, last_access = groups.get(entry["group"], (0, 0.0))
+                groups[entry["group"]] = (size + entry["size"], max(last_access, entry["last_access"]))
+            evicted = []
+            for group, (size, last_access) in sorted(groups.items(), key=lambda item: item[1][1]):
+                if total <= self.budget:
+                    break
+                if group in keep:
+                    continue
+                self.discard(group)
+                total -= size
+                evicted.append(group)
+            if evicted:
+                print(f"Evicted {', '.join(evicted)} from {self.cache_dir} to stay under {self.budget / 1024 ** 2:.1f} MB")
+            return evicted
+
+
+def main(argv=None):
+    from tick_store import CACHE_DIR
+    parser = argparse.ArgumentParser(description="Check and trim a stock data cache directory.")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--verify", action="store_true", help="recompute every file's CRC32")
+    parser.add_argument("--budget", type=int, default=BUDGET_BYTES, help="byte budget to evict down to")
+    args = parser.parse_args(argv)
+
+    manager = CacheManager(args.cache_dir, args.budget)
+    entries = manager.scan()
+    print(f"{len(entries)} files, {manager.total_size() / 1024 ** 2:.1f} MB in {args.cache_dir}")
+    status = 0
+    if args.verify:
+        for name in sorted(entries):
+            if not manager.verify(os.path.join(args.cache_dir, name), full=True):
+                print(f"Corrupt: {name} - discarding {entries[name]['group']}")
+                manager.discard(entries[name]["group"])
+                status = 1
+    manager.evict()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
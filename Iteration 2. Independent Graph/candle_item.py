@@ -0,0 +1,143 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtGui import QPen, QBrush
+from instrumentation import instrument
+
+# --- 1. Candle Configuration ---
+BODY_WIDTH = 0.6  # Fraction of the spacing between bars taken up by a candle body
+UP_COLOUR = "#2ecc71"
+DOWN_COLOUR = "#e74c3c"
+
+
+def aggregate_candles(x, o, h, l, c, stride):
+    """Merge every `stride` consecutive candles into one: first open, max high, min low, last close."""
+    starts = np.arange(0, len(x), stride)
+    ends = np.minimum(starts + stride, len(x)) - 1
+    return x[starts], o[starts], np.maximum.reduceat(h, starts), np.minimum.reduceat(l, starts), c[ends]
+
+
+class CandlestickItem(pg.GraphicsObject):
+    """
+    Candlestick chart drawn from numpy OHLC arrays.
+    Only candles inside the visible x range are drawn. When more candles are in view than the
+    view box is wide in pixels they are merged into one candle per pixel, and all wicks and
+    bodies are built as four vectorized paths (up/down x wick/body) instead of one item per bar.
+    """
+
+    def __init__(self, x, o, h, l, c, up_colour=UP_COLOUR, down_colour=DOWN_COLOUR):
+        super().__init__()
+        self.up_colour = pg.mkColor(up_colour)
+        self.down_colour = pg.mkColor(down_colour)
+        self._paths = None
+        self._paths_key = None
+        self.set_data(x, o, h, l, c)
+
+    def set_data(self, x, o, h, l, c):
+        """Replace all candles. x must be sorted."""
+        self.x = np.asarray(x, dtype=float)
+        self.o, self.h, self.l, self.c = (np.asarray(a, dtype=float) for a in (o, h, l, c))
+        self.spacing = float(np.median(np.diff(self.x))) if len(self.x) > 1 else 1.0
+        self._low = np.nanmin(self.l) if len(self.l) else 0.0
+        self._high = np.nanmax(self.h) if len(self.h) else 0.0
+        self.invalidate()
+
+    def update_tail(self, x, o, h, l, c):
+        """
+        Point the item at arrays that differ from the current ones only in their last candle
+        (a bar was appended or the forming bar changed). Bounds are updated from that candle alone
+        and cached geometry is only dropped if the last candle is in view.
+        """
+        self.x = np.asarray(x, dtype=float)
+        self.o, self.h, self.l, self.c = (np.asarray(a, dtype=float) for a in (o, h, l, c))
+        if len(self.x) == 0:
+            return
+        if len(self.x) == 2:
+            self.spacing = float(self.x[1] - self.x[0])
+        self._low = min(self._low, self.l[-1]) if len(self.x) > 1 else self.l[-1]
+        self._high = max(self._high, self.h[-1]) if len(self.x) > 1 else self.h[-1]
+        if self._paths_key is not None and self._paths_key[1] >= len(self.x) - 1:
+            self._paths_key = None
+        self.prepareGeometryChange()
+        self.update()
+
+    def invalidate(self):
+        """Drop cached geometry and bounds after the data changes."""
+        self._paths_key = None
+        self.prepareGeometryChange()
+        self.update()
+
+    def boundingRect(self):
+        if not len(self.x):
+            return QRectF()
+        pad = self.spacing
+        return QRectF(self.x[0] - pad, self._low, self.x[-1] - self.x[0] + 2 * pad, self._high - self._low)
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        """Used by the view box auto-range; the y bounds follow the visible x range when asked."""
+        if not len(self.x):
+            return None, None
+        if ax == 0:
+            return self.x[0] - self.spacing, self.x[-1] + self.spacing
+        i0, i1 = 0, len(self.x)
+        if orthoRange is not None:
+            i0 = np.searchsorted(self.x, orthoRange[0], side="left")
+            i1 = np.searchsorted(self.x, orthoRange[1], side="right")
+            if i1 <= i0:
+                return None, None
+        return np.nanmin(self.l[i0:i1]), np.nanmax(self.h[i0:i1])
+
+    def viewRangeChanged(self):
+        # Called by pyqtgraph whenever the view box range changes
+        self.update()
+
+    def _visible_window(self):
+        view_box = self.getViewBox()
+        if view_box is None:
+            return 0, len(self.x), 1
+        x0, x1 = view_box.viewRange()[0]
+        i0 = max(np.searchsorted(self.x, x0, side="left") - 1, 0)
+        i1 = min(np.searchsorted(self.x, x1, side="right") + 1, len(self.x))
+        pixels = max(int(view_box.width()), 1)
+        stride = max(int(np.ceil((i1 - i0) / pixels)), 1)
+        # Snap the window to the stride so merged candles don't shift while panning
+        i0 -= i0 % stride
+        return i0, i1, stride
+
+    @instrument("CandlestickItem.build_paths")
+    def _build_paths(self, i0, i1, stride):
+        x, o, h, l, c = (a[i0:i1] for a in (self.x, self.o, self.h, self.l, self.c))
+        if stride > 1:
+            x, o, h, l, c = aggregate_candles(x, o, h, l, c, stride)
+        paths = []
+        for mask in (c >= o, c < o):
+            xm = np.repeat(x[mask], 2)
+            wick_y = np.empty(len(xm))
+            wick_y[0::2], wick_y[1::2] = l[mask], h[mask]
+            body_y = np.empty(len(xm))
+            body_y[0::2], body_y[1::2] = o[mask], c[mask]
+            paths.append((pg.arrayToQPath(xm, wick_y, connect="pairs"), pg.arrayToQPath(xm, body_y, connect="pairs")))
+        return paths
+
+    @instrument("CandlestickItem.paint")
+    def paint(self, painter, option, widget=None):
+        if not len(self.x):
+            return
+        key = self._visible_window()
+        if key != self._paths_key:
+            self._paths = self._build_paths(*key)
+            self._paths_key = key
+
+        body_width = self.spacing * key[2] * BODY_WIDTH
+        for (wick_path, body_path), colour in zip(self._paths, (self.up_colour, self.down_colour)):
+            wick_pen = QPen(colour)
+            wick_pen.setCosmetic(True)
+            painter.setPen(wick_pen)
+            painter.drawPath(wick_path)
+
+            # A body is a vertical open->close segment stroked with a pen as wide as the body.
+            # The pen is not cosmetic, so its width is in data x units, and flat caps keep the
+            # ends exactly at the open and close prices.
+            body_pen = QPen(QBrush(colour), body_width, Qt.SolidLine, Qt.FlatCap)
+            painter.setPen(body_pen)
+            painter.drawPath(body_path)
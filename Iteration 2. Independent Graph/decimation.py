@@ -0,0 +1,234 @@
+import os
+import numpy as np
+from instrumentation import instrument
+
+# --- 1. Decimation Configuration ---
+LEVEL_FACTOR = 4  # Each pyramid level merges this many buckets of the level below
+MIN_LEVEL_POINTS = 256  # Stop building levels once a level is this small
+PREFETCH_MARGIN = 0.5  # Fraction of the view width fetched beyond each edge, so small pans need no new read
+CHUNK_ROWS = 1 << 20  # Rows processed at a time when building a pyramid file (a multiple of LEVEL_FACTOR)
+
+# A pyramid file holds every level of one column's pyramid except the raw y values, which stay in the
+# cache file: a 64 byte header, level 0 x (float64 epoch seconds), then x, min and max for each level above.
+PYRAMID_EXT = ".lod"
+PYRAMID_MAGIC = b"LODPYR01"
+PYRAMID_HEADER = np.dtype([("magic", "S8"), ("factor", "<u8"), ("min_points", "<u8"), ("rows", "<u8"),
+                           ("stamp", "<i8"), ("reserved", "V24")])
+
+
+def build_pyramid(x, y, factor=LEVEL_FACTOR, min_points=MIN_LEVEL_POINTS):
+    """
+    Precompute min/max summaries of a sorted series at several resolutions.
+    Level 0 is the raw data; level k has one bucket per factor**k samples, stored as
+    (bucket start x, bucket min y, bucket max y). Built once per data load with reduceat,
+    so the cost is O(n) in total regardless of how many levels there are.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    levels = [(x, y, y)]
+    while len(levels[-1][0]) > min_points:
+        lx, lmin, lmax = levels[-1]
+        starts = np.arange(0, len(lx), factor)
+        levels.append((lx[starts], np.fmin.reduceat(lmin, starts), np.fmax.reduceat(lmax, starts)))
+    return levels
+
+
+def _window(lx, x0, x1):
+    """Index range of level x values covering [x0, x1], plus one bucket either side."""
+    return max(np.searchsorted(lx, x0, side="right") - 1, 0), min(np.searchsorted(lx, x1, side="left") + 1, len(lx))
+
+
+def choose_level(pyramid, x0, x1, pixels):
+    """Finest level with no more buckets in [x0, x1] than pixels (the coarsest level if none has so few)."""
+    pixels = max(int(pixels), 1)
+    for level, (lx, lmin, lmax) in enumerate(pyramid):
+        i0, i1 = _window(lx, x0, x1)
+        if i1 - i0 <= pixels:
+            return level
+    return len(pyramid) - 1
+
+
+def decimate(pyramid, x0, x1, pixels, margin=0.0):
+    """
+    Return (xs, ys, level) to draw the window [x0, x1] at roughly `pixels` buckets.
+    Picks the finest level with no more buckets in view than pixels, then emits each bucket's
+    min and max, so at most ~2 * pixels points are drawn whatever the length of the history.
+    One bucket either side of the window is included so the line runs off the edge of the view,
+    and `margin` widens the slice by that fraction of the window on each side at the same level.
+    Only the slice is read, so the levels can be memory-mapped files of any size.
+    """
+    level = choose_level(pyramid, x0, x1, pixels)
+    lx, lmin, lmax = pyramid[level]
+    width = (x1 - x0) * margin
+    i0, i1 = _window(lx, x0 - width, x1 + width)
+
+    if level == 0:
+        return lx[i0:i1], lmin[i0:i1], level
+
+    xs = np.repeat(lx[i0:i1], 2)
+    ys = np.empty(len(xs))
+    ys[0::2] = lmin[i0:i1]
+    ys[1::2] = lmax[i0:i1]
+    return xs, ys, level
+
+
+# --- 2. Pyramids on disk ---
+def level_lengths(rows, factor=LEVEL_FACTOR, min_points=MIN_LEVEL_POINTS):
+    """Length of every level of a pyramid over `rows` points, matching build_pyramid."""
+    lengths = [rows]
+    while lengths[-1] > min_points:
+        lengths.append(-(-lengths[-1] // factor))
+    return lengths
+
+
+def _pyramid_layout(rows, factor, min_points):
+    """(level lengths, byte offset of each level's blocks, total file size)."""
+    lengths = level_lengths(rows, factor, min_points)
+    offsets, offset = [], PYRAMID_HEADER.itemsize
+    for level, length in enumerate(lengths):
+        offsets.append(offset)
+        offset += 8 * length * (1 if level == 0 else 3)
+    return lengths, offsets, offset
+
+
+def _reduce_level(src_x, src_min, src_max, dst_x, dst_min, dst_max, factor, chunk_rows):
+    """Fill one pyramid level from the level below, a chunk at a time."""
+    for a in range(0, len(src_x), chunk_rows):
+        b = min(a + chunk_rows, len(src_x))
+        starts = np.arange(0, b - a, factor)
+        j = a // factor
+        dst_x[j:j + len(starts)] = src_x[a:b:factor]
+        dst_min[j:j + len(starts)] = np.fmin.reduceat(np.asarray(src_min[a:b]), starts)
+        dst_max[j:j + len(starts)] = np.fmax.reduceat(np.asarray(src_max[a:b]), starts)
+
+
+def build_pyramid_file(path, x, y, stamp=0, x_unit=1, factor=LEVEL_FACTOR, min_points=MIN_LEVEL_POINTS,
+                       chunk_rows=CHUNK_ROWS):
+    """
+    Write the pyramid for (x, y) to `path`, reading both a chunk at a time so memory use stays at
+    a few chunks however long the series is. x and y can be memory-mapped columns; x is divided by
+    `x_unit` and stored as float64 (e.g. x_unit=1e9 turns epoch nanoseconds into the seconds pyqtgraph plots).
+    `stamp` identifies the source data so a stale file can be detected (see open_pyramid_file).
+    """
+    chunk_rows -= chunk_rows % factor
+    rows = len(x)
+    lengths, offsets, size = _pyramid_layout(rows, factor, min_points)
+    tmp_path = path + ".tmp"
+    out = np.memmap(tmp_path, dtype=np.uint8, mode="w+", shape=(size,))
+    header = out[:PYRAMID_HEADER.itemsize].view(PYRAMID_HEADER)
+    header["magic"], header["factor"], header["min_points"] = PYRAMID_MAGIC, factor, min_points
+    header["rows"], header["stamp"] = rows, stamp
+
+    levels = _map_levels(out, lengths, offsets, y)
+    x0 = levels[0][0]
+    for a in range(0, rows, chunk_rows):
+        x0[a:a + chunk_rows] = np.asarray(x[a:a + chunk_rows]) / x_unit
+    for level in range(1, len(lengths)):
+        _reduce_level(*levels[level - 1], *levels[level], factor, chunk_rows)
+    out.flush()
+    del out, levels, x0, header
+    os.replace(tmp_path, path)
+
+
+def _map_levels(raw, lengths, offsets, y):
+    """Views of each level in a mapped pyramid file; level 0 uses `y` for both min and max."""
+    levels = []
+    for level, (length, offset) in enumerate(zip(lengths, offsets)):
+        blocks = [raw[offset + 8 * length * k:offset + 8 * length * (k + 1)].view("<f8")
+                  for k in range(1 if level == 0 else 3)]
+        levels.append((blocks[0], y, y) if level == 0 else tuple(blocks))
+    return levels
+
+
+def open_pyramid_file(path, y, stamp=None):
+    """
+    Memory-map a pyramid file as a list of (x, min, max) levels usable by decimate and LODCurve.
+    `y` is the raw column the file was built from (level 0). Returns None if the file is missing,
+    damaged, or was built from different data (stamp or row count mismatch), so it can be rebuilt.
+    """
+    if not os.path.exists(path):
+        return None
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if raw.size < PYRAMID_HEADER.itemsize:
+        return None
+    header = raw[:PYRAMID_HEADER.itemsize].view(PYRAMID_HEADER)[0]
+    if header["magic"] != PYRAMID_MAGIC or int(header["rows"]) != len(y):
+        return None
+    if stamp is not None and int(header["stamp"]) != stamp:
+        return None
+    lengths, offsets, size = _pyramid_layout(int(header["rows"]), int(header["factor"]), int(header["min_points"]))
+    if raw.size != size:
+        return None
+    return _map_levels(raw, lengths, offsets, y)
+
+
+# --- 3. Curve ---
+class LODCurve:
+    """
+    A pyqtgraph curve that only holds the decimated points for the visible x range.
+    The curve is refreshed from the pyramid whenever the view box range or size changes; the
+    fetched slice extends `prefetch` view widths past each edge, so pans within it are free.
+    Pass `pyramid` (e.g. from open_pyramid_file) to draw a series that is not in memory; x and y are then ignored.
+    """
+
+    def __init__(self, plot_widget, x, y, pyramid=None, prefetch=PREFETCH_MARGIN, **plot_kwargs):
+        self.pyramid = pyramid if pyramid is not None else build_pyramid(x, y)
+        self.prefetch = prefetch
+        self.view_box = plot_widget.getPlotItem().vb
+        self.curve = plot_widget.plot(connect="finite", **plot_kwargs)
+        self._fetched = None  # (level, first x, last x) of the slice in the curve
+        self.scale, self.offset = 1.0, 0.0
+
+        # Only the visible data is in the curve, so y auto-range must look at the visible part only
+        self.view_box.setAutoVisible(y=True)
+        self.view_box.sigXRangeChanged.connect(self.update)
+        self.view_box.sigResized.connect(self.update)
+
+        raw_x = self.pyramid[0][0]
+        if len(raw_x):
+            self.update(x_range=(raw_x[0], raw_x[-1]))
+
+    def set_data(self, x, y):
+        """Replace the series (e.g. with bars of another size) and redraw; the pyramid is rebuilt in memory."""
+        self.pyramid = build_pyramid(x, y)
+        self._fetched = None
+        self.update()
+
+    def set_transform(self, scale=1.0, offset=0.0):
+        """
+        Draw y as y * scale + offset (e.g. prices as percent change from a base price).
+        Min/max buckets map straight through a positive scale, so the pyramid is reused as is.
+        """
+        self.scale, self.offset = scale, offset
+        self._fetched = None
+        self.update()
+
+    @instrument("LODCurve.update")
+    def update(self, *args, x_range=None):
+        """Redraw the curve for the current view - called from the view box signals."""
+        raw_x, raw_y, _ = self.pyramid[0]
+        if not len(raw_x):
+            return
+        x0, x1 = x_range if x_range is not None else self.view_box.viewRange()[0]
+        pixels = self.view_box.width() or 1000  # width is 0 until the widget is first laid out
+
+        # Nothing to read if the view (clipped to the data) is still inside the fetched slice at the same level
+        if self._fetched is not None:
+            level, f0, f1 = self._fetched
+            lx = self.pyramid[level][0]
+            if (f0 <= max(x0, lx[0]) and min(x1, lx[-1]) <= f1
+                    and level == choose_level(self.pyramid, x0, x1, pixels)):
+                return
+
+        xs, ys, level = decimate(self.pyramid, x0, x1, pixels, self.prefetch)
+        if not len(xs):
+            return
+        self._fetched = (level, xs[0], xs[-1])
+
+        # Keep the first and last raw points, separated by NaN breaks, so the curve's data bounds
+        # (and so the auto-range button) still span the whole series rather than just the window
+        xs = np.concatenate(([raw_x[0], raw_x[0]], xs, [raw_x[-1], raw_x[-1]]))
+        ys = np.concatenate(([raw_y[0], np.nan], ys, [np.nan, raw_y[-1]]))
+        if self.scale != 1.0 or self.offset != 0.0:
+            ys = ys * self.scale + self.offset
+        self.curve.setData(xs, ys)
@@ -0,0 +1,172 @@
+import time
+import zlib
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+from tick_store import CACHE_DIR, TickStore
+
+# --- 1. Pipeline Configuration ---
+MAX_WORKERS = 8
+RETRIES = 3
+BACKOFF = 0.5  # Seconds before the first retry, doubled for every retry after that
+TIMEOUT = 30.0  # Seconds a single ticker may spend downloading before it is reported as timed out
+POLL_INTERVAL = 0.1
+
+FetchRequest = namedtuple("FetchRequest", ["ticker", "start", "end"])
+FetchResult = namedtuple("FetchResult", ["ticker", "start", "end", "data", "error", "source"])
+
+
+class FetchTimeout(Exception):
+    pass
+
+
+def threadsafe_yfinance_downloader(ticker, start, end):
+    """
+    yf.download shares module-level state between calls, so concurrent calls can mix tickers up.
+    yf.Ticker(...).history keeps its state on the Ticker object and is safe to run from several threads.
+    """
+    import yfinance as yf
+    data = yf.Ticker(ticker).history(start=start, end=end)
+    if data.index.tz is not None:
+        # Keep exchange-local dates so bars line up with the ones yf.download wrote
+        data.index = data.index.tz_localize(None)
+    return data
+
+
+def synthetic_ohlcv(rows, start="2000-01-03", freq="B", seed=0, start_price=100.0):
+    """Random-walk OHLCV frame, used to stand in for real downloads in tests and benchmarks."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=rows, freq=freq)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    return pd.DataFrame({"Open": open_,
+                         "High": np.maximum(open_, close) + spread,
+                         "Low": np.minimum(open_, close) - spread,
+                         "Close": close,
+                         "Volume": rng.integers(1_000_000, 50_000_000, rows).astype(float)}, index=index)
+
+
+class StubDownloader:
+    """
+    Local stand-in for yfinance with the same (ticker, start, end) signature as the real downloaders.
+    Serves `frames[ticker]` (or a synthetic series) sliced to the requested range, after `latency`
+    seconds. `failures[ticker]` makes the first N calls for that ticker raise ConnectionError.
+    """
+
+    def __init__(self, frames=None, latency=0.0, failures=None, rows=10_000):
+        self.frames = dict(frames or {})
+        self.latency = latency
+        self.failures = dict(failures or {})
+        self.rows = rows
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker, start, end):
+        with self._lock:
+            self.calls.append((ticker, start, end))
+            if ticker not in self.frames:
+                self.frames[ticker] = synthetic_ohlcv(self.rows, seed=zlib.crc32(ticker.encode()))
+            failing = self.failures.get(ticker, 0) > 0
+            if failing:
+                self.failures[ticker] -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            raise ConnectionError(f"Stub failure for {ticker}")
+        data = self.frames[ticker]
+        return data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+
+
+def with_retries(downloader, cancelled, retries=RETRIES, backoff=BACKOFF):
+    """Wrap a downloader so exceptions (or a None result) are retried with exponential backoff and jitter."""
+    def download(ticker, start, end):
+        delay = backoff
+        for attempt in range(retries + 1):
+            if cancelled.is_set():
+                return None
+            try:
+                data = downloader(ticker, start, end)
+                if data is not None:
+                    return data
+                error = "downloader returned no data"
+            except Exception as e:
+                error = e
+            if attempt < retries:
+                print(f"Download of {ticker} failed ({error}), retrying in {delay:.1f}s...")
+                # Event.wait doubles as an interruptible sleep so a timed-out ticker stops promptly
+                cancelled.wait(delay * random.uniform(0.8, 1.2))
+                delay *= 2
+        raise ConnectionError(f"Giving up on {ticker} after {retries + 1} attempts: {error}")
+    return download
+
+
+def fetch_many(requests, downloader=threadsafe_yfinance_downloader, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS,
+               retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT, save=True):
+    """
+    Fetch many (ticker, start, end) requests, yielding a FetchResult as each one finishes.
+    Cached requests are yielded first without touching the pool. The rest are grouped by ticker
+    (each ticker's store is only ever written by one worker) and downloaded concurrently.
+    """
+    requests = [FetchRequest(*r) for r in requests]
+    misses = {}
+
+    # --- 2. Cache pass ---
+    for request in requests:
+        try:
+            store = TickStore(request.ticker, cache_dir)
+            if not store.missing(request.start, request.end):
+                yield FetchResult(*request, store.read(request.start, request.end), None, "cache")
+                continue
+        except Exception as e:
+            print(f"Error loading cache for {request.ticker}: {e}")
+        misses.setdefault(request.ticker, []).append(request)
+
+    if not misses:
+        return
+
+    # --- 3. Concurrent download pass ---
+    started = {}
+    cancel_events = {ticker: threading.Event() for ticker in misses}
+
+    def fetch_ticker(ticker, ticker_requests):
+        started[ticker] = time.monotonic()
+        store = TickStore(ticker, cache_dir)
+        download = with_retries(downloader, cancel_events[ticker], retries, backoff)
+        results = []
+        for request in ticker_requests:
+            try:
+                data = store.get(request.start, request.end, downloader=download, save=save)
+                results.append(FetchResult(*request, data, None if data is not None else "no data", "network"))
+            except Exception as e:
+                results.append(FetchResult(*request, None, e, "network"))
+        return results
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+    try:
+        pending = {pool.submit(fetch_ticker, ticker, reqs): ticker for ticker, reqs in misses.items()}
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                ticker = pending.pop(future)
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    for request in misses[ticker]:
+                        yield FetchResult(*request, None, e, "network")
+
+            now = time.monotonic()
+            for future, ticker in list(pending.items()):
+                if ticker in started and now - started[ticker] > timeout:
+                    # The worker thread cannot be killed, but it stops at its next retry check
+                    cancel_events[ticker].set()
+                    del pending[future]
+                    for request in misses[ticker]:
+                        yield FetchResult(*request, None, FetchTimeout(f"{ticker} timed out after {timeout}s"), "network")
+    finally:
+        for event in cancel_events.values():
+            event.set()
+        pool.shutdown(wait=False, cancel_futures=True)
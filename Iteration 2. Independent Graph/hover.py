@@ -0,0 +1,78 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QApplication
+from instrumentation import instrument
+
+DEFAULT_REFRESH_RATE = 60  # Hz, used when the screen does not report one
+
+
+def display_refresh_rate():
+    """Refresh rate of the primary screen, used to cap how often mouse moves are handled."""
+    screen = QApplication.primaryScreen() if QApplication.instance() else None
+    rate = screen.refreshRate() if screen is not None else 0
+    return int(rate) if rate and rate > 0 else DEFAULT_REFRESH_RATE
+
+
+class HoverEngine:
+    """
+    Nearest-point lookup for a curve with sorted x values.
+    Lookups are a binary search, and the pixel-to-data scale is cached until the view box
+    range or size changes, so a mouse move costs O(log n) and no Qt mapping calls.
+    """
+
+    def __init__(self, view_box, x, y):
+        self.view_box = view_box
+        self.set_data(x, y)
+        self._scale = None
+        view_box.sigRangeChanged.connect(self.invalidate)
+        view_box.sigResized.connect(self.invalidate)
+
+    def set_data(self, x, y):
+        """Point the lookup at a new series (x sorted)."""
+        # Float x, so searchsorted with a float mouse position doesn't convert the whole array on every call
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y)
+
+    def invalidate(self, *args):
+        """Drop the cached pixel scale - connected to the view box range and resize signals."""
+        self._scale = None
+
+    def pixel_scale(self):
+        """Data units per screen pixel as (x, y)."""
+        if self._scale is None:
+            px, py = self.view_box.viewPixelSize()
+            self._scale = (abs(px), abs(py))
+        return self._scale
+
+    def nearest(self, mouse_x):
+        """Index of the data point whose x is closest to mouse_x."""
+        i = int(np.searchsorted(self.x, mouse_x))
+        if i <= 0:
+            return 0
+        if i >= len(self.x):
+            return len(self.x) - 1
+        return i if self.x[i] - mouse_x < mouse_x - self.x[i - 1] else i - 1
+
+    @instrument("HoverEngine.hit")
+    def hit(self, mouse_x, mouse_y, threshold_pixels):
+        """
+        Check if (mouse_x, mouse_y) is within threshold_pixels of the curve.
+        Returns (is_close, curve_y, closest_idx).
+        """
+        closest_idx = self.nearest(mouse_x)
+        curve_y = self.y[closest_idx]
+        pixel_x, pixel_y = self.pixel_scale()
+
+        x_dist = abs(self.x[closest_idx] - mouse_x)
+        y_dist = abs(curve_y - mouse_y)
+        is_close = (x_dist < pixel_x * threshold_pixels * 2) and (y_dist < pixel_y * threshold_pixels * 2)
+        return is_close, curve_y, closest_idx
+
+
+def throttled_mouse_moved(scene, slot, rate_limit=None):
+    """
+    Connect `slot(pos)` to the scene's sigMouseMoved, limited to the display refresh rate.
+    Keep a reference to the returned proxy - the connection is dropped when it is garbage collected.
+    """
+    rate_limit = rate_limit or display_refresh_rate()
+    return pg.SignalProxy(scene.sigMouseMoved, rateLimit=rate_limit, slot=lambda args: slot(args[0]))
@@ -0,0 +1,304 @@
+from collections import deque
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from decimation import LODCurve
+
+# --- 1. Vectorized kernels ---
+# Each kernel takes numpy arrays or Series and works on the whole history at once.
+
+
+def sma(close, window):
+    """Simple moving average via a cumulative sum - NaN until `window` values are available."""
+    close = np.asarray(close, dtype=float)
+    out = np.full(len(close), np.nan)
+    if len(close) >= window:
+        csum = np.cumsum(np.insert(close, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def ema(close, span):
+    """Exponential moving average with the usual alpha = 2 / (span + 1), seeded on the first value."""
+    return pd.Series(np.asarray(close, dtype=float)).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def wilder(values, period):
+    """Wilder's smoothing (alpha = 1 / period), used by RSI and ATR."""
+    return pd.Series(np.asarray(values, dtype=float)).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+
+
+def rsi(close, period=14):
+    """Relative strength index on a 0-100 scale."""
+    delta = np.diff(np.asarray(close, dtype=float), prepend=np.nan)
+    gain = wilder(np.where(delta > 0, delta, 0.0)[1:], period)
+    loss = wilder(np.where(delta < 0, -delta, 0.0)[1:], period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + gain / loss)
+    values = np.where(loss == 0, 100.0, values)
+    return np.concatenate(([np.nan], values))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """MACD line, signal line and histogram."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window=20, width=2.0):
+    """Middle, upper and lower Bollinger bands (population standard deviation)."""
+    rolling = pd.Series(np.asarray(close, dtype=float)).rolling(window)
+    mid, std = rolling.mean().to_numpy(), rolling.std(ddof=0).to_numpy()
+    return mid, mid + width * std, mid - width * std
+
+
+def true_range(high, low, close):
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, period=14):
+    """Average true range."""
+    return wilder(true_range(high, low, close), period)
+
+
+def vwap(high, low, close, volume, index=None):
+    """Volume weighted average price. With a DatetimeIndex it resets at the start of each day."""
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3
+    volume = np.asarray(volume, dtype=float)
+    pv = pd.Series(typical * volume)
+    vol = pd.Series(volume)
+    if index is not None:
+        days = pd.DatetimeIndex(index).normalize()
+        pv, vol = pv.groupby(days).cumsum(), vol.groupby(days).cumsum()
+    else:
+        pv, vol = pv.cumsum(), vol.cumsum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (pv / vol).to_numpy()
+
+
+# --- 2. Indicators with incremental updates ---
+# compute(data) runs the vectorized kernel over the whole history and keeps just enough state to
+# continue from the last bar; update(bar) then advances that state in O(1) for each appended bar.
+# `data` is an OHLCV DataFrame and `bar` anything with Open/High/Low/Close/Volume attributes.
+
+
+class Indicator:
+    overlay = True  # True if plotted on the price axis, False if it needs its own axis
+    outputs = ()
+
+    def compute(self, data):
+        raise NotImplementedError
+
+    def update(self, bar):
+        raise NotImplementedError
+
+    def params(self):
+        """Constructor arguments, so the indicator can be saved and rebuilt with type(self)(**params)."""
+        return {}
+
+
+class SMA(Indicator):
+    def __init__(self, window=20):
+        self.window = window
+        self.name = f"SMA({window})"
+        self.outputs = (self.name,)
+
+    def params(self):
+        return {"window": self.window}
+
+    def compute(self, data):
+        close = data["Close"].to_numpy(dtype=float)
+        self._values = deque(close[-self.window:], maxlen=self.window)
+        self._sum = float(np.sum(self._values))
+        return {self.name: sma(close, self.window)}
+
+    def update(self, bar):
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(bar.Close)
+        self._sum += bar.Close
+        return {self.name: self._sum / self.window if len(self._values) == self.window else np.nan}
+
+
+class EMA(Indicator):
+    def __init__(self, span=20):
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.name = f"EMA({span})"
+        self.outputs = (self.name,)
+
+    def params(self):
+        return {"span": self.span}
+
+    def compute(self, data):
+        values = ema(data["Close"], self.span)
+        self._value = values[-1] if len(values) else np.nan
+        return {self.name: values}
+
+    def step(self, value):
+        self._value = value if np.isnan(self._value) else self._value + self.alpha * (value - self._value)
+        return self._value
+
+    def update(self, bar):
+        return {self.name: self.step(bar.Close)}
+
+
+class RSI(Indicator):
+    overlay = False
+
+    def __init__(self, period=14):
+        self.period = period
+        self.name = f"RSI({period})"
+        self.outputs = (self.name,)
+
+    def params(self):
+        return {"period": self.period}
+
+    def compute(self, data):
+        close = data["Close"].to_numpy(dtype=float)
+        delta = np.diff(close)
+        self._gain = wilder(np.where(delta > 0, delta, 0.0), self.period)[-1] if len(delta) else np.nan
+        self._loss = wilder(np.where(delta < 0, -delta, 0.0), self.period)[-1] if len(delta) else np.nan
+        self._prev_close = close[-1] if len(close) else np.nan
+        return {self.name: rsi(close, self.period)}
+
+    def update(self, bar):
+        if np.isnan(self._prev_close):
+            self._prev_close = bar.Close
+            return {self.name: np.nan}
+        delta = bar.Close - self._prev_close
+        self._prev_close = bar.Close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        a = 1 / self.period
+        self._gain = gain if np.isnan(self._gain) else self._gain + a * (gain - self._gain)
+        self._loss = loss if np.isnan(self._loss) else self._loss + a * (loss - self._loss)
+        return {self.name: 100.0 if self._loss == 0 else 100 - 100 / (1 + self._gain / self._loss)}
+
+
+class MACD(Indicator):
+    overlay = False
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = EMA(fast), EMA(slow), EMA(signal)
+        self.name = f"MACD({fast},{slow},{signal})"
+        self.outputs = ("MACD", "Signal", "Histogram")
+
+    def params(self):
+        return {"fast": self.fast.span, "slow": self.slow.span, "signal": self.signal.span}
+
+    def compute(self, data):
+        self.fast.compute(data)
+        self.slow.compute(data)
+        line, signal_line, hist = macd(data["Close"], self.fast.span, self.slow.span, self.signal.span)
+        self.signal._value = signal_line[-1] if len(signal_line) else np.nan
+        return {"MACD": line, "Signal": signal_line, "Histogram": hist}
+
+    def update(self, bar):
+        line = self.fast.step(bar.Close) - self.slow.step(bar.Close)
+        signal_line = self.signal.step(line)
+        return {"MACD": line, "Signal": signal_line, "Histogram": line - signal_line}
+
+
+class Bollinger(Indicator):
+    def __init__(self, window=20, width=2.0):
+        self.window, self.width = window, width
+        self.name = f"BB({window},{width:g})"
+        self.outputs = (f"{self.name} Mid", f"{self.name} Upper", f"{self.name} Lower")
+
+    def params(self):
+        return {"window": self.window, "width": self.width}
+
+    def compute(self, data):
+        close = data["Close"].to_numpy(dtype=float)
+        self._values = deque(close[-self.window:], maxlen=self.window)
+        tail = np.asarray(self._values)
+        self._sum, self._sumsq = float(tail.sum()), float((tail ** 2).sum())
+        return dict(zip(self.outputs, bollinger(close, self.window, self.width)))
+
+    def update(self, bar):
+        if len(self._values) == self.window:
+            old = self._values[0]
+            self._sum -= old
+            self._sumsq -= old * old
+        self._values.append(bar.Close)
+        self._sum += bar.Close
+        self._sumsq += bar.Close * bar.Close
+        if len(self._values) < self.window:
+            return dict.fromkeys(self.outputs, np.nan)
+        mid = self._sum / self.window
+        std = np.sqrt(max(self._sumsq / self.window - mid * mid, 0.0))
+        return dict(zip(self.outputs, (mid, mid + self.width * std, mid - self.width * std)))
+
+
+class ATR(Indicator):
+    overlay = False
+
+    def __init__(self, period=14):
+        self.period = period
+        self.name = f"ATR({period})"
+        self.outputs = (self.name,)
+
+    def params(self):
+        return {"period": self.period}
+
+    def compute(self, data):
+        values = atr(data["High"], data["Low"], data["Close"], self.period)
+        self._value = values[-1] if len(values) else np.nan
+        self._prev_close = data["Close"].iloc[-1] if len(data) else np.nan
+        return {self.name: values}
+
+    def update(self, bar):
+        tr = np.fmax(bar.High - bar.Low, np.fmax(abs(bar.High - self._prev_close), abs(bar.Low - self._prev_close)))
+        self._prev_close = bar.Close
+        self._value = tr if np.isnan(self._value) else self._value + (tr - self._value) / self.period
+        return {self.name: self._value}
+
+
+class VWAP(Indicator):
+    name = "VWAP"
+    outputs = ("VWAP",)
+
+    def compute(self, data):
+        values = vwap(data["High"], data["Low"], data["Close"], data["Volume"], data.index)
+        self._day = data.index[-1].normalize() if len(data) else None
+        today = data.loc[data.index.normalize() == self._day] if len(data) else data
+        typical = (today["High"] + today["Low"] + today["Close"]) / 3
+        self._pv, self._vol = float((typical * today["Volume"]).sum()), float(today["Volume"].sum())
+        return {"VWAP": values}
+
+    def update(self, bar):
+        # `bar.timestamp` is in epoch seconds, as sent by the streaming feeds
+        day = pd.Timestamp(bar.timestamp, unit="s").normalize()
+        if day != self._day:
+            self._day, self._pv, self._vol = day, 0.0, 0.0
+        self._pv += (bar.High + bar.Low + bar.Close) / 3 * bar.Volume
+        self._vol += bar.Volume
+        return {"VWAP": self._pv / self._vol if self._vol else np.nan}
+
+
+INDICATOR_TYPES = {indicator.__name__: indicator for indicator in (SMA, EMA, RSI, MACD, Bollinger, ATR, VWAP)}
+
+
+# --- 3. Plot overlays ---
+OVERLAY_COLOURS = ["#f39c12", "#9b59b6", "#1abc9c", "#e67e22", "#95a5a6", "#e84393"]
+
+
+def add_indicator_overlays(plot_widget, x, data, indicators, oscillator_widget=None):
+    """
+    Compute each indicator over `data` and draw it: price-scale indicators on `plot_widget`,
+    oscillators (RSI, MACD, ATR) on `oscillator_widget` if one is given. Every line is a LODCurve,
+    so overlays stay as cheap to pan and zoom as the price line. Returns {output name: LODCurve}.
+    """
+    curves = {}
+    colours = iter(OVERLAY_COLOURS * (1 + len(indicators)))
+    for indicator in indicators:
+        target = plot_widget if indicator.overlay else oscillator_widget
+        results = indicator.compute(data)
+        if target is None:
+            continue
+        for name, values in results.items():
+            curves[name] = LODCurve(target, x, values, pen=pg.mkPen(next(colours), width=1), name=name)
+    return curves
@@ -0,0 +1,221 @@
+import os
+import json
+import atexit
+import itertools
+import threading
+import time
+from functools import wraps
+import numpy as np
+
+# --- 1. Instrumentation Configuration ---
+# Off unless CHART_PROFILE is set. When off, @instrument returns the function untouched and span()
+# returns a shared no-op context manager, so the hooks can stay in the code at no measurable cost.
+ENABLED = os.environ.get("CHART_PROFILE", "") not in ("", "0")
+TRACE_FILE = os.environ.get("CHART_TRACE", "chart_trace.json")  # Written at exit when instrumentation is on
+RING_CAPACITY = 4096  # Samples kept per handler; older ones are overwritten
+OVERLAY_INTERVAL_MS = 500
+
+
+class RingBuffer:
+    """
+    Fixed-size record of (start, duration, thread) samples in preallocated numpy arrays.
+    Writers claim a slot with next() on an itertools.count, which is atomic under the GIL, so
+    recording never takes a lock; readers copy out whatever has been written so far.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.start_ns = np.zeros(capacity, dtype=np.int64)
+        self.duration_ns = np.zeros(capacity, dtype=np.int64)
+        self.thread = np.zeros(capacity, dtype=np.int64)
+        self._counter = itertools.count()
+        self.written = 0
+
+    def record(self, start_ns, duration_ns):
+        n = next(self._counter)
+        i = n % self.capacity
+        self.start_ns[i] = start_ns
+        self.duration_ns[i] = duration_ns
+        self.thread[i] = threading.get_ident() & 0x7FFFFFFF
+        self.written = max(self.written, n + 1)
+
+    def samples(self):
+        """(start_ns, duration_ns, thread) arrays of the samples still held, oldest first."""
+        n = min(self.written, self.capacity)
+        order = np.arange(self.written - n, self.written) % self.capacity
+        return self.start_ns[order], self.duration_ns[order], self.thread[order]
+
+
+class Recorder:
+    """One RingBuffer per named handler, plus summaries and Chrome trace export."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.buffers = {}
+        self._lock = threading.Lock()  # Only taken the first time a name is seen
+
+    def buffer(self, name):
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            with self._lock:
+                buffer = self.buffers.setdefault(name, RingBuffer(self.capacity))
+        return buffer
+
+    def record(self, name, start_ns, duration_ns):
+        self.buffer(name).record(start_ns, duration_ns)
+
+    def stats(self, name, window_ns=None):
+        """count, mean, p50 and p99 in milliseconds, optionally over just the last window_ns."""
+        if name not in self.buffers:
+            return None
+        start, duration, _ = self.buffers[name].samples()
+        if window_ns is not None:
+            duration = duration[start >= time.perf_counter_ns() - window_ns]
+        if not len(duration):
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0}
+        ms = duration / 1e6
+        return {"count": len(ms), "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+    def chrome_trace(self):
+        """Every held sample as a Chrome trace-event document (load it in chrome://tracing or Perfetto)."""
+        events = []
+        pid = os.getpid()
+        for name, buffer in self.buffers.items():
+            start, duration, thread = buffer.samples()
+            events.extend({"name": name, "ph": "X", "ts": s / 1000, "dur": d / 1000, "pid": pid, "tid": int(t)}
+                          for s, d, t in zip(start.tolist(), duration.tolist(), thread.tolist()))
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        print(f"Trace written to {path}")
+
+
+recorder = Recorder()
+
+
+# --- 2. Hooks ---
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        recorder.record(self.name, self.start, end - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Time a block: `with span("stretch.setRange"): ...`."""
+    return _Span(name) if ENABLED else _NULL_SPAN
+
+
+def instrument(name=None):
+    """Decorator timing every call of a function. Returns the function itself when instrumentation is off."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.record(label, start, time.perf_counter_ns() - start)
+        return timed
+    return decorate
+
+
+# --- 3. Paint and frame times ---
+def monitor_frames(plot_widget, name="paint"):
+    """
+    Wrap a PlotWidget's paintEvent to record how long each paint takes (`name`) and the time
+    between the starts of consecutive paints (`name + ".frame"`). Does nothing when instrumentation is off.
+    """
+    if not ENABLED:
+        return
+    original_paint = plot_widget.paintEvent
+    last_start = [None]
+
+    def paintEvent(ev):
+        start = time.perf_counter_ns()
+        if last_start[0] is not None:
+            recorder.record(f"{name}.frame", last_start[0], start - last_start[0])
+        last_start[0] = start
+        try:
+            return original_paint(ev)
+        finally:
+            recorder.record(name, start, time.perf_counter_ns() - start)
+
+    plot_widget.paintEvent = paintEvent
+
+
+class StatsOverlay:
+    """
+    FPS and latency readout pinned to the top-right corner of a plot (clear of the legend), refreshed twice a second.
+    FPS counts paints over the last second; each handler shows its p50/p99 over the same second.
+    """
+
+    def __init__(self, plot_widget, handlers=(), paint_name="paint"):
+        import pyqtgraph as pg
+        from PyQt5.QtCore import QTimer
+        self.paint_name = paint_name
+        self.handlers = list(handlers)
+        self.text = pg.TextItem(color=(255, 255, 0), anchor=(1, 0), fill=pg.mkBrush(0, 0, 0, 160))
+        # Parented to the view box rather than added to the plot, so it sits in pixel coordinates and ignores panning
+        self.view_box = plot_widget.getPlotItem().vb
+        self.text.setParentItem(self.view_box)
+        self.view_box.sigResized.connect(self.place)
+        self.place()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(OVERLAY_INTERVAL_MS)
+
+    def place(self, *args):
+        self.text.setPos(self.view_box.width() - 5, 5)
+
+    def refresh(self):
+        second = 1_000_000_000
+        paint = recorder.stats(self.paint_name, second) or {"count": 0, "p50_ms": 0.0, "p99_ms": 0.0}
+        lines = [f"{paint['count']} FPS  paint p50 {paint['p50_ms']:.1f} ms  p99 {paint['p99_ms']:.1f} ms"]
+        for name in self.handlers:
+            stats = recorder.stats(name, second)
+            if stats and stats["count"]:
+                lines.append(f"{name}: {stats['count']}/s  p50 {stats['p50_ms']:.2f} ms  p99 {stats['p99_ms']:.2f} ms")
+        self.text.setText("\n".join(lines))
+
+
+def attach_overlay(plot_widget, handlers=()):
+    """Record frame times for plot_widget and show the overlay. Returns the overlay (keep a reference), or None when off."""
+    if not ENABLED:
+        return None
+    monitor_frames(plot_widget)
+    return StatsOverlay(plot_widget, handlers)
+
+
+if ENABLED:
+    atexit.register(lambda: recorder.export_chrome_trace(TRACE_FILE) if recorder.buffers else None)
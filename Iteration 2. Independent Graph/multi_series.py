@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from annotations import AnnotationLayer
+from decimation import LODCurve
+from resample import resample_series
+
+# --- 1. Chart Configuration ---
+SERIES_COLOURS = ["#3498db", "#e74c3c", "#2ecc71", "#f39c12", "#9b59b6", "#1abc9c", "#e67e22",
+                  "#34495e", "#e84393", "#00cec9", "#6c5ce7", "#fdcb6e", "#d63031", "#0984e3"]
+
+
+class MultiSeriesChart:
+    """
+    Several close-price series drawn on one PlotWidget with a shared date axis.
+    Each curve is drawn from its own timestamps, and the series are also joined onto one common
+    index (aligned) - one vectorized outer join, rebuilt only when a series is added or removed or
+    the granularity changes. Both the normalisation base and the cross-series readout (values_at)
+    come from that common index, so tickers on different calendars are compared on the same date.
+    Adding or removing a series only adds or removes that series' curve; the other curves are
+    left alone. With more than one series every line is shown as percent change from the first
+    date they all share, which is applied as a y transform so no pyramid is rebuilt.
+    Series can be shown as daily, weekly, monthly or yearly closes (set_granularity); each
+    resampled series is computed once and kept until that ticker's data is replaced.
+    """
+
+    def __init__(self, plot_widget, normalize="auto"):
+        self.plot_widget = plot_widget
+        self.normalize = normalize  # True, False, or "auto" (normalise whenever 2+ series are shown)
+        self.series = {}
+        self.curves = {}
+        self.granularity = None  # Bar size the series are shown at ("D", "W", "M", "Y"), or None for as loaded
+        self._resampled = {}  # (ticker, rule) -> resampled close
+        self._aligned = None
+        self._base_date = None
+        self._bases = {}  # Ticker -> close on the base date, while normalised
+        self._colour_index = 0
+        self.colours = {}
+        self.annotation_layer = AnnotationLayer(plot_widget)  # Drawn lines and notes (see the annotations property)
+        self.indicators = []  # Indicator settings for the workspace (indicators.Indicator instances); none are drawn yet
+        self.legend = plot_widget.addLegend()
+        plot_widget.setLabel('left', 'Price', units='USD')
+
+    # --- 2. Data model ---
+    def shown(self, ticker):
+        """A ticker's series at the current granularity."""
+        if self.granularity is None:
+            return self.series[ticker]
+        key = (ticker, self.granularity)
+        if key not in self._resampled:
+            self._resampled[key] = resample_series(self.series[ticker], self.granularity)
+        return self._resampled[key]
+
+    def aligned(self):
+        """
+        Every shown series joined on the union of their timestamps (one vectorized outer join, cached).
+        Gaps are forward filled, so each row holds every series' latest close as of that date.
+        """
+        if self._aligned is None:
+            if self.series:
+                self._aligned = pd.concat({ticker: self.shown(ticker) for ticker in self.series},
+                                          axis=1, join="outer").sort_index().ffill()
+            else:
+                self._aligned = pd.DataFrame()
+        return self._aligned
+
+    @property
+    def annotations(self):
+        """Drawn lines and notes, as JSON-friendly dicts (the workspace format). Assigning a list replaces them."""
+        return self.annotation_layer.to_dicts()
+
+    @annotations.setter
+    def annotations(self, dicts):
+        self.annotation_layer.load(dicts)
+
+    def is_normalized(self):
+        return len(self.series) > 1 if self.normalize == "auto" else bool(self.normalize)
+
+    def common_start(self):
+        """First date of the common index on which every series has data."""
+        complete = self.aligned().notna().all(axis=1) if self.series else None
+        return complete.index[complete.to_numpy().argmax()] if complete is not None and complete.any() else None
+
+    def values_at(self, x):
+        """
+        {ticker: value} of every series as of `x` (epoch seconds, as on the date axis) - percent change
+        while normalised, otherwise the close. Read from the common index; tickers with no data yet are left out.
+        """
+        aligned = self.aligned()
+        i = np.searchsorted(aligned.index.to_numpy().astype('datetime64[s]').astype(np.int64), x, side="right") - 1
+        if i < 0:
+            return {}
+        row = aligned.iloc[i].dropna()
+        if self.is_normalized():
+            return {ticker: 100.0 * value / self._bases[ticker] - 100.0 for ticker, value in row.items()}
+        return row.to_dict()
+
+    # --- 3. Graphics ---
+    def _next_colour(self):
+        colour = SERIES_COLOURS[self._colour_index % len(SERIES_COLOURS)]
+        self._colour_index += 1
+        return colour
+
+    def _apply_transform(self, ticker):
+        curve = self.curves[ticker]
+        if ticker in self._bases:
+            curve.set_transform(100.0 / self._bases[ticker], -100.0)
+        else:
+            curve.set_transform()
+
+    def _refresh_normalization(self, changed=()):
+        """Re-read the base closes from the common index; only curves whose base changed, or `changed`, are re-transformed."""
+        normalized_before = self._base_date is not None
+        self._base_date = self.common_start() if self.is_normalized() else None
+        bases = {} if self._base_date is None else self.aligned().loc[self._base_date].astype(float).to_dict()
+        stale = [ticker for ticker in self.curves if ticker in changed or bases.get(ticker) != self._bases.get(ticker)]
+        self._bases = bases
+        for ticker in stale:
+            self._apply_transform(ticker)
+        if normalized_before != (self._base_date is not None):
+            if self._base_date is not None:
+                self.plot_widget.setLabel('left', 'Change', units='%')
+            else:
+                self.plot_widget.setLabel('left', 'Price', units='USD')
+
+    def add_series(self, ticker, close, colour=None):
+        """Add (or replace) one ticker's close-price series, in the next palette colour unless one is given."""
+        if ticker in self.series:
+            self.remove_series(ticker)
+        close = close.dropna()
+        if close.empty:
+            return
+        self.series[ticker] = close
+        self.colours[ticker] = colour or self._next_colour()
+        self._aligned = None
+        shown = self.shown(ticker)
+        x = shown.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+        self.curves[ticker] = LODCurve(self.plot_widget, x, shown.to_numpy(dtype=float),
+                                       pen=pg.mkPen(self.colours[ticker], width=2), name=ticker)
+        self._refresh_normalization(changed=(ticker,))
+
+    def set_granularity(self, rule):
+        """Show every series as bars of size `rule` ("D", "W", "M" or "Y"), or as loaded if rule is None."""
+        if rule == self.granularity:
+            return
+        self.granularity = rule
+        self._aligned = None
+        for ticker, curve in self.curves.items():
+            shown = self.shown(ticker)
+            curve.set_data(shown.index.to_numpy().astype('datetime64[s]').astype(np.int64), shown.to_numpy(dtype=float))
+        self._refresh_normalization(changed=tuple(self.curves))  # The base closes are read from the resampled series
+
+    def remove_series(self, ticker):
+        """Remove one ticker's curve, leaving the rest of the chart untouched."""
+        curve = self.curves.pop(ticker, None)
+        if curve is None:
+            return
+        self.series.pop(ticker)
+        self.colours.pop(ticker)
+        for key in [key for key in self._resampled if key[0] == ticker]:
+            del self._resampled[key]
+        self._aligned = None
+        curve.view_box.sigXRangeChanged.disconnect(curve.update)
+        curve.view_box.sigResized.disconnect(curve.update)
+        self.legend.removeItem(curve.curve)
+        self.plot_widget.removeItem(curve.curve)
+        self._refresh_normalization()
+
+    def clear(self):
+        for ticker in list(self.curves):
+            self.remove_series(ticker)
+        self._colour_index = 0
+        self.annotations = []
+
+    def tickers(self):
+        return list(self.series)
+
+    def view_range(self):
+        """Visible [[x0, x1], [y0, y1]] in plot coordinates (epoch seconds on x)."""
+        return self.plot_widget.getPlotItem().vb.viewRange()
+
+    def set_view_range(self, view_range):
+        (x0, x1), (y0, y1) = view_range
+        self.plot_widget.getPlotItem().vb.setRange(xRange=(x0, x1), yRange=(y0, y1), padding=0)
@@ -1,12 +1,17 @@
 import sys
-import yfinance as yf
-import pandas as pd
 import os
-from datetime import datetime
-from PyQt5.QtWidgets import QApplication, QMainWindow
-from PyQt5.QtChart import QChart, QChartView, QCandlestickSeries, QCandlestickSet, QDateTimeAxis, QValueAxis
-from PyQt5.QtCore import Qt, QDateTime
-from PyQt5.QtGui import QColor, QPainter
+from collections import namedtuple
+from stock_cache import flatten_columns
+from tick_store import TickStore
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QComboBox, QMainWindow, QVBoxLayout, QWidget
+import numpy as np
+import pyqtgraph as pg
+from candle_item import CandlestickItem
+from streaming import LiveCandleChart, ReplayFeed
+from instrumentation import attach_overlay, span
+from resample import GRANULARITIES
+from indicators import SMA, Bollinger
 
 # --- 1. Data Configuration ---
 TICKER = "AAPL"
@@ -14,162 +19,156 @@ START_DATE = "2023-01-01"
 END_DATE = "2024-01-01"
 CACHE_DIR = "stock_data_cache"
 SAVE_DATA = True
+STREAM_MODE = False  # Set to True to replay the cached CSV as a live feed
+REPLAY_SOURCE = os.path.join(CACHE_DIR, f"{TICKER}_{START_DATE}_{END_DATE}.csv")
+REPLAY_SPEED = 10  # Bars per second
+STREAM_INDICATORS = [SMA(20), Bollinger(20, 2)]  # Drawn over the live candles, updated once per closed bar
 
-def get_cache_filename(ticker, start, end):
-    """Generate a cache filename based on ticker and date range."""
-    return os.path.join(CACHE_DIR, f"{ticker}_{start}_{end}.csv")
+def download_data(ticker, start, end):
+    """Downloads a date range from yfinance. Returns None if the download failed."""
+    import yfinance as yf  # Slow to import, and not needed at all when the range is already cached
+    try:
+        data = flatten_columns(yf.download(ticker, start=start, end=end, progress=False))
+    except Exception as e:
+        print(f"An unexpected error occurred during download: {e}")
+        return None
 
-def load_cached_data(ticker, start, end):
-    """Try to load data from cache."""
-    cache_file = get_cache_filename(ticker, start, end)
-    if os.path.exists(cache_file):
-        try:
-            print(f"Loading cached data from {cache_file}...")
-            data = pd.read_csv(cache_file)
-            data['Date'] = pd.to_datetime(data['Date'])
-            data.set_index('Date', inplace=True)
-            return data
-        except Exception as e:
-            print(f"Error loading cache: {e}")
-            return None
-    return None
+    if data.empty:
+        print(f"yfinance returned an empty dataset for {ticker} from {start} to {end}.")
+        return data
 
-def save_data_to_cache(data, ticker, start, end):
-    """Save data to cache."""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-    cache_file = get_cache_filename(ticker, start, end)
+    required_columns = ['Open', 'High', 'Low', 'Close']
+    missing = [col for col in required_columns if col not in data.columns]
+    if missing:
+        print(f"Error: Missing columns {missing}. Available columns: {list(data.columns)}")
+        return None
+
+    return data
+
+def load_cached_data(ticker, start, end):
+    """Try to load data from cache. Returns None unless the whole range is already stored."""
     try:
-        data.to_csv(cache_file)
-        print(f"Data saved to {cache_file}")
+        store = TickStore(ticker, CACHE_DIR)
+        if store.missing(start, end):
+            return None
+        print(f"Loading cached data from {store.data_file}...")
+        data = store.read(start, end)
+        return data if data is not None and not data.empty else None
     except Exception as e:
-        print(f"Error saving cache: {e}")
+        print(f"Error loading cache: {e}")
+        return None
 
 def get_stock_data(ticker, start, end):
-    """Downloads stock data from yfinance or loads from cache."""
-    # Try loading from cache first
-    cached_data = load_cached_data(ticker, start, end)
-    if cached_data is not None:
-        return cached_data
-    
-    print(f"Downloading {ticker} data from {start} to {end}...")
+    """Loads stock data from the cache, downloading only the date ranges it does not cover yet."""
     try:
-        data = yf.download(ticker, start=start, end=end, progress=False)
-        
-        if data.empty:
-            print(f"yfinance returned an empty dataset for {ticker}.")
-            return None
-        
-        required_columns = ['Open', 'High', 'Low', 'Close']
-        missing = [col for col in required_columns if col not in data.columns]
-        if missing:
-            print(f"Error: Missing columns {missing}. Available columns: {list(data.columns)}")
-            return None
-        
-        if SAVE_DATA:
-            save_data_to_cache(data, ticker, start, end)
-        
-        return data
-        
+        data = TickStore(ticker, CACHE_DIR).get(start, end, downloader=download_data, save=SAVE_DATA)
     except Exception as e:
-        print(f"An unexpected error occurred during download: {e}")
+        print(f"Error loading cache: {e}")
         return None
 
-def plot_candlestick(data):
-    """Plot candlestick chart using QtCharts."""
-    
-    app = QApplication(sys.argv)
-    
-    # Create series
-    series = QCandlestickSeries()
-    series.setName(TICKER)
-    series.setIncreasingColor(QColor(Qt.green))
-    series.setDecreasingColor(QColor(Qt.red))
-    
-    # Add candlestick data
-    for date, row in data.iterrows():
-        timestamp = int(date.timestamp() * 1000)  # Convert to milliseconds
-        
-        candlestick_set = QCandlestickSet(timestamp)
-        candlestick_set.setOpen(row['Open'].item())
-        candlestick_set.setHigh(row['High'].item())
-        candlestick_set.setLow(row['Low'].item())
-        candlestick_set.setClose(row['Close'].item())
-        
-        series.append(candlestick_set)
+    if data is None:
+        print(f"No data available for {ticker} from {start} to {end}.")
+        return None
+    return data
+
+def get_stock_bars(ticker, start, end, rule):
+    """Cached data as bars of size `rule` ("D", "W", "M" or "Y"). Resampled once per cache version; never downloads."""
+    return TickStore(ticker, CACHE_DIR).resampled(rule, start, end)
+
+CandlestickPlot = namedtuple("CandlestickPlot", ["window", "plot_widget", "candles", "overlay", "set_granularity"])
+
+def candle_arrays(data):
+    """Date seconds and Open/High/Low/Close arrays for CandlestickItem - one numpy array per column, no per-row work."""
+    dates_in_seconds = data.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+    return [dates_in_seconds] + [data[col].to_numpy(dtype=float) for col in ('Open', 'High', 'Low', 'Close')]
+
+def build_candlestick_plot(data, resample=None):
+    """
+    Build the candlestick chart window. Needs a QApplication; the window is not shown.
+    If `resample(rule)` is given (returning OHLCV bars, e.g. get_stock_bars), a selector switches the bar size.
+    """
     
-    # Get date range for axes
-    first_date = data.index.min()
-    last_date = data.index.max()
+    # 1. Prepare Data
+    with span("plot.data_prep"):
+        arrays = candle_arrays(data)
     
     # Create chart
-    chart = QChart()
-    chart.addSeries(series)
-    chart.setTitle(f"{TICKER} Candlestick Chart")
-    chart.setAnimationOptions(QChart.SeriesAnimations)
-    
-    # Create custom axes
-    axis_x = QDateTimeAxis()
-    axis_x.setFormat("MMM yyyy")
-    axis_x.setTitleText("Date")
-    axis_x.setRange(QDateTime.fromMSecsSinceEpoch(int(first_date.timestamp() * 1000)),
-                    QDateTime.fromMSecsSinceEpoch(int(last_date.timestamp() * 1000)))
-    
-    axis_y = QValueAxis()
-    axis_y.setTitleText("Price (USD)")
-    min_price = data[['Low']].min().values[0]
-    max_price = data[['High']].max().values[0]
-    price_range = max_price - min_price
-    
-    # Calculate nice round tick interval
-    def get_nice_interval(range_val):
-        """Calculate a nice round interval for axis ticks."""
-        if range_val == 0:
-            return 1
-        magnitude = 10 ** (int(len(str(int(range_val)))) - 1)
-        normalized = range_val / magnitude
-        
-        if normalized <= 1.5:
-            return magnitude / 10
-        elif normalized <= 3:
-            return magnitude / 5
-        elif normalized <= 7:
-            return magnitude / 2
-        else:
-            return magnitude
-    
-    tick_interval = get_nice_interval(price_range)
-    tick_count = max(4, int(price_range / tick_interval) + 1)
-    
-    axis_y.setRange(int(min_price - tick_interval), int(max_price + tick_interval))
-    axis_y.setTickCount(tick_count)
-    axis_y.setLabelFormat("%.2f")
-    
-    chart.addAxis(axis_x, Qt.AlignBottom)
-    chart.addAxis(axis_y, Qt.AlignLeft)
-    series.attachAxis(axis_x)
-    series.attachAxis(axis_y)
-    
-    chart.legend().setVisible(True)
-    chart.legend().setAlignment(Qt.AlignBottom)
-    
-    # Create chart view with interactive features
-    chart_view = QChartView(chart)
-    chart_view.setRenderHint(QPainter.Antialiasing)
+    date_axis = pg.DateAxisItem(orientation='bottom')
+    plot_widget = pg.PlotWidget(axisItems={'bottom': date_axis})
+    plot_widget.setTitle(f"{TICKER} Candlestick Chart")
+    plot_widget.setLabel('left', 'Price', units='USD')
+    plot_widget.setLabel('bottom', 'Date')
+    plot_widget.showGrid(x=True, y=True)
+
+    # Add candlestick data - geometry is built in bulk for whatever window is in view
+    candles = CandlestickItem(*arrays)
+    plot_widget.addItem(candles)
+    plot_widget.getPlotItem().vb.setAutoVisible(y=True)
     
     # Create window
     window = QMainWindow()
-    window.setCentralWidget(chart_view)
+    window.setCentralWidget(plot_widget)
     window.setWindowTitle(f"{TICKER} Candlestick Chart")
     window.resize(1200, 600)
+
+    def set_granularity(rule):
+        """Show bars of size `rule`, or the data passed in if rule is None."""
+        bars = data if rule is None else resample(rule)
+        if bars is not None and not bars.empty:
+            candles.set_data(*candle_arrays(bars))
+
+    # Bar size selector - switching only re-reads bars the tick store has already resampled and cached
+    if resample is not None:
+        granularity_box = QComboBox()
+        granularity_box.addItems(["As loaded"] + list(GRANULARITIES))
+        granularity_box.currentTextChanged.connect(lambda label: set_granularity(GRANULARITIES.get(label)))
+        central_widget = QWidget()
+        layout = QVBoxLayout(central_widget)
+        layout.addWidget(granularity_box, 0, Qt.AlignLeft)
+        layout.addWidget(plot_widget)
+        window.setCentralWidget(central_widget)
+
+    # FPS/latency readout, only when CHART_PROFILE is set
+    overlay = attach_overlay(plot_widget, ["CandlestickItem.paint", "CandlestickItem.build_paths"])
+    return CandlestickPlot(window, plot_widget, candles, overlay, set_granularity)
+
+def plot_candlestick(data, resample=None):
+    """Plot candlestick chart using PyQtGraph."""
+    app = QApplication(sys.argv)
+    plot = build_candlestick_plot(data, resample)
+    plot.window.show()
+    sys.exit(app.exec_())
+
+def stream_candlestick(ticker, source):
+    """Chart bars as they arrive from a replay of cached data, appending instead of rebuilding."""
+    app = QApplication(sys.argv)
+
+    date_axis = pg.DateAxisItem(orientation='bottom')
+    plot_widget = pg.PlotWidget(axisItems={'bottom': date_axis})
+    plot_widget.setTitle(f"{ticker} Live Candlestick Chart")
+    plot_widget.setLabel('left', 'Price', units='USD')
+    plot_widget.showGrid(x=True, y=True)
+
+    chart = LiveCandleChart(plot_widget, indicators=STREAM_INDICATORS)
+    feed = ReplayFeed(ticker, source, speed=REPLAY_SPEED)
+    feed.bar.connect(chart.on_bar)
+
+    window = QMainWindow()
+    window.setCentralWidget(plot_widget)
+    window.setWindowTitle(f"{ticker} Live Candlestick Chart")
+    window.resize(1200, 600)
     window.show()
-    
+
+    feed.start()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
+    if STREAM_MODE:
+        stream_candlestick(TICKER, REPLAY_SOURCE)
+
     stock_data = get_stock_data(TICKER, START_DATE, END_DATE)
     
     if stock_data is not None and not stock_data.empty:
-        plot_candlestick(stock_data)
+        plot_candlestick(stock_data, resample=lambda rule: get_stock_bars(TICKER, START_DATE, END_DATE, rule))
     else:
         print("Exiting plot due to data error.")
\ No newline at end of file
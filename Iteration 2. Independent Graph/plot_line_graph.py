@@ -1,11 +1,20 @@
 import sys
-import yfinance as yf
 import pyqtgraph as pg
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QComboBox, QMainWindow, QVBoxLayout, QWidget
 from datetime import datetime
 import os
-import pandas as pd
+from collections import namedtuple
+from stock_cache import flatten_columns
+from tick_store import TickStore
+from decimation import LODCurve
+from hover import HoverEngine, throttled_mouse_moved
+from streaming import LiveLineChart, ReplayFeed
+from indicators import SMA, Bollinger, RSI, add_indicator_overlays
+from instrumentation import attach_overlay, instrument, span
+from resample import GRANULARITIES
+from shared_data import plane
 
 # --- 1. Data Configuration ---
 TICKER = "AAPL"
@@ -15,76 +24,92 @@ PLOT_COLUMN = 'Close'
 HOVER_THRESHOLD = 10  # Pixels - how close to the line to trigger crosshair
 CACHE_DIR = "stock_data_cache"
 SAVE_DATA = True  # Set to False to skip saving
+STREAM_MODE = False  # Set to True to replay the cached CSV as a live feed
+REPLAY_SOURCE = os.path.join(CACHE_DIR, f"{TICKER}_{START_DATE}_{END_DATE}.csv")
+REPLAY_SPEED = 10  # Bars per second
+INDICATORS = [SMA(20), Bollinger(20, 2), RSI(14)]  # Drawn when plot_stock_data is given the OHLCV frame
+OUT_OF_CORE_ROWS = 5_000_000  # Cached histories longer than this are drawn from the on-disk pyramid, without loading them
 
-def get_cache_filename(ticker, start, end):
-    """Generate a cache filename based on ticker and date range."""
-    return os.path.join(CACHE_DIR, f"{ticker}_{start}_{end}.csv")
+# Everything build_stock_plot creates, so the window and its handlers can be driven without an event loop (e.g. benchmarks)
+StockPlot = namedtuple("StockPlot", ["window", "plot_widget", "view_box", "lod_curve", "indicator_curves",
+                                     "is_near_curve", "mouse_moved", "mouse_drag_event", "mouse_proxy", "overlay",
+                                     "set_granularity"])
+
+def download_data(ticker, start, end):
+    """Downloads a date range from yfinance. Returns None if the download failed."""
+    import yfinance as yf  # Slow to import, and not needed at all when the range is already cached
+    try:
+        data = flatten_columns(yf.download(ticker, start=start, end=end, progress=False))
+    except Exception as e:
+        print(f"An unexpected error occurred during download: {e}")
+        return None
+
+    if data.empty:
+        print(f"yfinance returned an empty dataset for {ticker} from {start} to {end}.")
+        return data
+
+    if PLOT_COLUMN not in data.columns:
+        print(f"Error: '{PLOT_COLUMN}' column not found. Available columns: {list(data.columns)}")
+        return None
+
+    return data
 
 def load_cached_data(ticker, start, end):
-    """Try to load data from cache."""
-    cache_file = get_cache_filename(ticker, start, end)
-    if os.path.exists(cache_file):
-        try:
-            print(f"Loading cached data from {cache_file}...")
-            data = pd.read_csv(cache_file, index_col='Date', parse_dates=True)
-            return data[PLOT_COLUMN]
-        except Exception as e:
-            print(f"Error loading cache: {e}")
+    """Try to load data from cache. Returns None unless the whole range is already stored."""
+    try:
+        store = TickStore(ticker, CACHE_DIR)
+        if store.missing(start, end):
             return None
-    return None
+        print(f"Loading cached data from {store.data_file}...")
+        data = store.read_column(PLOT_COLUMN, start, end)  # Memory-mapped, so nothing is read until it is drawn
+        return data if data is not None and not data.empty else None
+    except Exception as e:
+        print(f"Error loading cache: {e}")
+        return None
 
-def save_data_to_cache(data, ticker, start, end):
-    """Save data to cache."""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-    cache_file = get_cache_filename(ticker, start, end)
+def get_stock_frame(ticker, start, end):
+    """Loads the full OHLCV frame from the cache, downloading only the date ranges it does not cover yet."""
     try:
-        data.to_csv(cache_file)
-        print(f"Data saved to {cache_file}")
+        data = TickStore(ticker, CACHE_DIR).get(start, end, downloader=download_data, save=SAVE_DATA)
     except Exception as e:
-        print(f"Error saving cache: {e}")
+        print(f"Error loading cache: {e}")
+        return None
+
+    if data is None:
+        print(f"No data available for {ticker} from {start} to {end}.")
+        return None
+    return data
 
 def get_stock_data(ticker, start, end):
     """Downloads stock data from yfinance or loads from cache."""
-    # Try loading from cache first
-    cached_data = load_cached_data(ticker, start, end)
-    if cached_data is not None:
-        return cached_data
-    
-    print(f"Downloading {ticker} data from {start} to {end}...")
-    try:
-        data = yf.download(ticker, start=start, end=end, progress=False)
-        
-        if data.empty:
-            print(f"yfinance returned an empty dataset for {ticker}.")
-            return None
-            
-        if PLOT_COLUMN not in data.columns:
-            print(f"Error: '{PLOT_COLUMN}' column not found. Available columns: {list(data.columns)}")
-            return None
-        
-        result = data[PLOT_COLUMN]
-        
-        if SAVE_DATA:
-            save_data_to_cache(data, ticker, start, end)
-        
-        return result
-        
-    except Exception as e:
-        print(f"An unexpected error occurred during download: {e}")
-        return None
+    data = get_stock_frame(ticker, start, end)
+    return data[PLOT_COLUMN] if data is not None else None
+
+def get_stock_bars(ticker, start, end, rule):
+    """Cached data as bars of size `rule` ("D", "W", "M" or "Y"). Resampled once per cache version; never downloads."""
+    return TickStore(ticker, CACHE_DIR).resampled(rule, start, end)
 
-def plot_stock_data(data):
+def build_stock_plot(data, ohlcv=None, indicators=INDICATORS, pyramid=None, resample=None):
     """
-    Plots the stock data using PyQtGraph with a crosshair that appears only when hovering over the line.
+    Builds the price chart window with a crosshair that appears only when hovering over the line.
+    If the full OHLCV frame is passed as `ohlcv`, the indicators are drawn over the price line
+    (oscillators in a second plot underneath that shares the date axis).
+    If a `pyramid` from TickStore.pyramid is passed, the whole history it covers is drawn straight
+    from disk and `data` only sets the initial view, so the chart can browse more data than fits in memory.
+    If `resample(rule)` is given (returning OHLCV bars, e.g. get_stock_bars), a selector switches the bar size.
+    Needs a QApplication; returns a StockPlot without showing the window.
     """
     
     # 1. Prepare Data
-    dates_in_seconds = data.index.to_numpy().astype(np.int64) // 10**9
-    prices = data.values.astype(float).flatten()
+    with span("plot.data_prep"):
+        if pyramid is not None:
+            # Level 0 of the pyramid is float seconds and the memory-mapped prices - used as is, never copied
+            dates_in_seconds, prices, _ = pyramid[0]
+        else:
+            dates_in_seconds = data.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+            prices = data.to_numpy(dtype=float)
 
     # --- 2. PyQtGraph Setup ---
-    app = QApplication(sys.argv)
     main_window = QMainWindow()
     main_window.setWindowTitle(f'{TICKER} Stock Price - PyQtGraph (Interactive)')
 
@@ -96,13 +121,30 @@ def plot_stock_data(data):
     plot_widget = pg.PlotWidget(axisItems={'bottom': date_axis})
     layout.addWidget(plot_widget)
 
-    # Plot the data
-    curve = plot_widget.plot(
-        dates_in_seconds, 
-        prices,           
-        pen=pg.mkPen(color='#3498db', width=2), 
+    # Plot the data - the curve only ever holds ~2 points per visible pixel, taken from a
+    # min/max pyramid that is rebuilt from the view box signals whenever the x range changes
+    lod_curve = LODCurve(
+        plot_widget,
+        dates_in_seconds,
+        prices,
+        pyramid=pyramid,
+        pen=pg.mkPen(color='#3498db', width=2),
         name=PLOT_COLUMN
     )
+    curve = lod_curve.curve
+    indicator_curves = {}
+
+    # Indicator overlays, with oscillators in their own plot linked to the same date range
+    if ohlcv is not None and indicators:
+        oscillator_widget = None
+        if any(not indicator.overlay for indicator in indicators):
+            oscillator_widget = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem(orientation='bottom')})
+            oscillator_widget.setXLink(plot_widget)
+            oscillator_widget.showGrid(x=True, y=True)
+            layout.addWidget(oscillator_widget, 1)
+            layout.setStretchFactor(plot_widget, 3)
+        plot_widget.addLegend().addItem(curve, PLOT_COLUMN)
+        indicator_curves = add_indicator_overlays(plot_widget, dates_in_seconds, ohlcv, indicators, oscillator_widget)
     
     plot_widget.setTitle(f'{PLOT_COLUMN} Price for {TICKER}')
     plot_widget.setLabel('left', 'Price', units='USD')
@@ -156,7 +198,8 @@ def plot_stock_data(data):
                         center_x = (x_range[0] + x_range[1]) / 2
                         
                         new_x_range = [center_x - new_width / 2, center_x + new_width / 2]
-                        view_box.setRange(xRange=new_x_range, yRange=y_range, padding=0)
+                        with span("stretch.setRange"):
+                            view_box.setRange(xRange=new_x_range, yRange=y_range, padding=0)
                     
                     if ev.isFinish():
                         stretch_state['dragging'] = False
@@ -191,44 +234,16 @@ def plot_stock_data(data):
     plot_widget.addItem(coord_label, ignoreBounds=True)
     coord_label.hide()
     
+    hover_engine = HoverEngine(view_box, dates_in_seconds, prices)
+
     def is_near_curve(mouse_point_view, threshold_pixels=HOVER_THRESHOLD):
         """
         Check if mouse_point_view is within threshold_pixels of the curve.
         Returns (is_close, closest_price) where closest_price is the y-value on the curve at that x.
         """
-        mouse_x = mouse_point_view.x()
-        mouse_y = mouse_point_view.y()
-        
-        # Find the closest data point to the mouse x-coordinate
-        distances = np.abs(dates_in_seconds - mouse_x)
-        closest_idx = np.argmin(distances)
-        
-        # Get the curve's y-value at that x position
-        curve_y = prices[closest_idx]
-        
-        # Convert pixel threshold to data coordinates
-        # Get the bounds of the plot in view coordinates
-        plot_item = plot_widget.getPlotItem()
-        view_box = plot_item.vb
-        
-        # Get a small offset in pixels and convert to data coordinates
-        ref_point = view_box.mapSceneToView(plot_widget.mapToScene(0, 0))
-        offset_point = view_box.mapSceneToView(plot_widget.mapToScene(threshold_pixels, 0))
-        pixel_to_data = abs(offset_point.x() - ref_point.x())
-        
-        # Check if mouse is close in both x and y
-        x_dist = abs(dates_in_seconds[closest_idx] - mouse_x)
-        y_dist = abs(curve_y - mouse_y)
-        
-        # Convert y_dist to pixel equivalent
-        ref_y = view_box.mapSceneToView(plot_widget.mapToScene(0, 0)).y()
-        offset_y = view_box.mapSceneToView(plot_widget.mapToScene(0, threshold_pixels)).y()
-        pixel_to_data_y = abs(offset_y - ref_y)
-        
-        is_close = (x_dist < pixel_to_data * 2) and (y_dist < pixel_to_data_y * 2)
-        
-        return is_close, curve_y, closest_idx
+        return hover_engine.hit(mouse_point_view.x(), mouse_point_view.y(), threshold_pixels)
     
+    @instrument("mouseMoved")
     def mouseMoved(pos):
         """Handler for mouse movement over the plot."""
         if plot_widget.sceneBoundingRect().contains(pos):
@@ -243,11 +258,11 @@ def plot_stock_data(data):
                 coord_label.show()
                 
                 # Update line positions
-                vLine.setPos(dates_in_seconds[closest_idx])
+                vLine.setPos(hover_engine.x[closest_idx])
                 hLine.setPos(curve_y)
                 
                 # Format and update label
-                timestamp_sec = dates_in_seconds[closest_idx]
+                timestamp_sec = hover_engine.x[closest_idx]
                 try:
                     date_str = datetime.fromtimestamp(timestamp_sec).strftime('%Y-%m-%d')
                 except ValueError:
@@ -255,22 +270,111 @@ def plot_stock_data(data):
                 
                 price_str = f"{curve_y:.2f}"
                 coord_label.setText(f"Date: {date_str}, Price: ${price_str}")
-                coord_label.setPos(dates_in_seconds[closest_idx], curve_y)
+                coord_label.setPos(hover_engine.x[closest_idx], curve_y)
             else:
                 # Hide crosshair when not near the curve
                 vLine.hide()
                 hLine.hide()
                 coord_label.hide()
 
-    plot_widget.scene().sigMouseMoved.connect(mouseMoved)
+    # Mouse moves arrive far faster than the screen can redraw, so only handle one per frame
+    mouse_proxy = throttled_mouse_moved(plot_widget.scene(), mouseMoved)
+
+    # FPS/latency readout, only when CHART_PROFILE is set
+    overlay = attach_overlay(plot_widget, ["mouseMoved", "stretch.setRange", "LODCurve.update"])
+
+    # --- 5. Bar size ---
+    def set_granularity(rule):
+        """Redraw the price line and indicators as bars of size `rule`, or as the data passed in if rule is None."""
+        frame = ohlcv if rule is None else resample(rule)
+        if rule is not None and (frame is None or frame.empty):
+            return
+        close = data if rule is None else frame[PLOT_COLUMN]
+        x = close.index.to_numpy().astype('datetime64[s]').astype(np.int64)
+        y = close.to_numpy(dtype=float)
+        lod_curve.set_data(x, y)
+        hover_engine.set_data(x, y)
+        if frame is not None:
+            for indicator in indicators:
+                for name, values in indicator.compute(frame).items():
+                    if name in indicator_curves:
+                        indicator_curves[name].set_data(x, values)
+
+    # Switching only re-reads bars the tick store has already resampled and cached
+    if resample is not None:
+        granularity_box = QComboBox()
+        granularity_box.addItems(["As loaded"] + list(GRANULARITIES))
+        granularity_box.currentTextChanged.connect(lambda label: set_granularity(GRANULARITIES.get(label)))
+        layout.insertWidget(0, granularity_box, 0, Qt.AlignLeft)
+
+    # Out of core: open on the requested window rather than auto-ranging over the whole history
+    if pyramid is not None and data is not None and not data.empty:
+        window_seconds = data.index[[0, -1]].to_numpy().astype('datetime64[s]').astype(np.int64)
+        view_box.setXRange(*window_seconds, padding=0.02)
 
-    main_window.show()
+    return StockPlot(main_window, plot_widget, view_box, lod_curve, indicator_curves,
+                     is_near_curve, mouseMoved, custom_mouseDragEvent, mouse_proxy, overlay, set_granularity)
+
+def plot_stock_data(data, ohlcv=None, indicators=INDICATORS, pyramid=None, resample=None):
+    """Plots the stock data using PyQtGraph - see build_stock_plot."""
+    app = QApplication(sys.argv)
+    plot = build_stock_plot(data, ohlcv, indicators, pyramid, resample)
+    plot.window.show()
+    sys.exit(app.exec_())
+
+def stream_stock_data(ticker, source):
+    """Chart bars as they arrive from a replay of cached data, appending instead of rebuilding."""
+    app = QApplication(sys.argv)
+
+    date_axis = pg.DateAxisItem(orientation='bottom')
+    plot_widget = pg.PlotWidget(axisItems={'bottom': date_axis})
+    plot_widget.setTitle(f"{ticker} Live Close Price")
+    plot_widget.setLabel('left', 'Price', units='USD')
+    plot_widget.showGrid(x=True, y=True)
+
+    central_widget = QWidget()
+    layout = QVBoxLayout(central_widget)
+    layout.addWidget(plot_widget, 3)
+    oscillator_widget = None
+    if any(not indicator.overlay for indicator in INDICATORS):
+        oscillator_widget = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem(orientation='bottom')})
+        oscillator_widget.setXLink(plot_widget)
+        oscillator_widget.showGrid(x=True, y=True)
+        layout.addWidget(oscillator_widget, 1)
+
+    # Indicators advance by one update() per closed bar rather than being recomputed over the whole stream
+    chart = LiveLineChart(plot_widget, indicators=INDICATORS, oscillator_widget=oscillator_widget)
+    feed = ReplayFeed(ticker, source, speed=REPLAY_SPEED)
+    feed.bar.connect(chart.on_bar)
+
+    window = QMainWindow()
+    window.setCentralWidget(central_widget)
+    window.setWindowTitle(f"{ticker} Live Close Price")
+    window.resize(1200, 600)
+    window.show()
+
+    feed.start()
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
-    aapl_data = get_stock_data(TICKER, START_DATE, END_DATE)
+    if STREAM_MODE:
+        stream_stock_data(TICKER, REPLAY_SOURCE)
+
+    # Histories too long to load are browsed from disk: the window comes straight from the memory map,
+    # and zooming out reads the pyramid levels instead of the raw rows
+    store = TickStore(TICKER, CACHE_DIR)
+    history = store.read_column(PLOT_COLUMN) if not store.missing(START_DATE, END_DATE) else None
+    if history is not None and len(history) > OUT_OF_CORE_ROWS:
+        plot_stock_data(store.read_column(PLOT_COLUMN, START_DATE, END_DATE), pyramid=store.pyramid(PLOT_COLUMN))
+
+    aapl_frame = get_stock_frame(TICKER, START_DATE, END_DATE)
     
-    if aapl_data is not None and not aapl_data.empty:
-        plot_stock_data(aapl_data)
+    if aapl_frame is not None and not aapl_frame.empty:
+        # Published once to shared memory: the chart draws from views of the block, and worker processes
+        # (e.g. PredictionEngine.predict_many) can map the same pages instead of being sent a pickled copy
+        shared = plane.publish(TICKER, aapl_frame)
+        del aapl_frame
+        plot_stock_data(shared.series(PLOT_COLUMN), ohlcv=shared.frame(),
+                        resample=lambda rule: get_stock_bars(TICKER, START_DATE, END_DATE, rule))
     else:
         print("Exiting plot due to data error.")
\ No newline at end of file
@@ -0,0 +1,283 @@
+import hashlib
+import threading
+import importlib.util
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from indicators import rsi, sma
+from shared_data import attach, plane
+
+# --- 1. Prediction Configuration ---
+HORIZONS = {"Day": 1, "Month": 21, "Year": 252}  # Trading days ahead for each time period button
+RETURN_LAGS = (1, 5, 21)
+VOLATILITY_WINDOW = 21
+MIN_TRAINING_ROWS = 60
+
+FeatureSet = namedtuple("FeatureSet", ["X", "close", "log_close", "feature_names"])
+Prediction = namedtuple("Prediction", ["ticker", "model", "period", "risk_level", "last_close",
+                                       "expected_return", "predicted_price", "signal"])
+
+
+def data_version(data):
+    """Short content hash of an OHLCV frame - changes whenever any bar is added or revised."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(np.ascontiguousarray(data.index.asi8).tobytes())
+    digest.update(np.ascontiguousarray(data["Close"].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def build_features(close):
+    """
+    Build the feature matrix once per ticker; every model and horizon trains on the same rows.
+    Features: lagged log returns, rolling volatility, price vs moving averages and RSI.
+    Rows before every feature is defined are NaN.
+    """
+    close = np.asarray(close, dtype=float)
+    log_close = np.log(close)
+    columns, names = [], []
+    for lag in RETURN_LAGS:
+        ret = np.full(len(close), np.nan)
+        ret[lag:] = log_close[lag:] - log_close[:-lag]
+        columns.append(ret)
+        names.append(f"return_{lag}")
+
+    daily = np.concatenate(([np.nan], np.diff(log_close)))
+    squared = np.nan_to_num(daily) ** 2
+    csum = np.cumsum(np.insert(squared, 0, 0.0))
+    volatility = np.full(len(close), np.nan)
+    w = VOLATILITY_WINDOW
+    if len(close) > w:
+        volatility[w:] = np.sqrt((csum[w + 1:] - csum[1:-w]) / w)
+    columns.append(volatility)
+    names.append("volatility")
+
+    for window in (20, 50):
+        columns.append(close / sma(close, window) - 1)
+        names.append(f"sma_ratio_{window}")
+    columns.append(rsi(close) / 100 - 0.5)
+    names.append("rsi")
+    return FeatureSet(np.column_stack(columns), close, log_close, tuple(names))
+
+
+def training_rows(features, horizon):
+    """Features and forward log return over `horizon` bars, limited to rows where both are defined."""
+    y = np.full(len(features.close), np.nan)
+    y[:-horizon] = features.log_close[horizon:] - features.log_close[:-horizon]
+    valid = np.isfinite(features.X).all(axis=1) & np.isfinite(y)
+    return features.X[valid], y[valid]
+
+
+# --- 2. Models ---
+class PredictionModel:
+    """Common interface: fit on (X, y) and predict a forward log return for each row of X."""
+    name = None
+    version = 1  # Bump when a model's fitting changes, so backtests cached on disk are recomputed
+    cpu_bound = False  # Fitting takes long enough to be worth sending to a worker process
+    requires = {}  # Optional dependencies, {module imported: package to pip install}
+
+    @classmethod
+    def missing(cls):
+        """Packages in `requires` that are not installed - found without importing them, so this is cheap."""
+        return [package for module, package in cls.requires.items() if importlib.util.find_spec(module) is None]
+
+    def fit(self, X, y):
+        raise NotImplementedError
+
+    def predict(self, X):
+        raise NotImplementedError
+
+
+class LinearRegModel(PredictionModel):
+    name = "Linear Reg"
+
+    def fit(self, X, y):
+        # Closed-form least squares on [1, X]
+        design = np.column_stack((np.ones(len(X)), X))
+        self.coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+        return self
+
+    def predict(self, X):
+        return self.coef[0] + np.asarray(X) @ self.coef[1:]
+
+
+class RandomForestModel(PredictionModel):
+    name = "Random Forrest"
+    cpu_bound = True
+    requires = {"sklearn": "scikit-learn"}
+
+    def __init__(self, n_estimators=100, max_depth=6, seed=0):
+        self.params = {"n_estimators": n_estimators, "max_depth": max_depth, "random_state": seed, "n_jobs": 1}
+
+    def fit(self, X, y):
+        try:
+            from sklearn.ensemble import RandomForestRegressor
+        except ImportError:
+            raise ImportError("The Random Forrest model needs scikit-learn (pip install scikit-learn)")
+        self.model = RandomForestRegressor(**self.params).fit(X, y)
+        return self
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+
+class RLModel(PredictionModel):
+    """
+    One-step Q-learning over a small discrete state space (recent trend x volatility regime) with
+    short/flat/long actions. A position's reward is its return over the horizon less `trade_cost`, so
+    with no discounting Q(s, a) = a * mean return in s - trade_cost * |a|, and the whole table is fitted
+    at once with bincount instead of an episode loop. The prediction is the return of the action the
+    policy picks, as a move in the stock: a long or short only when its edge beats the cost, else flat (0).
+    """
+    name = "Reinforcement Learning"
+    version = 2
+    ACTIONS = np.array([-1.0, 0.0, 1.0])
+
+    def __init__(self, trend_bins=5, vol_bins=3, trade_cost=0.001):
+        self.trend_bins, self.vol_bins, self.trade_cost = trend_bins, vol_bins, trade_cost
+
+    def _states(self, X):
+        trend = np.digitize(X[:, 1], self.trend_edges)
+        vol = np.digitize(X[:, len(RETURN_LAGS)], self.vol_edges)
+        return trend * self.vol_bins + vol
+
+    def fit(self, X, y):
+        self.trend_edges = np.quantile(X[:, 1], np.linspace(0, 1, self.trend_bins + 1)[1:-1])
+        self.vol_edges = np.quantile(X[:, len(RETURN_LAGS)], np.linspace(0, 1, self.vol_bins + 1)[1:-1])
+        states = self._states(X)
+        n_states = self.trend_bins * self.vol_bins
+        counts = np.bincount(states, minlength=n_states)
+        mean_return = np.bincount(states, weights=y, minlength=n_states) / np.maximum(counts, 1)
+        self.q_table = mean_return[:, None] * self.ACTIONS[None, :] - self.trade_cost * np.abs(self.ACTIONS)[None, :]
+        return self
+
+    def predict(self, X):
+        q = self.q_table[self._states(np.asarray(X))]
+        best = q.argmax(axis=1)
+        # A short earns the negative of the stock's move, so its return is turned back into one
+        return q[np.arange(len(q)), best] * self.ACTIONS[best]
+
+
+MODELS = {model.name: model for model in (LinearRegModel, RandomForestModel, RLModel)}
+
+
+def signal_from_return(expected_return, features, horizon, risk_level):
+    """
+    Turn an expected return into Buy/Sell/Hold. The move must beat a fraction of the volatility
+    expected over the horizon, and that fraction shrinks as risk tolerance (1-10) goes up,
+    so riskier settings act more often.
+    """
+    volatility = features.X[-1, len(RETURN_LAGS)] * np.sqrt(horizon)
+    threshold = volatility * (11 - risk_level) / 10
+    if expected_return > threshold:
+        return "Buy"
+    if expected_return < -threshold:
+        return "Sell"
+    return "Hold"
+
+
+def fit_and_predict(ticker, close, model_name, period, risk_level, features=None):
+    """Fit one model for one ticker/horizon and predict from the latest bar. Safe to run in a worker process."""
+    features = features if features is not None else build_features(close)
+    horizon = HORIZONS[period]
+    X, y = training_rows(features, horizon)
+    if len(X) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Not enough history for {ticker} to predict a {period.lower()} ahead")
+    latest = features.X[-1:]
+    if not np.isfinite(latest).all():
+        raise ValueError(f"Latest bar for {ticker} is missing features")
+
+    model = MODELS[model_name]().fit(X, y)
+    expected_return = float(np.expm1(model.predict(latest)[0]))
+    last_close = float(features.close[-1])
+    return Prediction(ticker, model_name, period, risk_level, last_close, expected_return,
+                      last_close * (1 + expected_return), signal_from_return(expected_return, features, horizon, risk_level))
+
+
+def fit_and_predict_shared(spec, model_name, period, risk_level):
+    """fit_and_predict on a frame published to shared memory - the worker reads the closes in place instead of unpickling them."""
+    with attach(spec) as shared:
+        return fit_and_predict(spec.key, shared.column("Close"), model_name, period, risk_level)
+
+
+# --- 3. Engine ---
+class PredictionEngine:
+    """
+    Shares features across models and horizons and memoises predictions by
+    (ticker, data version, model, horizon, risk level), so switching between settings that have
+    already been run is a dictionary lookup. Safe to call from several job threads.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._features = {}
+        self._predictions = {}
+        self._lock = threading.Lock()
+
+    def features(self, ticker, data, version=None):
+        version = version or data_version(data)
+        key = (ticker, version)
+        with self._lock:
+            if key not in self._features:
+                # Keep only the latest version of each ticker's features
+                for old_key in [k for k in self._features if k[0] == ticker]:
+                    del self._features[old_key]
+                self._features[key] = build_features(data["Close"].to_numpy(dtype=float))
+            return self._features[key]
+
+    def predict(self, ticker, data, model_name, period, risk_level, run=None):
+        """
+        Prediction for one ticker. `run(fn, *args)`, if given, is used to call the fit of cpu_bound models -
+        e.g. JobScheduler.run_in_process, so a slow fit runs in a worker process instead of a thread of the caller.
+        Like predict_many, the frame is published to shared memory for it rather than pickled to the worker.
+        """
+        version = data_version(data)
+        key = (ticker, version, model_name, HORIZONS[period], risk_level)
+        with self._lock:
+            if key in self._predictions:
+                return self._predictions[key]
+        if run is not None and MODELS[model_name].cpu_bound:
+            shared = plane.publish(ticker, data, version)
+            try:
+                prediction = run(fit_and_predict_shared, shared.spec, model_name, period, risk_level)
+            finally:
+                plane.release(shared)
+        else:
+            prediction = fit_and_predict(ticker, None, model_name, period, risk_level, self.features(ticker, data, version))
+        with self._lock:
+            self._predictions[key] = prediction
+        return prediction
+
+    def predict_many(self, datasets, model_name, period, risk_level):
+        """
+        Predict for many tickers at once ({ticker: OHLCV frame}). Cached results are returned directly;
+        the rest are published to shared memory and fitted in a process pool, one ticker per task, so each
+        worker maps the data instead of receiving a pickled copy. Returns {ticker: Prediction or Exception}.
+        """
+        results, pending = {}, {}
+        for ticker, data in datasets.items():
+            version = data_version(data)
+            key = (ticker, version, model_name, HORIZONS[period], risk_level)
+            if key in self._predictions:
+                results[ticker] = self._predictions[key]
+            else:
+                pending[ticker] = (key, version, data)
+
+        if pending:
+            published = {}
+            try:
+                for ticker, (key, version, data) in pending.items():
+                    published[ticker] = plane.publish(ticker, data, version)
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    futures = {ticker: pool.submit(fit_and_predict_shared, shared.spec, model_name, period, risk_level)
+                               for ticker, shared in published.items()}
+                    for ticker, future in futures.items():
+                        try:
+                            results[ticker] = future.result()
+                            with self._lock:
+                                self._predictions[pending[ticker][0]] = results[ticker]
+                        except Exception as e:
+                            results[ticker] = e
+            finally:
+                for shared in published.values():
+                    plane.release(shared)
+        return results
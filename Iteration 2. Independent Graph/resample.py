@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# --- 1. Resampling Configuration ---
+# Bar sizes, each with the numpy datetime unit its periods are truncated to. Weeks are handled
+# separately because numpy's weeks start on a Thursday (1970-01-01); ours start on a Monday.
+RULES = {"D": "datetime64[D]", "W": None, "M": "datetime64[M]", "Y": "datetime64[Y]"}
+GRANULARITIES = {"Day": "D", "Week": "W", "Month": "M", "Year": "Y"}  # Button labels -> rule
+# How each OHLCV column is reduced over a period; any other column keeps its last value
+AGGREGATIONS = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+CACHE_SIZE = 32  # Resampled frames kept by cached_resample, across all tickers and bar sizes
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()  # Chart jobs resample on worker threads while the GUI resamples on its own
+
+
+def period_starts(dates, rule):
+    """Start of the period (as datetime64[ns]) that each timestamp falls in."""
+    if rule not in RULES:
+        raise ValueError(f"Unknown bar size {rule}. Choose from {list(RULES)}")
+    dates = np.asarray(dates).astype("datetime64[ns]")
+    if rule == "W":
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        return (days - (days + 3) % 7).astype("datetime64[D]").astype("datetime64[ns]")
+    return dates.astype(RULES[rule]).astype("datetime64[ns]")
+
+
+def period_bounds(dates, rule):
+    """
+    (labels, starts, ends) for sorted timestamps: each period's start date, and the first and
+    last row that falls in it. Periods are found with one comparison of neighbouring rows.
+    """
+    keys = period_starts(dates, rule)
+    if not len(keys):
+        return keys, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    ends = np.concatenate((starts[1:], [len(keys)])) - 1
+    return keys[starts], starts, ends
+
+
+def _reduce(values, how, starts, ends):
+    values = np.asarray(values, dtype=float)
+    if not len(starts):
+        return values[:0]
+    if how == "first":
+        return values[starts]
+    if how == "max":
+        return np.fmax.reduceat(values, starts)
+    if how == "min":
+        return np.fmin.reduceat(values, starts)
+    if how == "sum":
+        return np.add.reduceat(np.nan_to_num(values), starts)
+    return values[ends]
+
+
+def resample_ohlcv(data, rule):
+    """
+    OHLCV bars at a coarser size ("D", "W", "M" or "Y"): first open, max high, min low, last close
+    and summed volume per period, labelled with the period's start date. Each column is a single
+    reduceat over the sorted rows, so the cost is one pass whatever the bar size.
+    """
+    labels, starts, ends = period_bounds(data.index.to_numpy(), rule)
+    index = pd.DatetimeIndex(labels, name=data.index.name)
+    return pd.DataFrame({col: _reduce(data[col].to_numpy(), AGGREGATIONS.get(col, "last"), starts, ends)
+                         for col in data.columns}, index=index)
+
+
+def resample_series(series, rule, how="last"):
+    """One series at a coarser bar size - by default the last value in each period, as for a close price."""
+    labels, starts, ends = period_bounds(series.index.to_numpy(), rule)
+    return pd.Series(_reduce(series.to_numpy(), how, starts, ends),
+                     index=pd.DatetimeIndex(labels, name=series.index.name), name=series.name)
+
+
+# --- 2. Cache ---
+def cached_resample(key, version, rule, load):
+    """
+    resample_ohlcv(load(), rule), computed once per (key, version, rule). `version` must change
+    whenever the base data does (e.g. the cache file's modification time), so revised data is
+    never served stale; `load` is only called on a miss. The least recently used frames are dropped.
+    """
+    cache_key = (key, version, rule)
+    with _cache_lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+    bars = resample_ohlcv(load(), rule)
+    with _cache_lock:
+        # Older versions of the same data can never be asked for again
+        for old_key in [k for k in _cache if k[0] == key and k[1] != version]:
+            del _cache[old_key]
+        _cache[cache_key] = bars
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return bars
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
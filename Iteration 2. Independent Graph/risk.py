@@ -0,0 +1,122 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# --- 1. Simulation Configuration ---
+PATHS = 10_000  # Price paths per run
+CHUNK_VALUES = 1_000_000  # Path bars generated at once (8 MB of float64), whatever the horizon - bounds memory
+PARALLEL_PATHS = 200_000  # Runs with at least this many paths spread their chunks over a process pool
+ESTIMATION_BARS = 252  # Drift and volatility are estimated from this many recent bars
+CONFIDENCE = 0.95  # VaR / CVaR level
+SEED = 0
+# Risk tolerance (1-10) is mapped linearly onto these: the fraction of capital put in the position and the
+# loss at which it is stopped out. The take-profit level is REWARD_TO_RISK times the stop distance.
+POSITION_RANGE = (0.1, 1.0)
+STOP_LOSS_RANGE = (0.03, 0.30)
+REWARD_TO_RISK = 2.0
+
+RiskProfile = namedtuple("RiskProfile", ["risk_level", "position", "stop_loss", "take_profit"])
+RiskReport = namedtuple("RiskReport", ["profile", "paths", "horizon", "drift", "volatility", "mean_return",
+                                       "return_p5", "return_p50", "return_p95", "prob_loss", "var", "cvar",
+                                       "drawdown_p50", "drawdown_p95", "stopped_out", "took_profit"])
+
+
+def risk_profile(risk_level):
+    """Position size and stop rules for a risk tolerance from 1 (cautious) to 10 (aggressive)."""
+    if not 1 <= risk_level <= 10:
+        raise ValueError(f"Risk level must be between 1 and 10, not {risk_level}")
+    t = (risk_level - 1) / 9
+    position = POSITION_RANGE[0] + t * (POSITION_RANGE[1] - POSITION_RANGE[0])
+    stop_loss = STOP_LOSS_RANGE[0] + t * (STOP_LOSS_RANGE[1] - STOP_LOSS_RANGE[0])
+    return RiskProfile(risk_level, position, stop_loss, stop_loss * REWARD_TO_RISK)
+
+
+def estimate_parameters(close, bars=ESTIMATION_BARS):
+    """Mean and standard deviation of the per-bar log return over the last `bars` bars."""
+    close = np.asarray(close, dtype=float)[-(bars + 1):]
+    returns = np.diff(np.log(close))
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < 2:
+        raise ValueError("Not enough history to estimate volatility")
+    return float(returns.mean()), float(returns.std(ddof=1))
+
+
+# --- 2. Paths ---
+def simulate_chunk(seed, paths, horizon, drift, volatility, profile):
+    """
+    One chunk of geometric Brownian motion paths as a single (paths, horizon) array, with the stop rules
+    applied to every path at once. Returns per-path position return, max drawdown and exit
+    (-1 stopped out, 1 took profit, 0 held to the horizon). Safe to run in a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    moves = rng.standard_normal((paths, horizon))
+    moves *= volatility
+    moves += drift
+    np.cumsum(moves, axis=1, out=moves)
+    np.expm1(moves, out=moves)  # Return since entry at each bar
+
+    # The position is closed at the first bar beyond either level (at that bar's price, so gaps go through the stop)
+    stop_hit = moves <= -profile.stop_loss
+    hit = stop_hit | (moves >= profile.take_profit)
+    exited = hit.any(axis=1)
+    exit_bar = np.where(exited, hit.argmax(axis=1), horizon - 1)
+    rows = np.arange(paths)
+    exit_return = moves[rows, exit_bar]
+    exit_kind = np.where(exited, np.where(stop_hit[rows, exit_bar], -1, 1), 0).astype(np.int8)
+
+    # Drawdown of the account (cash plus position) up to the exit; bars after it are ignored
+    equity = moves
+    equity *= profile.position
+    equity += 1
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=1)
+    equity /= peak
+    equity[np.arange(horizon)[None, :] > exit_bar[:, None]] = 1.0
+    drawdown = 1 - equity.min(axis=1)
+    return profile.position * exit_return, drawdown, exit_kind
+
+
+def chunk_sizes(paths, horizon, chunk_values=CHUNK_VALUES):
+    chunk = max(1, chunk_values // horizon)
+    return [min(chunk, paths - start) for start in range(0, paths, chunk)]
+
+
+def simulate(close, horizon, risk_level, paths=PATHS, seed=SEED, drift=None, max_workers=None, check=None):
+    """
+    Monte Carlo risk of holding a position sized by `risk_level` for `horizon` bars.
+    Paths follow GBM with the volatility (and, unless `drift` is given as a per-bar log return, the drift)
+    of recent closes. Chunks are seeded from one SeedSequence, so a run gives the same result whether its
+    chunks run in order or across a process pool. `check()`, if given, is called between chunks (e.g. to cancel).
+    """
+    estimated_drift, volatility = estimate_parameters(close)
+    drift = estimated_drift if drift is None else drift
+    profile = risk_profile(risk_level)
+    sizes = chunk_sizes(paths, horizon)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    outputs = []
+    if paths >= PARALLEL_PATHS and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(simulate_chunk, s, n, horizon, drift, volatility, profile) for s, n in zip(seeds, sizes)]
+            for future in futures:
+                if check is not None:
+                    check()
+                outputs.append(future.result())
+    else:
+        for s, n in zip(seeds, sizes):
+            if check is not None:
+                check()
+            outputs.append(simulate_chunk(s, n, horizon, drift, volatility, profile))
+
+    returns, drawdowns, exits = (np.concatenate(parts) for parts in zip(*outputs))
+    return summarize(returns, drawdowns, exits, profile, horizon, drift, volatility)
+
+
+def summarize(returns, drawdowns, exits, profile, horizon, drift, volatility, confidence=CONFIDENCE):
+    """Distribution, VaR/CVaR (as positive losses) and drawdown percentiles of simulated position returns."""
+    p5, p50, p95 = np.percentile(returns, [5, 50, 95])
+    cutoff = np.quantile(returns, 1 - confidence)
+    return RiskReport(profile, len(returns), horizon, drift, volatility, float(returns.mean()),
+                      float(p5), float(p50), float(p95), float((returns < 0).mean()),
+                      float(max(-cutoff, 0.0)), float(max(-returns[returns <= cutoff].mean(), 0.0)),
+                      float(np.percentile(drawdowns, 50)), float(np.percentile(drawdowns, 95)),
+                      float((exits == -1).mean()), float((exits == 1).mean()))
@@ -0,0 +1,187 @@
+import os
+import atexit
+import itertools
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from stock_cache import COLUMNS, columns_to_index, columns_to_series, content_hash, index_to_epoch_ns
+
+# --- 1. Shared Memory Configuration ---
+# A frame is published once into a shared memory block laid out like the binary cache without its
+# header: the Date column (int64 ns) followed by each OHLCV column (float64), `rows` values each.
+# Worker processes are sent only a SharedFrameSpec (a few bytes to pickle) and map the same pages.
+NAME_PREFIX = "ohlcv"  # Block names are f"{NAME_PREFIX}_{pid}_{n}", so a block can be traced back to its owner
+LAYOUT = ("Date",) + COLUMNS
+
+SharedFrameSpec = namedtuple("SharedFrameSpec", ["name", "rows", "key", "version"])
+
+_names = itertools.count()
+
+
+def _block_size(rows):
+    return max(8 * rows * len(LAYOUT), 1)  # Zero-size blocks are not allowed
+
+
+class SharedFrame:
+    """
+    An OHLCV frame in a shared memory block. The views it hands out (columns, series, frame) read the
+    block directly - nothing is copied - so they must be dropped before the block is closed.
+    Created by DataPlane.publish in the owning process, or by attach() in a worker.
+    """
+
+    def __init__(self, shm, spec):
+        self.shm = shm
+        self.spec = spec
+
+    def columns(self):
+        """Dict of numpy views keyed by 'Date' and the OHLCV column names, as stock_cache.read_binary_cache returns."""
+        rows = self.spec.rows
+        columns = {}
+        for i, name in enumerate(LAYOUT):
+            columns[name] = np.ndarray(rows, dtype="<i8" if name == "Date" else "<f8", buffer=self.shm.buf, offset=8 * rows * i)
+        return columns
+
+    def column(self, name):
+        return self.columns()[name]
+
+    def series(self, column="Close"):
+        """One column as a Series over the block."""
+        return columns_to_series(self.columns(), column)
+
+    def frame(self):
+        """The OHLCV DataFrame over the block (one pandas block per column, so none of them is copied)."""
+        columns = self.columns()
+        return pd.DataFrame({col: columns[col] for col in COLUMNS}, index=columns_to_index(columns), copy=False)
+
+    def close(self):
+        """Unmap the block from this process. If a view is still alive, the mapping is left to close when it is collected."""
+        try:
+            self.shm.close()
+        except BufferError:
+            pass
+
+
+def write_frame(shm, data):
+    """Copy an OHLCV frame's dates and columns into a block - the only copy the data plane makes."""
+    rows = len(data)
+    for i, name in enumerate(LAYOUT):
+        target = np.ndarray(rows, dtype="<i8" if name == "Date" else "<f8", buffer=shm.buf, offset=8 * rows * i)
+        target[:] = index_to_epoch_ns(data.index) if name == "Date" else data[name].to_numpy(dtype=float)
+        del target  # Views left alive would stop the block from being closed
+
+
+@contextmanager
+def attach(spec):
+    """
+    Map a published frame in a worker process for the length of a `with` block:
+    `with attach(spec) as shared: close = shared.column("Close")`. Only the owner ever unlinks the block.
+    """
+    # Attaching registers the name with the resource tracker the worker shares with its parent. The tracker
+    # keeps a set of names, so this is a no-op and the owner's unlink still unregisters it exactly once.
+    shared = SharedFrame(shared_memory.SharedMemory(name=spec.name), spec)
+    try:
+        yield shared
+    finally:
+        shared.close()
+
+
+# --- 2. Data Plane ---
+class DataPlane:
+    """
+    Reference-counted registry of the frames this process has published. Publishing the same
+    (key, version) again returns the existing block with one more reference; the block is unlinked
+    when the last reference is released, and every block still published is unlinked at exit.
+    Safe to call from several job threads.
+    """
+
+    def __init__(self):
+        self._blocks = {}  # (key, version) -> [SharedFrame, references]
+        self._lock = threading.Lock()
+
+    def publish(self, key, data, version=None):
+        """Put an OHLCV frame into shared memory (or reuse the block already holding it). Returns a SharedFrame; release it when done."""
+        version = version or content_hash(data)
+        with self._lock:
+            entry = self._blocks.get((key, version))
+            if entry is not None:
+                entry[1] += 1
+                return entry[0]
+
+        rows = len(data)
+        shm = shared_memory.SharedMemory(name=f"{NAME_PREFIX}_{os.getpid()}_{next(_names)}", create=True, size=_block_size(rows))
+        try:
+            write_frame(shm, data)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        shared = SharedFrame(shm, SharedFrameSpec(shm.name, rows, key, version))
+
+        with self._lock:
+            entry = self._blocks.get((key, version))
+            if entry is None:
+                self._blocks[(key, version)] = [shared, 1]
+                return shared
+            entry[1] += 1  # Another thread published the same data meanwhile - use its block
+        shared.close()
+        shm.unlink()
+        return entry[0]
+
+    def acquire(self, shared):
+        """Take another reference to a published frame."""
+        with self._lock:
+            self._blocks[(shared.spec.key, shared.spec.version)][1] += 1
+        return shared
+
+    def release(self, shared):
+        """Drop one reference. The last one unlinks the block; workers that still have it mapped keep reading it."""
+        with self._lock:
+            entry = self._blocks.get((shared.spec.key, shared.spec.version))
+            if entry is None or entry[0] is not shared:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._blocks[(shared.spec.key, shared.spec.version)]
+        self._free(shared)
+
+    @contextmanager
+    def published(self, key, data, version=None):
+        """publish() for the length of a `with` block."""
+        shared = self.publish(key, data, version)
+        try:
+            yield shared
+        finally:
+            self.release(shared)
+
+    def references(self, shared):
+        entry = self._blocks.get((shared.spec.key, shared.spec.version))
+        return entry[1] if entry is not None and entry[0] is shared else 0
+
+    def nbytes(self):
+        """Bytes of shared memory currently published."""
+        with self._lock:
+            return sum(shared.shm.size for shared, _ in self._blocks.values())
+
+    @staticmethod
+    def _free(shared):
+        # Unlink first: the name goes at once even if a view (e.g. a plotted curve) keeps the mapping open
+        try:
+            shared.shm.unlink()
+        except FileNotFoundError:
+            pass
+        shared.close()
+
+    def close_all(self):
+        """Unlink every block still published, whatever its reference count."""
+        with self._lock:
+            blocks, self._blocks = list(self._blocks.values()), {}
+        for shared, _ in blocks:
+            self._free(shared)
+
+
+plane = DataPlane()
+atexit.register(plane.close_all)
@@ -0,0 +1,193 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+# --- 1. Binary Cache Layout ---
+# A cache file is a 64 byte header followed by one contiguous block per column:
+#   Date   -> int64 epoch nanoseconds (UTC)
+#   Open, High, Low, Close, Volume -> float64
+# Every block is exactly `rows` items long, so a column is just an offset into the
+# file and can be handed to numpy as a memory-mapped view without parsing anything.
+BINARY_EXT = ".ohlcv"
+MAGIC = b"OHLCV001"
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("rows", "<u8"), ("cols", "<u8"), ("reserved", "V40")])
+HEADER_SIZE = HEADER_DTYPE.itemsize  # 64 bytes
+CSV_CHUNK_ROWS = 1_000_000  # Rows parsed at a time when migrating a legacy CSV, so the file never has to fit in memory
+
+
+def flatten_columns(data):
+    """Drop the ticker level yfinance adds to the columns, leaving Open/High/Low/Close/Volume."""
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+def index_to_epoch_ns(index):
+    """Convert a DatetimeIndex (naive or tz-aware) to int64 UTC epoch nanoseconds."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.values.astype("datetime64[ns]").view("<i8")
+
+
+def write_binary_cache(path, data):
+    """Write an OHLCV DataFrame to `path` in the columnar binary layout."""
+    data = flatten_columns(data)
+    missing = [col for col in COLUMNS if col not in data.columns]
+    if missing:
+        raise ValueError(f"Missing columns {missing}. Available columns: {list(data.columns)}")
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["rows"] = len(data)
+    header["cols"] = len(COLUMNS)
+
+    with open(path, "wb") as f:
+        header.tofile(f)
+        np.ascontiguousarray(index_to_epoch_ns(data.index), dtype="<i8").tofile(f)
+        for col in COLUMNS:
+            np.ascontiguousarray(data[col].to_numpy(), dtype="<f8").tofile(f)
+
+
+def write_binary_cache_chunks(path, chunks):
+    """
+    Write OHLCV frames, in order, to `path` in the columnar binary layout, holding only one in memory.
+    Each column is streamed to its own temporary file first (the row count is only known at the end),
+    then the header and blocks are joined into a temporary cache file that is renamed over `path`.
+    """
+    names = ("Date",) + COLUMNS
+    parts = [f"{path}.{name}.tmp" for name in names]
+    rows = 0
+    try:
+        files = [open(part, "wb") for part in parts]
+        try:
+            for data in chunks:
+                data = flatten_columns(data)
+                missing = [col for col in COLUMNS if col not in data.columns]
+                if missing:
+                    raise ValueError(f"Missing columns {missing}. Available columns: {list(data.columns)}")
+                np.ascontiguousarray(index_to_epoch_ns(data.index), dtype="<i8").tofile(files[0])
+                for f, col in zip(files[1:], COLUMNS):
+                    np.ascontiguousarray(data[col].to_numpy(), dtype="<f8").tofile(f)
+                rows += len(data)
+        finally:
+            for f in files:
+                f.close()
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header["magic"] = MAGIC
+        header["rows"] = rows
+        header["cols"] = len(COLUMNS)
+        with open(path + ".tmp", "wb") as out:
+            header.tofile(out)
+            for part in parts:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(path + ".tmp", path)
+    finally:
+        for part in parts + [path + ".tmp"]:
+            if os.path.exists(part):
+                os.remove(part)
+
+
+def read_binary_cache(path):
+    """
+    Memory-map a binary cache file.
+    Returns a dict of numpy views keyed by 'Date' and the OHLCV column names. Nothing is
+    copied - pages are only read from disk when the arrays are actually touched.
+    """
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    if raw.size < HEADER_SIZE:
+        raise ValueError(f"{path} is too small to be a cache file")
+    header = raw[:HEADER_SIZE].view(HEADER_DTYPE)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a binary cache file")
+
+    rows = int(header["rows"])
+    cols = int(header["cols"])
+    expected = HEADER_SIZE + 8 * rows * (cols + 1)
+    if cols != len(COLUMNS) or raw.size != expected:
+        raise ValueError(f"{path} is truncated or has an unexpected layout")
+
+    columns = {}
+    offset = HEADER_SIZE
+    for name, dtype in [("Date", "<i8")] + [(col, "<f8") for col in COLUMNS]:
+        columns[name] = raw[offset:offset + 8 * rows].view(dtype)
+        offset += 8 * rows
+    return columns
+
+
+def content_hash(data):
+    """
+    Hex digest of a Series' or DataFrame's timestamps and values, in the same column layout as
+    the binary cache. Equal data gives the same hash, so it identifies a slice of the cache.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(index_to_epoch_ns(data.index), dtype="<i8").tobytes())
+    if isinstance(data, pd.Series):
+        digest.update(np.ascontiguousarray(data.to_numpy(), dtype="<f8").tobytes())
+    else:
+        for col in data.columns:
+            digest.update(str(col).encode())
+            digest.update(np.ascontiguousarray(data[col].to_numpy(), dtype="<f8").tobytes())
+    return digest.hexdigest()
+
+
+def columns_to_index(columns):
+    """Wrap the Date column as a DatetimeIndex without copying it."""
+    return pd.DatetimeIndex(columns["Date"].view("datetime64[ns]"))
+
+
+def columns_to_frame(columns):
+    """Build an OHLCV DataFrame from memory-mapped columns."""
+    return pd.DataFrame({col: columns[col] for col in COLUMNS}, index=columns_to_index(columns))
+
+
+def columns_to_series(columns, column):
+    """Build a single-column Series backed directly by the memory-mapped column."""
+    return pd.Series(columns[column], index=columns_to_index(columns), name=column, copy=False)
+
+
+def _tidy_legacy_frame(data):
+    data = flatten_columns(data)
+    data.index = pd.to_datetime(data.index)
+    data.index.name = "Date"
+    return data
+
+
+def read_legacy_csv_chunks(path, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Read a CSV written by `data.to_csv` on a yfinance download, `chunk_rows` rows at a time.
+    Handles both the three-row Price/Ticker/Date header and a plain single-row header.
+    """
+    with open(path, "r") as f:
+        f.readline()
+        second_line = f.readline()
+
+    if second_line.startswith("Ticker"):
+        reader = pd.read_csv(path, header=[0, 1], index_col=0, skiprows=[2], chunksize=chunk_rows)
+    else:
+        reader = pd.read_csv(path, index_col=0, chunksize=chunk_rows)
+    with reader:
+        for data in reader:
+            yield _tidy_legacy_frame(data)
+
+
+def read_legacy_csv(path):
+    """Read a whole legacy CSV into one DataFrame - see read_legacy_csv_chunks."""
+    chunks = list(read_legacy_csv_chunks(path))
+    return pd.concat(chunks) if len(chunks) != 1 else chunks[0]
+
+
+def migrate_legacy_csv(csv_path, binary_path):
+    """
+    Convert a legacy CSV cache file to the binary layout a chunk at a time, so histories larger
+    than memory can be migrated. Returns the memory-mapped columns.
+    """
+    print(f"Migrating {csv_path} to {binary_path}...")
+    write_binary_cache_chunks(binary_path, read_legacy_csv_chunks(csv_path))
+    return read_binary_cache(binary_path)
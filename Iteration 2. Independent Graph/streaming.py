@@ -0,0 +1,246 @@
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+import pyqtgraph as pg
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from stock_cache import COLUMNS, columns_to_frame, read_binary_cache, read_legacy_csv
+from candle_item import CandlestickItem
+from indicators import OVERLAY_COLOURS
+
+# --- 1. Streaming Configuration ---
+INITIAL_CAPACITY = 1024
+FLUSH_EVERY = 64  # Bars held in the live tail segment before they are pushed into the history curve
+REPLAY_SPEED = 10.0  # Bars per second emitted by a ReplayFeed
+TICKS_PER_BAR = 4  # Partial updates a ReplayFeed sends for each bar before it closes
+
+Bar = namedtuple("Bar", ["ticker", "timestamp", "Open", "High", "Low", "Close", "Volume"])
+
+
+class BarBuffer:
+    """
+    Preallocated OHLCV columns that grow geometrically (doubling) as bars are appended.
+    If max_bars is set the buffer stops growing there and behaves as a ring: when full, the
+    newest half is moved to the front in one copy, so appends stay amortised O(1) and every
+    column is still one contiguous array that can be handed to pyqtgraph without copying.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, max_bars=None):
+        self.max_bars = max_bars
+        self.size = 0
+        self.wraps = 0  # Incremented whenever bars are moved, so charts know to redraw everything
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.columns = {col: np.empty(capacity, dtype=np.float64) for col in COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    def add_column(self, name):
+        """Add a float column beside the OHLCV ones (e.g. an indicator's values). It grows and wraps with them and starts as NaN."""
+        if name not in self.columns:
+            self.columns[name] = np.full(len(self.timestamps), np.nan)
+
+    def _grow(self):
+        capacity = len(self.timestamps)
+        if self.max_bars is not None and capacity >= self.max_bars:
+            keep = capacity // 2
+            for arr in [self.timestamps] + list(self.columns.values()):
+                arr[:keep] = arr[self.size - keep:self.size]
+            self.size = keep
+            self.wraps += 1
+            return
+        capacity = capacity * 2 if self.max_bars is None else min(capacity * 2, self.max_bars)
+        for name in list(self.columns):
+            self.columns[name] = np.resize(self.columns[name], capacity)
+        self.timestamps = np.resize(self.timestamps, capacity)
+
+    def append(self, bar):
+        """Add a bar, or update the last one if it has the same timestamp. Returns True if a bar was added."""
+        if self.size and bar.timestamp == self.timestamps[self.size - 1]:
+            i = self.size - 1
+            self.columns["High"][i] = max(self.columns["High"][i], bar.High)
+            self.columns["Low"][i] = min(self.columns["Low"][i], bar.Low)
+            self.columns["Close"][i] = bar.Close
+            self.columns["Volume"][i] = bar.Volume
+            return False
+        if self.size == len(self.timestamps):
+            self._grow()
+        i = self.size
+        self.timestamps[i] = bar.timestamp
+        for col in COLUMNS:
+            self.columns[col][i] = getattr(bar, col)
+        for col in self.columns.keys() - COLUMNS:
+            self.columns[col][i] = np.nan
+        self.size += 1
+        return True
+
+    def bar(self, i, ticker=None):
+        """Bar i as a Bar tuple."""
+        return Bar(ticker, self.timestamps[i], *(self.columns[col][i] for col in COLUMNS))
+
+    def view(self, column):
+        """The filled part of a column (or 'timestamp') as a view - no copy."""
+        arr = self.timestamps if column == "timestamp" else self.columns[column]
+        return arr[:self.size]
+
+
+# --- 2. Feeds ---
+class BarFeed(QObject):
+    """Interface for a source of live bars. Subclasses emit `bar` for every new or updated bar."""
+    bar = pyqtSignal(object)
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(BarFeed):
+    """
+    Replays cached history as if it were live, at `speed` bars per second.
+    Each bar is sent as `ticks_per_bar` partial updates (the close walking from open to close)
+    so charts exercise updating the forming bar as well as appending new ones.
+    """
+
+    def __init__(self, ticker, source, speed=REPLAY_SPEED, ticks_per_bar=TICKS_PER_BAR):
+        super().__init__()
+        self.ticker = ticker
+        self.data = self._load(source)
+        self.ticks_per_bar = max(int(ticks_per_bar), 1)
+        self.position = 0
+        self.timer = QTimer(self)
+        self.timer.setInterval(max(int(1000 / (speed * self.ticks_per_bar)), 1))
+        self.timer.timeout.connect(self._tick)
+
+    @staticmethod
+    def _load(source):
+        if not isinstance(source, str):
+            return source
+        if os.path.splitext(source)[1] == ".csv":
+            return read_legacy_csv(source)
+        return columns_to_frame(read_binary_cache(source))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _tick(self):
+        bar_idx, tick = divmod(self.position, self.ticks_per_bar)
+        if bar_idx >= len(self.data):
+            self.stop()
+            return
+        row = self.data.iloc[bar_idx]
+        frac = (tick + 1) / self.ticks_per_bar
+        close = row["Open"] + (row["Close"] - row["Open"]) * frac
+        high, low = (row["High"], row["Low"]) if tick == self.ticks_per_bar - 1 else (max(row["Open"], close), min(row["Open"], close))
+        timestamp = self.data.index[bar_idx].timestamp()
+        self.bar.emit(Bar(self.ticker, timestamp, row["Open"], high, low, close, row["Volume"] * frac))
+        self.position += 1
+
+
+# --- 3. Live charts ---
+class LiveCurve:
+    """
+    A line that grows at its right end.
+    Points up to the last flush live in one curve that is only pushed to every FLUSH_EVERY points; the
+    points since then (including a forming bar) are a short tail curve, which is all a new point redraws.
+    """
+
+    def __init__(self, plot_widget, pen, wraps=0):
+        self.history_curve = plot_widget.plot(pen=pen, connect="finite")
+        self.tail_curve = plot_widget.plot(pen=pen, connect="finite")
+        self.flushed = 0
+        self._wraps = wraps
+
+    def set_data(self, x, y, wraps=0):
+        """`x`, `y` hold every point so far (e.g. BarBuffer views). A change in `wraps` means they moved, so all is redrawn."""
+        if wraps != self._wraps or len(x) - self.flushed > FLUSH_EVERY:
+            self._wraps = wraps
+            self.flushed = max(len(x) - 1, 0)
+            self.history_curve.setData(x[:self.flushed + 1], y[:self.flushed + 1])
+        self.tail_curve.setData(x[self.flushed:], y[self.flushed:])
+
+
+class LiveIndicators:
+    """
+    Indicators drawn on a live chart and advanced with Indicator.update - O(1) per bar, however long the
+    stream has run - instead of being recomputed. Only closed bars are fed to them: when a bar opens, the
+    one before it is final and goes to update(), so the forming bar's ticks never enter their state.
+    Values are stored as extra columns of the chart's BarBuffer, so they grow and wrap with the bars.
+    `history`, an OHLCV frame of the bars before the stream, seeds each indicator with compute().
+    """
+
+    def __init__(self, buffer, indicators, plot_widget, oscillator_widget=None, history=None):
+        self.buffer = buffer
+        self.indicators = list(indicators)
+        self.curves = {}
+        if history is None:
+            history = pd.DataFrame({col: np.empty(0) for col in COLUMNS}, index=pd.DatetimeIndex([]))
+        colours = iter(OVERLAY_COLOURS * (1 + len(self.indicators)))
+        for indicator in self.indicators:
+            indicator.compute(history)
+            target = plot_widget if indicator.overlay else oscillator_widget
+            for name in indicator.outputs:
+                buffer.add_column(name)
+                if target is not None:
+                    self.curves[name] = LiveCurve(target, pg.mkPen(next(colours), width=1), buffer.wraps)
+
+    def on_bar(self, bar, added):
+        """Call after `bar` is appended to the buffer; `added` is what BarBuffer.append returned."""
+        if not added or len(self.buffer) < 2:
+            return
+        closed = len(self.buffer) - 2
+        closed_bar = self.buffer.bar(closed, bar.ticker)
+        for indicator in self.indicators:
+            for name, value in indicator.update(closed_bar).items():
+                self.buffer.columns[name][closed] = value
+        x = self.buffer.view("timestamp")[:closed + 1]
+        for name, curve in self.curves.items():
+            curve.set_data(x, self.buffer.view(name)[:closed + 1], self.buffer.wraps)
+
+
+class LiveLineChart:
+    """
+    Streams a close-price line into a plot widget as a LiveCurve, so a new tick only redraws the tail.
+    `indicators` are drawn with it through LiveIndicators (oscillators on `oscillator_widget`, if given).
+    """
+
+    def __init__(self, plot_widget, buffer=None, pen=None, indicators=(), oscillator_widget=None, history=None):
+        self.buffer = buffer if buffer is not None else BarBuffer()
+        self.curve = LiveCurve(plot_widget, pen or pg.mkPen(color='#3498db', width=2), self.buffer.wraps)
+        self.indicators = LiveIndicators(self.buffer, indicators, plot_widget, oscillator_widget, history) if indicators else None
+
+    def on_bar(self, bar):
+        added = self.buffer.append(bar)
+        self.curve.set_data(self.buffer.view("timestamp"), self.buffer.view("Close"), self.buffer.wraps)
+        if self.indicators is not None:
+            self.indicators.on_bar(bar, added)
+
+
+class LiveCandleChart:
+    """
+    Streams candles into a CandlestickItem, redrawing only when the changed candle is in view.
+    `indicators` are drawn with it as for LiveLineChart.
+    """
+
+    def __init__(self, plot_widget, buffer=None, indicators=(), oscillator_widget=None, history=None):
+        self.buffer = buffer if buffer is not None else BarBuffer()
+        empty = np.empty(0)
+        self.item = CandlestickItem(empty, empty, empty, empty, empty)
+        plot_widget.addItem(self.item)
+        self._wraps = self.buffer.wraps
+        self.indicators = LiveIndicators(self.buffer, indicators, plot_widget, oscillator_widget, history) if indicators else None
+
+    def on_bar(self, bar):
+        added = self.buffer.append(bar)
+        arrays = [self.buffer.view(col) for col in ("timestamp", "Open", "High", "Low", "Close")]
+        if self.buffer.wraps != self._wraps:
+            self._wraps = self.buffer.wraps
+            self.item.set_data(*arrays)
+        else:
+            self.item.update_tail(*arrays)
+        if self.indicators is not None:
+            self.indicators.on_bar(bar, added)
@@ -0,0 +1,191 @@
+import os
+import csv
+import re
+import heapq
+import argparse
+import urllib.request
+from bisect import bisect_left
+from cache_manager import atomic_replace
+from tick_store import CACHE_DIR, BINARY_EXT
+
+# --- 1. Listing Configuration ---
+# The index is built from a local CSV (Symbol,Name), so typing and validating never touch the network.
+# symbols.csv ships with a starter set of US stocks and ETFs; `python symbols.py --refresh` downloads the
+# full NASDAQ Trader listing into DOWNLOADED_LISTING, which is used instead whenever it exists.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLED_LISTING = os.path.join(BASE_DIR, "symbols.csv")
+DOWNLOADED_LISTING = os.path.join(BASE_DIR, "symbols_downloaded.csv")
+LISTING_URLS = ("https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+                "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt")
+MAX_SUGGESTIONS = 10
+FUZZY_MIN_LENGTH = 3  # Shorter queries are only prefix matched - one edit away from almost everything
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(ticker):
+    """Tickers as yfinance spells them: upper case, with '-' for the class separator (BRK.B -> BRK-B)."""
+    return ticker.strip().upper().replace(".", "-").replace("/", "-")
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+# --- 2. Index ---
+class SymbolIndex:
+    """
+    In-memory ticker lookup built once from a listing. Symbols are kept sorted, so exact lookups and
+    prefix ranges are binary searches; name words are a second sorted list for "apple" -> AAPL.
+    Typos are matched by a deletion index (every symbol and leading name word with one character
+    dropped), so fuzzy search is a handful of dict lookups rather than a scan of the listing.
+    """
+
+    def __init__(self, rows):
+        rows = sorted({normalize(symbol): name for symbol, name in rows if symbol.strip()}.items())
+        self.symbols = [symbol for symbol, _ in rows]
+        self.names = [name for _, name in rows]
+
+        words = sorted((word, i) for i, name in enumerate(self.names) for word in set(_WORD.findall(name.lower())))
+        self._words = [word for word, _ in words]
+        self._word_ids = [i for _, i in words]
+
+        self._fuzzy = {}  # Key with at most one character deleted -> ids
+        for i, (symbol, name) in enumerate(rows):
+            keys = [symbol.lower()]
+            leading = _WORD.findall(name.lower())[:1]
+            if leading and len(leading[0]) >= FUZZY_MIN_LENGTH:
+                keys += leading
+            for key in keys:
+                for variant in _deletes(key) | {key}:
+                    self._fuzzy.setdefault(variant, set()).add(i)
+
+    @classmethod
+    def load(cls, path=None):
+        """Index the downloaded listing if there is one, otherwise the bundled one."""
+        path = path or (DOWNLOADED_LISTING if os.path.exists(DOWNLOADED_LISTING) else BUNDLED_LISTING)
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls((row["Symbol"], row["Name"]) for row in csv.DictReader(f))
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _find(self, symbol):
+        i = bisect_left(self.symbols, symbol)
+        return i if i < len(self.symbols) and self.symbols[i] == symbol else None
+
+    def _prefix_range(self, keys, prefix):
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + "\uffff")
+
+    def _named(self, prefix):
+        lo, hi = self._prefix_range(self._words, prefix)
+        return set(self._word_ids[lo:hi])
+
+    def name(self, ticker):
+        i = self._find(normalize(ticker))
+        return None if i is None else self.names[i]
+
+    def is_valid(self, ticker, cache_dir=CACHE_DIR):
+        """Whether a ticker is listed - or already cached, e.g. a symbol the listing predates."""
+        ticker = normalize(ticker)
+        if not ticker:
+            return False
+        return self._find(ticker) is not None or os.path.exists(os.path.join(cache_dir, f"{ticker}{BINARY_EXT}"))
+
+    def search(self, text, limit=MAX_SUGGESTIONS):
+        """
+        Up to `limit` (symbol, name) pairs for what has been typed, best first: the exact symbol, then
+        symbols starting with it (shortest first), then names with words starting with every typed word,
+        then symbols and names one typo away.
+        """
+        query = normalize(text)
+        if not query:
+            return []
+        found = []
+        seen = set()
+
+        def take(ids):
+            for i in ids:
+                if len(found) >= limit:
+                    return
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+
+        lo, hi = self._prefix_range(self.symbols, query)
+        take(heapq.nsmallest(limit, range(lo, hi), key=lambda i: (len(self.symbols[i]), i)))  # Exact match sorts first
+
+        words = _WORD.findall(text.lower())
+        if words and len(found) < limit:
+            ids = set.intersection(*(self._named(word) for word in words))
+            take(sorted(ids))
+
+        key = query.lower() if len(words) <= 1 else words[0]
+        if len(key) >= FUZZY_MIN_LENGTH and len(found) < limit:
+            ids = set()
+            for variant in _deletes(key) | {key}:
+                ids |= self._fuzzy.get(variant, set())
+            take(sorted(ids, key=lambda i: (len(self.symbols[i]), self.symbols[i])))
+
+        return [(self.symbols[i], self.names[i]) for i in found]
+
+    def suggest(self, ticker, limit=3):
+        """Close matches for a ticker that is not listed, for a "did you mean" message."""
+        return [symbol for symbol, _ in self.search(ticker, limit + 1) if symbol != normalize(ticker)][:limit]
+
+
+# --- 3. Refresh ---
+def parse_nasdaq_listing(text):
+    """(symbol, name) rows of a NASDAQ Trader pipe-delimited symbol file, without test issues or the trailer line."""
+    lines = text.splitlines()
+    header = lines[0].split("|")
+    symbol_col = header.index("Symbol" if "Symbol" in header else "ACT Symbol")
+    name_col = header.index("Security Name")
+    test_col = header.index("Test Issue") if "Test Issue" in header else None
+    rows = []
+    for line in lines[1:]:
+        fields = line.split("|")
+        if len(fields) != len(header) or line.startswith("File Creation Time"):
+            continue
+        if test_col is not None and fields[test_col] == "Y":
+            continue
+        rows.append((fields[symbol_col], fields[name_col]))
+    return rows
+
+
+def refresh(path=DOWNLOADED_LISTING, urls=LISTING_URLS, timeout=30):
+    """Download the full listing and write it where SymbolIndex.load picks it up. Returns the number of symbols."""
+    rows = {}
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            for symbol, name in parse_nasdaq_listing(response.read().decode("utf-8", "replace")):
+                rows.setdefault(normalize(symbol), name)
+
+    def write(tmp_path):
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(["Symbol", "Name"])
+            writer.writerows(sorted(rows.items()))
+    atomic_replace(path, write)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the local ticker listing.")
+    parser.add_argument("query", nargs="*")
+    parser.add_argument("--refresh", action="store_true", help="download the full NASDAQ Trader listing first")
+    parser.add_argument("--limit", type=int, default=MAX_SUGGESTIONS)
+    args = parser.parse_args(argv)
+
+    if args.refresh:
+        print(f"Downloaded {refresh()} symbols to {DOWNLOADED_LISTING}")
+    index = SymbolIndex.load()
+    for query in args.query:
+        print(f"{query}:")
+        for symbol, name in index.search(query, args.limit):
+            print(f"  {symbol:<8}{name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backtest import cache_path
+from cache_manager import CacheManager, atomic_replace, group_of
+from decimation import PYRAMID_EXT
+from stock_cache import BINARY_EXT
+from tick_store import INTERVALS_EXT
+
+# Tickers as the GUI accepts them (symbols.normalize), plus a dotted one as other tools may spell it
+TICKERS = ["AAPL", "^GSPC", "BRK-B", "EURUSD=X", "BRK.B"]
+
+
+def write_bytes(data):
+    def write(path):
+        with open(path, "wb") as f:
+            f.write(data)
+    return write
+
+
+class CacheManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.manager = CacheManager(self.cache_dir)
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def set_last_access(self, group, when):
+        with self.manager.lock():
+            entries = self.manager._edit()
+            for name, entry in entries.items():
+                if entry["group"] == group:
+                    entries[name] = dict(entry, last_access=when)
+
+    def test_corrupted_file_fails_verify(self):
+        path = self.path(f"AAA{BINARY_EXT}")
+        self.manager.write(path, write_bytes(b"\x01" * 4096), group="AAA")
+        self.assertTrue(self.manager.verify(path))
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(100)
+            f.write(b"\x02")
+        # Same size and modification time: only a full check reads the file again
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertTrue(self.manager.verify(path))
+        self.assertFalse(self.manager.verify(path, full=True))
+        # A changed modification time is enough to trigger the CRC check
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertFalse(self.manager.verify(path))
+
+    def test_truncated_file_fails_verify(self):
+        path = self.path(f"AAA{BINARY_EXT}")
+        self.manager.write(path, write_bytes(b"\x01" * 4096), group="AAA")
+        with open(path, "r+b") as f:
+            f.truncate(1000)
+        self.assertFalse(self.manager.verify(path))
+
+    def test_evict_removes_only_the_least_recently_used_managed_groups(self):
+        for age, group in enumerate(["NEW", "MID", "OLD"]):
+            self.manager.write(self.path(f"{group}{BINARY_EXT}"), write_bytes(b"\x00" * 1000), group=group)
+            self.manager.write(self.path(f"{group}{INTERVALS_EXT}"), write_bytes(b"[]"), group=group)
+            self.set_last_access(group, 1000.0 - age)
+        others = ["OLD_2020-01-01_2021-01-01.csv", "notes.txt"]  # Legacy range files and anything else are not the manager's
+        for name in others:
+            write_bytes(b"\x00" * 5000)(self.path(name))
+
+        self.manager.budget = 2500
+        self.assertEqual(self.manager.evict(keep={"OLD"}), ["MID"])
+        remaining = set(os.listdir(self.cache_dir))
+        self.assertNotIn(f"MID{BINARY_EXT}", remaining)
+        self.assertNotIn(f"MID{INTERVALS_EXT}", remaining)
+        for name in [f"OLD{BINARY_EXT}", f"OLD{INTERVALS_EXT}", f"NEW{BINARY_EXT}", f"NEW{INTERVALS_EXT}"] + others:
+            self.assertIn(name, remaining)
+
+        self.manager.budget = 1500
+        self.assertEqual(self.manager.evict(), ["OLD"])
+        self.assertEqual({entry["group"] for entry in self.manager.entries().values()}, {"NEW"})
+        for name in others:
+            self.assertTrue(os.path.exists(self.path(name)))
+
+    def test_atomic_replace_keeps_the_old_file_when_the_write_fails(self):
+        path = self.path("AAA.json")
+        atomic_replace(path, write_bytes(b"old"))
+
+        def failing_write(tmp_path):
+            write_bytes(b"half written")(tmp_path)
+            raise OSError("disk full")
+        with self.assertRaises(OSError):
+            atomic_replace(path, failing_write)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(os.listdir(self.cache_dir), ["AAA.json"])  # The temporary file is removed
+
+    def test_group_of_matches_the_ticker_for_every_kind_of_file(self):
+        for ticker in TICKERS:
+            names = [f"{ticker}{BINARY_EXT}", f"{ticker}{INTERVALS_EXT}", f"{ticker}.Close{PYRAMID_EXT}",
+                     os.path.basename(cache_path(self.cache_dir, ticker, "Linear Reg", "Month", 5))]
+            for name in names:
+                self.assertEqual(group_of(name), ticker, name)
+
+    def test_adopted_files_join_the_group_they_are_verified_for(self):
+        path = self.path(f"BRK.B{BINARY_EXT}")
+        write_bytes(b"\x01" * 100)(path)
+        self.assertTrue(self.manager.verify(path, group="BRK.B"))
+        self.assertEqual(self.manager.entries()[f"BRK.B{BINARY_EXT}"]["group"], "BRK.B")
+        self.manager.discard("BRK")
+        self.assertTrue(os.path.exists(path))
+        self.manager.discard("BRK.B")
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import time
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from fetch_pipeline import FetchTimeout, StubDownloader, fetch_many, synthetic_ohlcv
+
+START, END = pd.Timestamp("2001-01-01"), pd.Timestamp("2002-01-01")
+
+
+class SlowStub(StubDownloader):
+    """StubDownloader with a latency per ticker, so the order results finish in is known."""
+
+    def __init__(self, latencies, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = latencies
+
+    def __call__(self, ticker, start, end):
+        time.sleep(self.latencies.get(ticker, 0.0))
+        return super().__call__(ticker, start, end)
+
+
+class FetchManyTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def fetch(self, tickers, downloader, **kwargs):
+        return list(fetch_many([(ticker, START, END) for ticker in tickers], downloader, self.cache_dir, **kwargs))
+
+    def test_failed_downloads_are_retried(self):
+        stub = StubDownloader(failures={"AAA": 2}, rows=1000)
+        [result] = self.fetch(["AAA"], stub, retries=2, backoff=0.0)
+        self.assertIsNone(result.error)
+        self.assertEqual(len(stub.calls), 3)
+        self.assertEqual(list(result.data.columns), list(synthetic_ohlcv(1).columns))
+        self.assertTrue(((result.data.index >= START) & (result.data.index < END)).all())
+
+    def test_gives_up_after_the_last_retry(self):
+        stub = StubDownloader(failures={"AAA": 5}, rows=1000)
+        [result] = self.fetch(["AAA"], stub, retries=1, backoff=0.0)
+        self.assertIsNone(result.data)
+        self.assertIsInstance(result.error, ConnectionError)
+        self.assertEqual(len(stub.calls), 2)
+
+    def test_slow_ticker_times_out_without_holding_up_the_rest(self):
+        stub = SlowStub({"SLOW": 2.0}, rows=1000)
+        began = time.monotonic()
+        results = {r.ticker: r for r in self.fetch(["SLOW", "FAST"], stub, timeout=0.5)}
+        self.assertLess(time.monotonic() - began, 1.5)
+        self.assertIsInstance(results["SLOW"].error, FetchTimeout)
+        self.assertIsNone(results["FAST"].error)
+
+    def test_results_stream_cached_first_then_as_they_finish(self):
+        self.fetch(["CACHED"], StubDownloader(rows=1000))
+        stub = SlowStub({"SLOWER": 0.4, "SLOW": 0.2}, rows=1000)
+        results = self.fetch(["SLOWER", "SLOW", "CACHED", "FAST"], stub, max_workers=3)
+        self.assertEqual([r.ticker for r in results], ["CACHED", "FAST", "SLOW", "SLOWER"])
+        self.assertEqual([r.source for r in results], ["cache", "network", "network", "network"])
+        self.assertNotIn("CACHED", [call[0] for call in stub.calls])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import numpy as np
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+from fetch_pipeline import synthetic_ohlcv
+from stock_cache import COLUMNS
+from streaming import BarBuffer, ReplayFeed
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+class ReplayIntoBufferTest(unittest.TestCase):
+    def replay(self, rows, buffer, ticks_per_bar=1):
+        """Step a ReplayFeed through `rows` bars into `buffer`. Returns what each append returned."""
+        self.data = synthetic_ohlcv(rows)
+        feed = ReplayFeed("AAA", self.data, ticks_per_bar=ticks_per_bar)
+        added = []
+        feed.bar.connect(lambda bar: added.append(buffer.append(bar)))
+        for _ in range(rows * ticks_per_bar + 1):  # One tick past the end, which stops the feed
+            feed._tick()
+        return added
+
+    def timestamps(self):
+        return self.data.index.to_numpy().astype("datetime64[ns]").astype(np.int64) / 1e9
+
+    def test_grows_past_the_initial_capacity(self):
+        buffer = BarBuffer(capacity=8)
+        added = self.replay(100, buffer)
+        self.assertTrue(all(added))
+        self.assertEqual(len(buffer), 100)
+        self.assertGreaterEqual(len(buffer.timestamps), 100)
+        self.assertEqual(buffer.wraps, 0)
+        np.testing.assert_array_equal(buffer.view("timestamp"), self.timestamps())
+        for col in COLUMNS:
+            np.testing.assert_allclose(buffer.view(col), self.data[col].to_numpy(dtype=float))
+
+    def test_full_buffer_wraps_and_keeps_the_newest_bars(self):
+        buffer = BarBuffer(capacity=8, max_bars=32)
+        self.replay(100, buffer)
+        self.assertEqual(len(buffer.timestamps), 32)
+        self.assertGreater(buffer.wraps, 0)
+        self.assertLessEqual(len(buffer), 32)
+        self.assertGreaterEqual(len(buffer), 16)
+        np.testing.assert_array_equal(buffer.view("timestamp"), self.timestamps()[-len(buffer):])
+        np.testing.assert_allclose(buffer.view("Close"), self.data["Close"].to_numpy(dtype=float)[-len(buffer):])
+
+    def test_forming_bar_is_updated_not_appended(self):
+        buffer = BarBuffer(capacity=8)
+        added = self.replay(20, buffer, ticks_per_bar=4)
+        self.assertEqual(added, [True, False, False, False] * 20)
+        self.assertEqual(len(buffer), 20)
+        # The last tick of each bar carries its real high, low, close and full volume
+        for col in COLUMNS:
+            np.testing.assert_allclose(buffer.view(col), self.data[col].to_numpy(dtype=float))
+
+    def test_forming_bar_is_the_last_one_while_it_is_updated(self):
+        buffer = BarBuffer()
+        self.data = synthetic_ohlcv(3)
+        feed = ReplayFeed("AAA", self.data, ticks_per_bar=4)
+        feed.bar.connect(buffer.append)
+        for _ in range(6):  # All of the first bar and half of the second
+            feed._tick()
+        self.assertEqual(len(buffer), 2)
+        second = self.data.iloc[1]
+        self.assertAlmostEqual(buffer.view("Close")[-1], (second["Open"] + second["Close"]) / 2)
+        self.assertAlmostEqual(buffer.view("Volume")[-1], second["Volume"] / 2)
+        self.assertAlmostEqual(buffer.view("Close")[0], self.data["Close"].iloc[0])
+
+    def test_timer_replays_every_bar_then_stops(self):
+        buffer = BarBuffer(capacity=4)
+        self.data = synthetic_ohlcv(30)
+        feed = ReplayFeed("AAA", self.data, speed=1000.0, ticks_per_bar=2)
+        feed.bar.connect(buffer.append)
+        loop = QEventLoop()
+        poll = QTimer()
+        poll.timeout.connect(lambda: feed.timer.isActive() or loop.quit())
+        poll.start(5)
+        QTimer.singleShot(5000, loop.quit)
+        feed.start()
+        loop.exec_()
+        self.assertFalse(feed.timer.isActive())
+        self.assertEqual(len(buffer), 30)
+        np.testing.assert_array_equal(buffer.view("timestamp"), self.timestamps())
+
+
+if __name__ == "__main__":
+    unittest.main()
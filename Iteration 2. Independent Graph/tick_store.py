@@ -0,0 +1,301 @@
+import os
+import json
+import glob
+import time
+import numpy as np
+import pandas as pd
+from stock_cache import (BINARY_EXT, COLUMNS, columns_to_index, columns_to_series, flatten_columns,
+                         read_binary_cache, read_legacy_csv, write_binary_cache)
+from decimation import PYRAMID_EXT, build_pyramid_file, open_pyramid_file
+from resample import cached_resample, period_starts
+from cache_manager import CacheManager
+
+# --- 1. Store Configuration ---
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stock_data_cache")
+INTERVALS_EXT = ".json"
+# An empty download shorter than this is treated as a market closure (weekend/holiday)
+# and recorded as covered. Longer empty downloads are more likely a failed request.
+MAX_EMPTY_GAP = pd.Timedelta(days=7)
+# Recent bars are revised after the fact (late prints, adjustments), so once a ticker's data is older
+# than RECENT_TTL, the last RECENT_WINDOW before today is treated as missing and fetched again.
+RECENT_WINDOW = pd.Timedelta(days=3)
+RECENT_TTL = pd.Timedelta(hours=6)
+
+
+def yfinance_downloader(ticker, start, end):
+    """Default downloader - yfinance is only imported the first time a download is needed."""
+    import yfinance as yf
+    return flatten_columns(yf.download(ticker, start=start, end=end, progress=False))
+
+
+def merge_intervals(intervals):
+    """Sort (start, end) pairs and coalesce any that overlap or touch."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start, end, covered):
+    """Return the parts of [start, end) not inside any of the (sorted, merged) covered intervals."""
+    gaps = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, min(c_start, end)))
+        cursor = max(cursor, c_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+class TickStore:
+    """
+    One cache file per ticker plus a sidecar listing the date intervals it covers.
+    Intervals are half-open [start, end) to match yfinance's `end` argument.
+    Any sub-range of a covered interval is answered from disk; only the gaps are downloaded.
+    Files are written atomically and checked against the cache index (see cache_manager) before
+    they are opened; a damaged ticker is discarded and downloaded again.
+    """
+
+    def __init__(self, ticker, cache_dir=CACHE_DIR):
+        self.ticker = ticker
+        self.cache_dir = cache_dir
+        self.data_file = os.path.join(cache_dir, f"{ticker}{BINARY_EXT}")
+        self.intervals_file = os.path.join(cache_dir, f"{ticker}{INTERVALS_EXT}")
+        self._columns = None
+        self.cache = CacheManager.for_dir(cache_dir)
+        self.intervals = self._load_intervals()
+
+    # --- 2. On-disk state ---
+    def _read_intervals_file(self):
+        with open(self.intervals_file, "r") as f:
+            return [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in json.load(f)["intervals"]]
+
+    def _load_intervals(self):
+        if os.path.exists(self.intervals_file):
+            try:
+                return self._read_intervals_file()
+            except (OSError, ValueError, KeyError) as e:
+                self._discard(f"unreadable intervals file {self.intervals_file}: {e}")
+                return []
+        # First time this ticker is opened - adopt any per-range files from the old cache layout
+        intervals = []
+        if os.path.isdir(self.cache_dir):
+            intervals = self._migrate_range_files()
+        return intervals
+
+    def _save_intervals(self):
+        payload = {"ticker": self.ticker,
+                   "intervals": [[s.strftime("%Y-%m-%d %H:%M:%S"), e.strftime("%Y-%m-%d %H:%M:%S")]
+                                 for s, e in self.intervals]}
+
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(payload, f, indent=1)
+        # Written after the data file is on disk; if a crash truncates it, it fails to parse and the ticker is refetched
+        self.cache.write(self.intervals_file, write, group=self.ticker, sync=False)
+
+    def _discard(self, reason):
+        """Drop this ticker's files after finding one damaged, so it is downloaded again rather than misread."""
+        print(f"Discarding cached {self.ticker} data - {reason}")
+        self._columns = None
+        self.intervals = []
+        self.cache.discard(self.ticker)
+
+    def _migrate_range_files(self):
+        """Fold old `{ticker}_{start}_{end}` CSV and binary files into this store."""
+        frames, intervals = [], []
+        for path in sorted(glob.glob(os.path.join(self.cache_dir, f"{self.ticker}_*_*"))):
+            name, ext = os.path.splitext(os.path.basename(path))
+            ticker, start, end = name.rsplit("_", 2)
+            if ticker != self.ticker or ext not in (".csv", BINARY_EXT):
+                continue
+            try:
+                if ext == ".csv":
+                    frames.append(read_legacy_csv(path))
+                else:
+                    columns = read_binary_cache(path)
+                    frames.append(pd.DataFrame({col: np.array(columns[col]) for col in COLUMNS},
+                                               index=columns_to_index(columns)))
+                intervals.append((pd.Timestamp(start), pd.Timestamp(end)))
+                print(f"Migrating {path} into {self.data_file}...")
+            except Exception as e:
+                print(f"Skipping unreadable cache file {path}: {e}")
+        if frames:
+            self.intervals = []
+            self._write(pd.concat(frames), intervals)
+        return merge_intervals(intervals)
+
+    def _read_columns(self):
+        if self._columns is None and os.path.exists(self.data_file):
+            if not self.cache.verify(self.data_file, group=self.ticker):
+                self._discard(f"{self.data_file} failed its integrity check")
+                return None
+            try:
+                self._columns = read_binary_cache(self.data_file)
+            except ValueError as e:
+                self._discard(str(e))
+                return None
+            self.cache.touch(self.data_file)
+        return self._columns
+
+    def _write(self, data, new_intervals):
+        """
+        Merge `data` into the store, dropping duplicate timestamps (newest download wins).
+        Runs under the cache lock and merges into the latest file on disk, so two processes
+        adding to the same ticker never drop each other's bars.
+        """
+        data = data[list(COLUMNS)]
+        with self.cache.lock():
+            self._columns = None
+            if os.path.exists(self.intervals_file):
+                self.intervals = merge_intervals(self.intervals + self._read_intervals_file())
+            existing = self.read()
+            if existing is not None and not existing.empty:
+                data = pd.concat([existing, data])
+            data = data[~data.index.duplicated(keep="last")].sort_index()
+
+            self._columns = None  # release the old memory map before the file is replaced
+            self.cache.write(self.data_file, lambda path: write_binary_cache(path, data), group=self.ticker)
+            self.intervals = merge_intervals(self.intervals + list(new_intervals))
+            self._save_intervals()
+        self.cache.evict(keep={self.ticker})
+
+    # --- 3. Public API ---
+    def version(self):
+        """Changes whenever the data file is rewritten - keys anything derived from it. None if nothing is cached."""
+        return os.stat(self.data_file).st_mtime_ns if os.path.exists(self.data_file) else None
+
+    def covered(self):
+        """
+        Intervals that can be answered from disk. Once the data is older than RECENT_TTL, coverage stops
+        RECENT_WINDOW before today, so recent bars are fetched again the next time they are asked for.
+        """
+        if self.intervals and self._read_columns() is None:
+            self.intervals = []  # Evicted by another process, or found damaged and discarded
+        written_at = self.cache.written_at(self.data_file)
+        if written_at is None or time.time() - written_at <= RECENT_TTL.total_seconds():
+            return self.intervals
+        recent_start = pd.Timestamp.today().normalize() - RECENT_WINDOW
+        return [(s, min(e, recent_start)) for s, e in self.intervals if s < recent_start]
+
+    def missing(self, start, end):
+        """Date ranges inside [start, end) that are not yet on disk, or are recent and stale."""
+        return subtract_intervals(pd.Timestamp(start), pd.Timestamp(end), self.covered())
+
+    @staticmethod
+    def _bounds(dates, start, end):
+        """Row range of [start, end) in the sorted Date column - a binary search, so only a few pages are read."""
+        i0 = 0 if start is None else np.searchsorted(dates, pd.Timestamp(start).value, side="left")
+        i1 = len(dates) if end is None else np.searchsorted(dates, pd.Timestamp(end).value, side="left")
+        return i0, i1
+
+    def read(self, start=None, end=None):
+        """Slice [start, end) straight out of the memory-mapped file. Returns None if nothing is cached."""
+        columns = self._read_columns()
+        if columns is None:
+            return None
+        i0, i1 = self._bounds(columns["Date"], start, end)
+        index = columns_to_index({"Date": columns["Date"][i0:i1]})
+        return pd.DataFrame({col: columns[col][i0:i1] for col in COLUMNS}, index=index)
+
+    def read_column(self, column, start=None, end=None):
+        """
+        One column of [start, end) as a Series backed by the memory-mapped file. Unlike read(), nothing
+        is copied, so pages are only read from disk as the Series is used - any length of history can be opened.
+        """
+        columns = self._read_columns()
+        if columns is None:
+            return None
+        i0, i1 = self._bounds(columns["Date"], start, end)
+        return columns_to_series({"Date": columns["Date"][i0:i1], column: columns[column][i0:i1]}, column)
+
+    def pyramid(self, column="Close"):
+        """
+        Min/max pyramid of one column for decimation.LODCurve, memory-mapped from `{ticker}.{column}.lod`.
+        The file is built a chunk at a time the first time it is needed and again whenever the data file
+        changes, so zoomed-out views of the whole history read a few thousand points instead of every row.
+        Returns None if nothing is cached.
+        """
+        columns = self._read_columns()
+        if columns is None:
+            return None
+        path = os.path.join(self.cache_dir, f"{self.ticker}.{column}{PYRAMID_EXT}")
+        stamp = self.version()
+        levels = open_pyramid_file(path, columns[column], stamp)
+        if levels is None:
+            print(f"Building {column} pyramid for {self.ticker}...")
+            with self.cache.lock():
+                build_pyramid_file(path, columns["Date"], columns[column], stamp, x_unit=1e9)
+                self.cache.record(path, group=self.ticker)
+            levels = open_pyramid_file(path, columns[column], stamp)
+        return levels
+
+    def resampled(self, rule, start=None, end=None):
+        """
+        [start, end) as bars of size `rule` ("D", "W", "M" or "Y"; see resample.resample_ohlcv).
+        The whole history is resampled once per data version and cached, so switching bar size is a
+        lookup and never touches the network. Bars are labelled by period start, so the bar holding
+        `start` is included even if its period began earlier. Returns None if nothing is cached.
+        """
+        version = self.version()
+        if version is None:
+            return None
+        bars = cached_resample(self.data_file, version, rule, self.read)
+        labels = bars.index.to_numpy()
+        i0 = 0 if start is None else np.searchsorted(labels, period_starts([pd.Timestamp(start)], rule)[0])
+        i1 = len(bars) if end is None else np.searchsorted(labels, pd.Timestamp(end).to_datetime64(), side="left")
+        return bars.iloc[i0:i1]
+
+    def merge(self, data, start, end):
+        """Add a downloaded frame covering [start, end) to the store."""
+        self._write(flatten_columns(data), [(pd.Timestamp(start), pd.Timestamp(end))])
+
+    def get(self, start, end, downloader=yfinance_downloader, save=True):
+        """Return [start, end) for this ticker, downloading only the ranges the store does not cover."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        today = pd.Timestamp.today().normalize()
+        fetched, fetched_intervals = [], []
+
+        for gap_start, gap_end in self.missing(start, end):
+            print(f"Downloading {self.ticker} data from {gap_start.date()} to {gap_end.date()}...")
+            data = downloader(self.ticker, gap_start.strftime("%Y-%m-%d"), gap_end.strftime("%Y-%m-%d"))
+            if data is None:
+                continue
+            # Today's bar is still changing, so never record it (or the future) as covered
+            covered_end = min(gap_end, today)
+            if data.empty:
+                if gap_end - gap_start <= MAX_EMPTY_GAP and covered_end > gap_start:
+                    fetched_intervals.append((gap_start, covered_end))
+                continue
+            fetched.append(flatten_columns(data))
+            if covered_end > gap_start:
+                fetched_intervals.append((gap_start, covered_end))
+
+        if fetched or fetched_intervals:
+            if save:
+                self._write(pd.concat(fetched) if fetched else pd.DataFrame(columns=list(COLUMNS)),
+                            fetched_intervals)
+            else:
+                cached = self.read(start, end)
+                frames = ([cached] if cached is not None else []) + fetched
+                data = pd.concat(frames) if frames else None
+                if data is None:
+                    return None
+                data = data[~data.index.duplicated(keep="last")].sort_index()
+                return data.loc[(data.index >= start) & (data.index < end)]
+
+        data = self.read(start, end)
+        if data is None or data.empty:
+            return None
+        return data
@@ -0,0 +1,142 @@
+import os
+import json
+from collections import namedtuple
+import pandas as pd
+from cache_manager import atomic_replace
+from indicators import INDICATOR_TYPES
+from stock_cache import content_hash
+from tick_store import CACHE_DIR, TickStore
+
+# --- 1. Workspace Configuration ---
+# A snapshot is a small JSON file describing a chart: which tickers over which dates, the view,
+# annotations and indicator settings. Price data is never copied into it - each series is a
+# reference (ticker, date range, content hash) to a slice of the tick store, so saving is cheap
+# and a dozen saves of the same chart cost a few kilobytes rather than a dozen copies of the data.
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_graphs")
+SNAPSHOT_EXT = ".json"
+SNAPSHOT_VERSION = 1
+
+SeriesRef = namedtuple("SeriesRef", ["ticker", "start", "end", "rows", "hash", "colour"])
+Snapshot = namedtuple("Snapshot", ["name", "saved_at", "normalize", "view_range", "series",
+                                   "annotations", "indicators"])
+
+
+def snapshot_path(name, directory=SNAPSHOT_DIR):
+    """Path of the snapshot called `name`; characters that are unsafe in file names are replaced."""
+    safe = "".join(c if c.isalnum() or c in " -_." else "_" for c in name).strip()
+    if not safe:
+        raise ValueError("A saved graph needs a name")
+    return os.path.join(directory, f"{safe}{SNAPSHOT_EXT}")
+
+
+def indicator_spec(indicator):
+    return {"type": type(indicator).__name__, "params": indicator.params()}
+
+
+def build_indicator(spec):
+    """Rebuild an indicator from indicator_spec(); unknown types raise ValueError."""
+    if spec["type"] not in INDICATOR_TYPES:
+        raise ValueError(f"Unknown indicator {spec['type']}")
+    return INDICATOR_TYPES[spec["type"]](**spec.get("params", {}))
+
+
+# --- 2. Capture and save ---
+def capture(chart, name):
+    """Describe a MultiSeriesChart as a Snapshot. Only hashes the shown data; nothing is copied."""
+    series = [SeriesRef(ticker, close.index[0].isoformat(), close.index[-1].isoformat(), len(close),
+                        content_hash(close), chart.colours.get(ticker))
+              for ticker, close in chart.series.items()]
+    return Snapshot(name, pd.Timestamp.now().isoformat(timespec="seconds"), chart.normalize,
+                    [list(map(float, r)) for r in chart.view_range()], series,
+                    list(chart.annotations), [indicator_spec(i) for i in chart.indicators])
+
+
+def save_snapshot(snapshot, directory=SNAPSHOT_DIR):
+    """Write a snapshot atomically, replacing any saved graph of the same name. Returns its path."""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = snapshot_path(snapshot.name, directory)
+    payload = snapshot._asdict()
+    payload["version"] = SNAPSHOT_VERSION
+    payload["series"] = [ref._asdict() for ref in snapshot.series]
+    # Atomic, so a crash or a full disk leaves the previous save rather than a half-written one
+    atomic_replace(path, lambda tmp_path: _dump_json(tmp_path, payload))
+    return path
+
+
+def _dump_json(path, payload):
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=1)
+
+
+# --- 3. Load ---
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Names of the saved graphs in `directory`, most recently saved first."""
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, f) for f in os.listdir(directory)
+             if f.endswith(SNAPSHOT_EXT) and not f.startswith(".tmp_")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    return [os.path.splitext(os.path.basename(p))[0] for p in paths]
+
+
+def load_snapshot(name, directory=SNAPSHOT_DIR):
+    """
+    Read a snapshot's description only - no price data is touched, so this is instant however
+    many series it holds. The series are then fetched with resolve_series() or resolve_many().
+    """
+    with open(snapshot_path(name, directory), "r") as f:
+        payload = json.load(f)
+    if payload.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Saved graph {name} has unsupported version {payload.get('version')}")
+    return Snapshot(payload["name"], payload["saved_at"], payload["normalize"], payload["view_range"],
+                    [SeriesRef(**ref) for ref in payload["series"]],
+                    payload["annotations"], payload["indicators"])
+
+
+def resolve_series(ref, cache_dir=CACHE_DIR, downloader=None):
+    """
+    Fetch the close prices a SeriesRef points at from the tick store, downloading any missing
+    range with `downloader` if one is given. Returns (close, matches) where `matches` is False if
+    the cached data has been revised since the snapshot was saved (the current data is still returned).
+    """
+    store = TickStore(ref.ticker, cache_dir)
+    if downloader is not None:
+        data = store.get(*_request_range(ref), downloader=downloader)
+    else:
+        data = store.read(pd.Timestamp(ref.start), pd.Timestamp(ref.end) + pd.Timedelta(days=1))
+    return _close_of(ref, data)
+
+
+def resolve_many(refs, cache_dir=CACHE_DIR, downloader=None, max_workers=None):
+    """
+    resolve_series for every series of a snapshot at once. Missing ranges are downloaded concurrently
+    by fetch_pipeline.fetch_many (with its retries and per-ticker timeout), so reopening a large
+    watchlist costs about one download rather than one per ticker. Yields (ref, close, matches, error)
+    as each series becomes ready; `error` is None on success.
+    """
+    from fetch_pipeline import MAX_WORKERS, fetch_many, threadsafe_yfinance_downloader
+    refs = {ref.ticker: ref for ref in refs}
+    requests = [(ticker, *_request_range(ref)) for ticker, ref in refs.items()]
+    for result in fetch_many(requests, downloader or threadsafe_yfinance_downloader, cache_dir, max_workers or MAX_WORKERS):
+        ref = refs[result.ticker]
+        try:
+            if result.error is not None:
+                raise ValueError(f"Could not load {ref.ticker}: {result.error}")
+            close, matches = _close_of(ref, result.data)
+        except ValueError as e:
+            yield ref, None, False, e
+            continue
+        yield ref, close, matches, None
+
+
+def _request_range(ref):
+    # TickStore ranges are half-open and by day, so ask for one day past the last saved bar
+    return pd.Timestamp(ref.start).normalize(), pd.Timestamp(ref.end).normalize() + pd.Timedelta(days=1)
+
+
+def _close_of(ref, data):
+    if data is None or data.empty:
+        raise ValueError(f"No cached data found for {ref.ticker}")
+    close = data["Close"].loc[pd.Timestamp(ref.start):pd.Timestamp(ref.end)].dropna()
+    return close, content_hash(close) == ref.hash